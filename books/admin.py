@@ -2,11 +2,38 @@ import datetime
 from typing import Any, Dict
 from django.contrib import admin
 from django.contrib.admin.decorators import display
-from django.db.models import Count
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.db.models import Count, Q
 
+from . import search
 from .models import Person, Book, Tag, LinkType, Link, Narration
 
 
+class SearchRankChangeList(ChangeList):
+    '''
+    Change list that keeps search results ordered from the most similar, see
+    books/search.py, unless user sorts by a column.
+    '''
+
+    def get_ordering(self, request, queryset):
+        if (ORDER_VAR not in self.params
+                and search.RANK in queryset.query.annotations):
+            return [f'-{search.RANK}', '-pk']
+        return super().get_ordering(request, queryset)
+
+
+class SearchMixin:
+    '''Admin search by search_fields with books/search.py.'''
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.search(queryset, self.search_fields, search_term), False
+
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
+
 class IncompleteBookListFilter(admin.SimpleListFilter):
     '''Filter that shows books that have incomplete data like missing description or cover.'''
     title = 'incomplete data'
@@ -50,13 +77,13 @@ class IncompleteBookListFilter(admin.SimpleListFilter):
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(SearchMixin, admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title', )}
     list_filter = (IncompleteBookListFilter, 'authors', 'title', 'promoted')
     list_display = ('title', 'get_book_authors', 'promoted')
     list_per_page = 1000
     autocomplete_fields = ['authors', 'translators']
-    search_fields = ['title']
+    search_fields = ['title', 'title_ru']
 
     class Media:
         js = ('js/admin.js', )
@@ -71,11 +98,54 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name', )}
 
 
+class LinkHealthListFilter(admin.SimpleListFilter):
+    '''Filter that shows links by result of the latest check_links run.'''
+    title = 'health'
+
+    # Parameter for the filter that will be used in the URL query.
+    parameter_name = 'health'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('dead', 'Dead'),
+            ('ok', 'OK'),
+            ('unchecked', 'Not checked'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'dead':
+            return queryset.filter(Q(health__status_code__isnull=True)
+                                   | Q(health__status_code__gte=400),
+                                   health__isnull=False)
+        if self.value() == 'ok':
+            return queryset.filter(health__status_code__lt=400)
+        if self.value() == 'unchecked':
+            return queryset.filter(health__isnull=True)
+        return queryset
+
+
 @admin.register(Link)
 class LinkAdmin(admin.ModelAdmin):
-    list_display = ('uuid', 'url_type', 'get_book', 'get_narrators', 'url')
+    list_display = ('uuid', 'url_type', 'get_book', 'get_narrators', 'url',
+                    'get_health', 'get_last_checked')
+    list_filter = (LinkHealthListFilter, 'url_type')
+    list_select_related = ('health', )
     list_per_page = 1000
 
+    @display(description='health')
+    def get_health(self, obj):
+        health = getattr(obj, 'health', None)
+        if health is None:
+            return '-'
+        if health.status_code is None:
+            return health.error
+        return f'{health.status_code} ({health.latency_ms} ms)'
+
+    @display(description='last checked', ordering='health__last_checked')
+    def get_last_checked(self, obj):
+        health = getattr(obj, 'health', None)
+        return health.last_checked if health else None
+
     @display(description='book')
     def get_book(self, obj):
         return obj.narration.book
@@ -129,12 +199,12 @@ class IncompletePersonListFilter(admin.SimpleListFilter):
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(SearchMixin, admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name', )}
     list_filter = (IncompletePersonListFilter, )
     ordering = ['slug']
     list_per_page = 1000
-    search_fields = ['name']
+    search_fields = ['name', 'name_ru']
 
     class Media:
         js = ('js/admin.js', )
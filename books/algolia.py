@@ -0,0 +1,145 @@
+'''
+Sync of books and people to Algolia search index.
+
+Each record's content hash is stored in AlgoliaRecord after it's pushed. Sync
+compares hashes of current records with stored ones and sends only changed
+records and deletions of records that are gone (hidden books, people without
+active books). Full sync replaces the whole index and stored state, use it
+when index was changed outside of this code or record format changed.
+'''
+
+from dataclasses import dataclass
+import hashlib
+import json
+from typing import Any, Dict, List
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from books import models
+
+# Max number of objects sent in a single Algolia request.
+BATCH_SIZE = 500
+
+Record = Dict[str, Any]
+
+
+@dataclass
+class SyncResult:
+    '''Number of records pushed to the index by sync.'''
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+
+def _active_people() -> QuerySet:
+    '''People who authored, translated or narrated active books.'''
+    active = models.BookStatus.ACTIVE
+    authors = models.Book.authors.through.objects.filter(
+        book__status=active).values('person_id')
+    translators = models.Book.translators.through.objects.filter(
+        book__status=active).values('person_id')
+    narrators = models.Narration.narrators.through.objects.filter(
+        narration__book__status=active).values('person_id')
+    return models.Person.objects.filter(
+        Q(uuid__in=authors) | Q(uuid__in=translators)
+        | Q(uuid__in=narrators))
+
+
+def build_records() -> Dict[str, Record]:
+    '''Builds records of all searchable books and people by objectID.'''
+    records: Dict[str, Record] = {}
+    books = models.Book.objects.filter(
+        status=models.BookStatus.ACTIVE).prefetch_related('authors')
+    for book in books:
+        authors = book.authors.all()
+        records[str(book.uuid)] = {
+            'objectID': str(book.uuid),
+            'model': 'book',
+            'title': book.title,
+            'title_ru': book.title_ru,
+            'slug': book.slug,
+            'authors': [author.name for author in authors],
+            'authors_ru': [author.name_ru for author in authors],
+        }
+    for person in _active_people():
+        records[str(person.uuid)] = {
+            'objectID': str(person.uuid),
+            'model': 'person',
+            'name': person.name,
+            'name_ru': person.name_ru,
+            'slug': person.slug,
+        }
+    return records
+
+
+def record_hash(record: Record) -> str:
+    data = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _batches(items: List[Any]) -> List[List[Any]]:
+    return [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+
+
+def sync(index, index_name: str) -> SyncResult:
+    '''
+    Pushes changed records and deletes removed ones. Stored state is updated
+    after each batch so a failed sync continues where it stopped.
+    '''
+    records = build_records()
+    pushed = dict(
+        models.AlgoliaRecord.objects.filter(index_name=index_name).values_list(
+            'object_id', 'content_hash'))
+    hashes = {
+        object_id: record_hash(record)
+        for object_id, record in records.items()
+    }
+    changed = [
+        object_id for object_id, content_hash in hashes.items()
+        if pushed.get(object_id) != content_hash
+    ]
+    deleted = [object_id for object_id in pushed if object_id not in records]
+    result = SyncResult(unchanged=len(records) - len(changed))
+
+    for batch in _batches(changed):
+        # All attributes are sent so partial update replaces the record.
+        index.partial_update_objects([records[i] for i in batch], {
+            'createIfNotExists': True
+        }).wait()
+        now = timezone.now()
+        with transaction.atomic():
+            models.AlgoliaRecord.objects.filter(index_name=index_name,
+                                                object_id__in=batch).delete()
+            models.AlgoliaRecord.objects.bulk_create([
+                models.AlgoliaRecord(index_name=index_name,
+                                     object_id=object_id,
+                                     content_hash=hashes[object_id],
+                                     pushed_at=now) for object_id in batch
+            ])
+        result.updated += len(batch)
+
+    for batch in _batches(deleted):
+        index.delete_objects(batch).wait()
+        models.AlgoliaRecord.objects.filter(index_name=index_name,
+                                            object_id__in=batch).delete()
+        result.deleted += len(batch)
+    return result
+
+
+def full_sync(index, index_name: str) -> SyncResult:
+    '''Replaces all records in the index and stored state.'''
+    records = build_records()
+    index.replace_all_objects(list(records.values())).wait()
+    now = timezone.now()
+    with transaction.atomic():
+        models.AlgoliaRecord.objects.filter(index_name=index_name).delete()
+        models.AlgoliaRecord.objects.bulk_create([
+            models.AlgoliaRecord(index_name=index_name,
+                                 object_id=object_id,
+                                 content_hash=record_hash(record),
+                                 pushed_at=now)
+            for object_id, record in records.items()
+        ],
+                                                 batch_size=BATCH_SIZE)
+    return SyncResult(updated=len(records))
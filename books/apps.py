@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+from books import search
+
+
+def _create_search_indexes(sender, using, **kwargs):
+    search.create_search_indexes(using)
 
 
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        # Search indexes use Postgres-specific SQL which can't be expressed
+        # in models, so they are created after migrations.
+        post_migrate.connect(_create_search_indexes, sender=self)
+        # Imported here as models can't be imported before apps are ready.
+        from books import outbox
+        outbox.connect_signals()
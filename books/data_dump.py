@@ -0,0 +1,214 @@
+'''
+Streaming dump of books data into data.json format, used by
+pull_data_from_prod.
+
+Each table is read in chunks of primary key order: rows come from a
+server-side cursor (on Postgres) and m2m relations are prefetched per chunk,
+so memory used by the dump doesn't grow with the size of the catalog.
+Serialized objects are written right away into a temporary file per table,
+which allows dumping tables in parallel with separate connections. The files
+are then concatenated in MODELS order. Output is the same as of
+`serializers.serialize('json', objects, indent=2)`.
+
+When only a few rows changed, update() rewrites just their entries of an
+existing dump instead of dumping all tables.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import json
+import shutil
+import tempfile
+import time
+from typing import IO, Any, Dict, Iterable, Iterator, List, Tuple, Type
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder, Serializer
+from django.db import connections, models as db_models
+from django.db.models import prefetch_related_objects
+
+from books import fixture_loader, models
+
+# Models in the order they are written to data.json.
+MODELS: List[Type[db_models.Model]] = [
+    models.Person,
+    models.Tag,
+    models.Book,
+    models.Narration,
+    models.LinkType,
+    models.Link,
+]
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+@dataclass
+class TableStats:
+    '''Number of dumped rows of a single table and time it took.'''
+    model: Type[db_models.Model]
+    rows: int
+    seconds: float
+
+    def report(self) -> str:
+        rate = self.rows / self.seconds if self.seconds else 0
+        return (f'{self.model._meta.verbose_name_plural}: {self.rows} rows '
+                f'in {self.seconds:.1f}s ({rate:.0f} rows/s)')
+
+
+class _FragmentSerializer(Serializer):
+    '''
+    JSON serializer that writes objects without enclosing brackets so that
+    output of several tables can be concatenated into a single list.
+    '''
+
+    def start_serialization(self):
+        self._init_options()
+
+    def end_serialization(self):
+        pass
+
+
+def _objects(model: Type[db_models.Model], using: str,
+             chunk_size: int) -> Iterator[db_models.Model]:
+    '''Yields all objects of the model ordered by pk, chunk by chunk.'''
+    m2m_fields = [f.name for f in model._meta.many_to_many]
+    chunk: List[db_models.Model] = []
+    for obj in model.objects.using(using).order_by('pk').iterator(
+            chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *m2m_fields)
+            yield from chunk
+            chunk = []
+    prefetch_related_objects(chunk, *m2m_fields)
+    yield from chunk
+
+
+def _dump_table(model: Type[db_models.Model], using: str, stream: IO[str],
+                chunk_size: int) -> TableStats:
+    start = time.monotonic()
+    serializer = _FragmentSerializer()
+    rows = 0
+
+    def counted() -> Iterator[db_models.Model]:
+        nonlocal rows
+        for obj in _objects(model, using, chunk_size):
+            rows += 1
+            yield obj
+
+    serializer.serialize(counted(), stream=stream, indent=2)
+    return TableStats(model, rows, time.monotonic() - start)
+
+
+def _dump_table_in_thread(model: Type[db_models.Model], using: str,
+                          stream: IO[str], chunk_size: int) -> TableStats:
+    try:
+        return _dump_table(model, using, stream, chunk_size)
+    finally:
+        # Each thread opens its own connection.
+        connections.close_all()
+
+
+def dump(using: str,
+         stream: IO[str],
+         chunk_size: int = DEFAULT_CHUNK_SIZE,
+         workers: int = 1) -> List[TableStats]:
+    '''
+    Writes all books data from the database to stream in data.json format.
+    With workers > 1 tables are read in parallel connections.
+    '''
+    files = [tempfile.TemporaryFile('w+', encoding='utf8') for _ in MODELS]
+    try:
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_dump_table_in_thread, model, using, f,
+                                    chunk_size)
+                    for model, f in zip(MODELS, files)
+                ]
+                stats = [future.result() for future in futures]
+        else:
+            stats = [
+                _dump_table(model, using, f, chunk_size)
+                for model, f in zip(MODELS, files)
+            ]
+
+        stream.write('[')
+        first = True
+        for table_stats, f in zip(stats, files):
+            if not table_stats.rows:
+                continue
+            if not first:
+                stream.write(',')
+            first = False
+            f.seek(0)
+            shutil.copyfileobj(f, stream)
+        stream.write('\n]\n')
+    finally:
+        for f in files:
+            f.close()
+    return stats
+
+
+def _sort_key(obj: Dict[str, Any]) -> Tuple[int, Any]:
+    labels = [model._meta.label_lower for model in MODELS]
+    index = labels.index(
+        obj['model']) if obj['model'] in labels else len(labels)
+    return (index, obj['pk'])
+
+
+def update(using: str, source: IO[str], stream: IO[str],
+           changed: Dict[Type[db_models.Model], Iterable[str]]) -> int:
+    '''
+    Copies dump from source to stream replacing entries of changed objects
+    with their current state in the database. Changed objects that no longer
+    exist are removed, new ones are inserted keeping MODELS and pk order.
+    Returns number of written changed objects.
+    '''
+    fresh: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    removed = set()
+    for model, pks in changed.items():
+        pks = set(pks)
+        objects = list(model.objects.using(using).filter(pk__in=pks))
+        prefetch_related_objects(objects,
+                                 *[f.name for f in model._meta.many_to_many])
+        for obj in serializers.serialize('python', objects):
+            fresh[(obj['model'], str(obj['pk']))] = obj
+        label = model._meta.label_lower
+        removed.update((label, pk) for pk in pks if (label, pk) not in fresh)
+    # New objects waiting to be inserted, sorted from last to first.
+    pending = sorted(fresh.values(), key=_sort_key, reverse=True)
+
+    first = True
+
+    def write(obj: Dict[str, Any]) -> None:
+        nonlocal first
+        if not first:
+            stream.write(',')
+        first = False
+        stream.write('\n')
+        # Same options as Django json serializer uses.
+        json.dump(obj,
+                  stream,
+                  indent=2,
+                  separators=(',', ': '),
+                  ensure_ascii=False,
+                  cls=DjangoJSONEncoder)
+
+    stream.write('[')
+    for obj in fixture_loader.iter_json_list(source):
+        key = (obj['model'], str(obj['pk']))
+        while pending and _sort_key(pending[-1]) < _sort_key(obj):
+            write(pending.pop())
+        if key in fresh:
+            if fresh[key] not in pending:
+                # Already written, source isn't sorted.
+                continue
+            obj = fresh[key]
+            pending.remove(obj)
+        elif key in removed:
+            continue
+        write(obj)
+    while pending:
+        write(pending.pop())
+    stream.write('\n]\n')
+    return len(fresh)
@@ -0,0 +1,336 @@
+'''
+Diff-based sync of books data between two databases, used by
+push_data_to_prod to update production from local data.
+
+Rows of both databases are read into snapshots and compared by primary key
+(uuid for books, people, narrations and links, id for tags and link types)
+and hash of the row content. m2m relations (authors, translators, tags,
+narrators) are compared as sets of pairs. Only differences are written:
+
+1. Deleted rows, children before parents.
+2. Unique values (slugs) of changed rows that change them are replaced with
+   temporary ones, so that rows can swap slugs.
+3. Changed and new rows, parents before children so foreign keys are valid.
+   Changed rows go before new ones of the same model, so that a new row can
+   take a slug a changed row gave up.
+4. Added and removed m2m pairs.
+
+All changes are applied in a single transaction in batched statements so
+target database never has partial data and time of the sync depends on the
+size of the change rather than the size of the catalog. Changes are recorded
+in outbox of the target database, see books/outbox.py.
+
+Rows can only be compared when both databases have the same schema, check
+schema_drift() before reading snapshots.
+'''
+
+from dataclasses import dataclass, field
+import hashlib
+import json
+from typing import Any, Dict, List, Set, Tuple, Type
+from django.core.management.color import no_style
+from django.db import connections, models as db_models, transaction
+
+from books import models, outbox
+
+# Models in the order they are created, parents first.
+MODELS: List[Type[db_models.Model]] = [
+    models.Person,
+    models.Tag,
+    models.LinkType,
+    models.Book,
+    models.Narration,
+    models.Link,
+]
+
+# (model, m2m field name) pairs.
+RELATIONS: List[Tuple[Type[db_models.Model], str]] = [
+    (models.Book, 'authors'),
+    (models.Book, 'translators'),
+    (models.Book, 'tag'),
+    (models.Narration, 'narrators'),
+]
+
+BATCH_SIZE = 500
+
+Row = Dict[str, Any]
+Pair = Tuple[str, str]
+
+
+@dataclass
+class Snapshot:
+    '''Rows of all synced models and m2m pairs of a single database.'''
+    # Model label -> primary key -> row.
+    rows: Dict[str, Dict[str, Row]] = field(default_factory=dict)
+    # Relation name -> pair -> id of the row in through table.
+    pairs: Dict[str, Dict[Pair, int]] = field(default_factory=dict)
+
+
+@dataclass
+class ModelDiff:
+    '''Primary keys of rows that differ between source and target.'''
+    model: Type[db_models.Model]
+    created: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    # Updated rows whose unique fields change.
+    renamed: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RelationDiff:
+    '''m2m pairs that differ between source and target.'''
+    model: Type[db_models.Model]
+    field_name: str
+    added: List[Pair] = field(default_factory=list)
+    # Ids of through table rows in the target.
+    removed: List[int] = field(default_factory=list)
+    # Primary keys of objects whose relation changed.
+    changed_objects: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class SyncPlan:
+    '''Changes that turn target database into a copy of the source.'''
+    source: Snapshot
+    models: List[ModelDiff]
+    relations: List[RelationDiff]
+
+    def is_empty(self) -> bool:
+        return not any(d.created or d.updated or d.deleted
+                       for d in self.models) and not any(
+                           d.added or d.removed for d in self.relations)
+
+    def report(self) -> List[str]:
+        '''Human readable summary of the changes.'''
+        lines = []
+        for model_diff in self.models:
+            lines.append(f'{model_diff.model._meta.verbose_name_plural}: '
+                         f'{len(model_diff.created)} created, '
+                         f'{len(model_diff.updated)} updated, '
+                         f'{len(model_diff.deleted)} deleted')
+        for relation_diff in self.relations:
+            name = _relation_name(relation_diff.model,
+                                  relation_diff.field_name)
+            lines.append(f'{name}: '
+                         f'{len(relation_diff.added)} added, '
+                         f'{len(relation_diff.removed)} removed')
+        return lines
+
+
+def _relation_name(model: Type[db_models.Model], field_name: str) -> str:
+    return f'{model._meta.model_name}.{field_name}'
+
+
+def _concrete_fields(model: Type[db_models.Model]) -> List[str]:
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+def _unique_fields(model: Type[db_models.Model]) -> List[str]:
+    return [
+        f.attname for f in model._meta.concrete_fields
+        if f.unique and not f.primary_key
+    ]
+
+
+def _through_fields(model: Type[db_models.Model],
+                    field_name: str) -> Tuple[Type[db_models.Model], str, str]:
+    '''Returns through model and its columns pointing to both sides.'''
+    m2m = model._meta.get_field(field_name)
+    return (m2m.remote_field.through, m2m.m2m_column_name(),
+            m2m.m2m_reverse_name())
+
+
+def _synced_tables() -> List[str]:
+    tables = [model._meta.db_table for model in MODELS]
+    tables.extend(
+        model._meta.get_field(field_name).remote_field.through._meta.db_table
+        for model, field_name in RELATIONS)
+    # apply() records events in outbox of the target database.
+    tables.append(models.OutboxEvent._meta.db_table)
+    return tables
+
+
+def _columns(using: str) -> Dict[str, Set[str]]:
+    '''Column names of synced tables that exist in the database.'''
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        existing = set(connection.introspection.table_names(cursor))
+        return {
+            table: {
+                column.name
+                for column in connection.introspection.get_table_description(
+                    cursor, table)
+            }
+            for table in _synced_tables() if table in existing
+        }
+
+
+def schema_drift(source: str, target: str) -> List[str]:
+    '''
+    Differences between tables used by sync in source and target databases.
+    Empty if schemas match.
+    '''
+    source_columns = _columns(source)
+    target_columns = _columns(target)
+    problems = []
+    for table in _synced_tables():
+        if table not in target_columns:
+            problems.append(f'{table}: table is missing')
+            continue
+        missing = source_columns.get(table, set()) - target_columns[table]
+        extra = target_columns[table] - source_columns.get(table, set())
+        if missing:
+            problems.append(
+                f'{table}: missing columns {", ".join(sorted(missing))}')
+        if extra:
+            problems.append(
+                f'{table}: unknown columns {", ".join(sorted(extra))}')
+    return problems
+
+
+def row_hash(row: Row) -> str:
+    data = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def read_snapshot(using: str) -> Snapshot:
+    '''Reads all synced rows and m2m pairs from the database.'''
+    snapshot = Snapshot()
+    for model in MODELS:
+        snapshot.rows[model._meta.label] = {
+            str(row['pk']): row
+            for row in model.objects.using(using).values(
+                'pk', *_concrete_fields(model)).iterator()
+        }
+    for model, field_name in RELATIONS:
+        through, from_column, to_column = _through_fields(model, field_name)
+        snapshot.pairs[_relation_name(model, field_name)] = {
+            (str(from_id), str(to_id)): through_id
+            for through_id, from_id, to_id in through.objects.using(
+                using).values_list('id', from_column, to_column).iterator()
+        }
+    return snapshot
+
+
+def diff(source: Snapshot, target: Snapshot) -> SyncPlan:
+    '''Compares snapshots and returns changes to apply to the target.'''
+    model_diffs = []
+    for model in MODELS:
+        source_rows = source.rows[model._meta.label]
+        target_rows = target.rows[model._meta.label]
+        unique_fields = _unique_fields(model)
+        model_diff = ModelDiff(model)
+        for pk, row in source_rows.items():
+            if pk not in target_rows:
+                model_diff.created.append(pk)
+            elif row_hash(row) != row_hash(target_rows[pk]):
+                model_diff.updated.append(pk)
+                if any(row[f] != target_rows[pk][f] for f in unique_fields):
+                    model_diff.renamed.append(pk)
+        model_diff.deleted = [
+            pk for pk in target_rows if pk not in source_rows
+        ]
+        model_diffs.append(model_diff)
+
+    relation_diffs = []
+    for model, field_name in RELATIONS:
+        name = _relation_name(model, field_name)
+        source_pairs = source.pairs[name]
+        target_pairs = target.pairs[name]
+        relation_diff = RelationDiff(model, field_name)
+        relation_diff.added = [
+            pair for pair in source_pairs if pair not in target_pairs
+        ]
+        removed = [pair for pair in target_pairs if pair not in source_pairs]
+        relation_diff.removed = [target_pairs[pair] for pair in removed]
+        relation_diff.changed_objects = {
+            from_id
+            for from_id, _ in relation_diff.added + removed
+        }
+        relation_diffs.append(relation_diff)
+    return SyncPlan(source, model_diffs, relation_diffs)
+
+
+def _batches(items: List[Any]) -> List[List[Any]]:
+    return [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+
+
+def _instances(plan: SyncPlan, model: Type[db_models.Model],
+               pks: List[str]) -> List[db_models.Model]:
+    rows = plan.source.rows[model._meta.label]
+    fields = _concrete_fields(model)
+    return [model(**{f: rows[pk][f] for f in fields}) for pk in pks]
+
+
+def _move_unique_values(model_diff: ModelDiff, using: str) -> None:
+    '''Replaces unique values of renamed rows with temporary ones.'''
+    if not model_diff.renamed:
+        return
+    model = model_diff.model
+    fields = _unique_fields(model)
+    # Slugs have no "~", so temporary values don't clash with them.
+    temporary = [
+        model(pk=pk, **{f: f'~{pk}'
+                        for f in fields}) for pk in model_diff.renamed
+    ]
+    model.objects.using(using).bulk_update(temporary,
+                                           fields,
+                                           batch_size=BATCH_SIZE)
+
+
+def apply(plan: SyncPlan, using: str) -> None:
+    '''Applies changes to the database in a single transaction.'''
+    with transaction.atomic(using=using):
+        # Deletes go first so new rows can reuse unique slugs of deleted
+        # ones. They send signals so outbox records them, including cascades.
+        for model_diff in reversed(plan.models):
+            for batch in _batches(model_diff.deleted):
+                model_diff.model.objects.using(using).filter(
+                    pk__in=batch).delete()
+
+        for model_diff in plan.models:
+            _move_unique_values(model_diff, using)
+
+        for model_diff in plan.models:
+            model = model_diff.model
+            manager = model.objects.using(using)
+            fields = [
+                f.attname for f in model._meta.concrete_fields
+                if not f.primary_key
+            ]
+            manager.bulk_update(_instances(plan, model, model_diff.updated),
+                                fields,
+                                batch_size=BATCH_SIZE)
+            manager.bulk_create(_instances(plan, model, model_diff.created),
+                                batch_size=BATCH_SIZE)
+            # bulk operations don't send signals.
+            outbox.record_bulk(model, model_diff.created,
+                               models.OutboxAction.CREATE, using)
+            outbox.record_bulk(model, model_diff.updated,
+                               models.OutboxAction.UPDATE, using)
+
+        for relation_diff in plan.relations:
+            through, from_column, to_column = _through_fields(
+                relation_diff.model, relation_diff.field_name)
+            through.objects.using(using).bulk_create([
+                through(**{
+                    from_column: from_id,
+                    to_column: to_id
+                }) for from_id, to_id in relation_diff.added
+            ],
+                                                     batch_size=BATCH_SIZE)
+            for batch in _batches(relation_diff.removed):
+                through.objects.using(using).filter(id__in=batch).delete()
+            outbox.record_bulk(relation_diff.model,
+                               relation_diff.changed_objects,
+                               models.OutboxAction.UPDATE, using)
+
+        # Rows with auto-increment ids are inserted with explicit ids which
+        # doesn't move sequences. Reset them so new objects created on the
+        # target get unique ids.
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [d.model for d in plan.models if d.created]):
+                cursor.execute(sql)
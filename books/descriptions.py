@@ -0,0 +1,34 @@
+'''
+Descriptions of books, people and tags are rendered to HTML when the model is
+saved and stored in description_html field, so pages don't need to parse
+Markdown and sanitize HTML on every view. Rendering must produce the same HTML
+templates used to produce from description field:
+
+    book:   {{ book.description | markdownify:"book_description" | linebreaks }}
+    person: {{ person.description | linebreaks }}
+    tag:    {{ tag.description }}
+
+Existing rows are updated by render_descriptions command.
+'''
+
+from django.template import defaultfilters
+from django.utils.html import conditional_escape
+
+
+def render_book_description(description: str) -> str:
+    '''Renders Markdown book description to sanitized HTML.'''
+    # Markdown and bleach are slow to import and needed only when saving.
+    from markdownify.templatetags.markdownify import markdownify
+    return defaultfilters.linebreaks_filter(markdownify(
+        description, 'book_description'),
+                                            autoescape=True)
+
+
+def render_person_description(description: str) -> str:
+    '''Renders plain text person description to HTML paragraphs.'''
+    return defaultfilters.linebreaks_filter(description, autoescape=True)
+
+
+def render_tag_description(description: str) -> str:
+    '''Escapes plain text tag description.'''
+    return str(conditional_escape(description))
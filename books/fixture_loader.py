@@ -0,0 +1,172 @@
+'''
+Fast loading of data.json into the database, used by init_db_with_data
+instead of loaddata.
+
+loaddata deserializes the whole fixture and saves objects one by one. Here
+the fixture is parsed object by object and rows are inserted with
+bulk_create in batches per model, m2m relations with bulk_create of through
+rows. Constraint checks are disabled during the load, like loaddata does, so
+objects can reference ones that are later in the fixture, and checked once
+at the end. Signals are not sent, so rendered fields and outbox events are
+not created.
+
+Databases created from data.json are cached as sqlite files keyed by hash of
+data.json and migrations, see snapshot_path(). Copying a cached file is much
+faster than running migrations and loading data again.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from typing import IO, Any, Dict, Iterator, List, Tuple, Type
+import django
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers import python
+from django.db import connections, models as db_models, transaction
+
+DEFAULT_BATCH_SIZE = 1000
+READ_SIZE = 1 << 16
+
+SNAPSHOT_DIR = os.path.join(tempfile.gettempdir(), 'audiobooks_db_snapshots')
+
+
+def iter_json_list(f: IO[str],
+                   read_size: int = READ_SIZE) -> Iterator[Dict[str, Any]]:
+    '''Yields objects of a JSON list without reading the whole file.'''
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    # One of: '[', 'item', ','.
+    expect = '['
+
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if eof:
+                raise ValueError('Unexpected end of JSON list')
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        if expect != 'item' or buffer[0] == ']':
+            if buffer[0] == ']' and expect != '[':
+                return
+            if buffer[0] != expect:
+                raise ValueError(f'Expected "{expect}", got "{buffer[:20]}"')
+            buffer = buffer[1:]
+            expect = 'item'
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # Object is not read completely yet.
+            if eof:
+                raise
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+        expect = ','
+
+
+class _Batch:
+    '''Objects of a single model waiting to be inserted.'''
+
+    def __init__(self, model: Type[db_models.Model]):
+        self.model = model
+        self.objects: List[db_models.Model] = []
+        # m2m field -> (object pk, related pk) pairs.
+        self.m2m: Dict[str, List[Tuple[Any, Any]]] = {}
+
+    def add(self, obj: db_models.Model, m2m_data: Dict[str,
+                                                       List[Any]]) -> None:
+        self.objects.append(obj)
+        for field_name, related_pks in m2m_data.items():
+            self.m2m.setdefault(field_name, []).extend(
+                (obj.pk, related_pk) for related_pk in related_pks)
+
+    def insert(self, using: str, batch_size: int) -> None:
+        self.model.objects.using(using).bulk_create(self.objects,
+                                                    batch_size=batch_size)
+        for field_name, pairs in self.m2m.items():
+            field = self.model._meta.get_field(field_name)
+            through = field.remote_field.through
+            from_column = field.m2m_column_name()
+            to_column = field.m2m_reverse_name()
+            through.objects.using(using).bulk_create([
+                through(**{
+                    from_column: from_pk,
+                    to_column: to_pk
+                }) for from_pk, to_pk in pairs
+            ],
+                                                     batch_size=batch_size)
+        self.objects = []
+        self.m2m = {}
+
+
+def load(path: str,
+         using: str = 'default',
+         batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    '''
+    Loads fixture in JSON format into the database. Returns number of loaded
+    objects by model label.
+    '''
+    connection = connections[using]
+    counts: Dict[str, int] = {}
+    batches: Dict[str, _Batch] = {}
+    with open(path, 'r', encoding='utf8') as f, transaction.atomic(
+            using=using), connection.constraint_checks_disabled():
+        for deserialized in python.Deserializer(iter_json_list(f),
+                                                using=using):
+            model = type(deserialized.object)
+            label = model._meta.label
+            batch = batches.setdefault(label, _Batch(model))
+            batch.add(deserialized.object, deserialized.m2m_data or {})
+            counts[label] = counts.get(label, 0) + 1
+            if len(batch.objects) >= batch_size:
+                batch.insert(using, batch_size)
+        for batch in batches.values():
+            batch.insert(using, batch_size)
+
+        loaded_models = [batch.model for batch in batches.values()]
+        table_names = [model._meta.db_table for model in loaded_models]
+        for model in loaded_models:
+            table_names.extend(field.remote_field.through._meta.db_table
+                               for field in model._meta.many_to_many)
+        connection.check_constraints(table_names=table_names)
+
+        # Inserting explicit ids doesn't move sequences on Postgres.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), loaded_models):
+                cursor.execute(sql)
+    return counts
+
+
+def snapshot_path(fixture_path: str) -> str:
+    '''
+    Path of cached sqlite database created from the fixture. It changes when
+    the fixture, migrations or Django version change.
+    '''
+    digest = hashlib.sha256(django.get_version().encode('utf-8'))
+    files = [fixture_path]
+    for app_config in apps.get_app_configs():
+        if app_config.name.startswith('django.'):
+            continue
+        files.extend(
+            sorted(
+                glob.glob(os.path.join(app_config.path, 'migrations',
+                                       '*.py'))))
+    for file in files:
+        digest.update(os.path.basename(file).encode('utf-8'))
+        with open(file, 'rb') as f:
+            for line in f:
+                # Regenerated migrations differ only by creation time.
+                if not line.startswith(b'# Generated by Django'):
+                    digest.update(line)
+    return os.path.join(SNAPSHOT_DIR, f'{digest.hexdigest()}.sqlite3')
@@ -0,0 +1,199 @@
+'''
+Renditions of book covers and people photos. Original images can be large while
+on most pages they are shown as 150px cards. So for each image we generate
+several smaller versions in WebP and JPEG which are then served using srcset.
+See responsive_image template tag.
+
+Renditions are stored next to other media in "renditions" folder. Their names
+contain hash of the original image so they never need cache invalidation.
+Uploads are named by slug and prod storage overwrites files, so a replaced
+image keeps its name. To notice that, hash of the original is stored as
+"source_hash". It's compared only when a new file is uploaded or the name
+changes, other saves don't touch storage.
+Besides renditions we store tiny blurry placeholder (inlined as data URI) and
+dominant color of the image. They are shown while the image is loading.
+Information about generated renditions is stored in JSON field on the model:
+
+{
+    "version": 2,
+    "source": "covers/some-book.jpg",
+    "source_hash": "1a2b3c4d5e6f",
+    "width": 600,
+    "height": 600,
+    "color": "#a0b1c2",
+    "placeholder": "data:image/webp;base64,...",
+    "renditions": [
+        {"width": 150, "height": 150, "format": "webp", "name": "renditions/covers/some-book-1a2b3c4d5e6f-150.webp"},
+        ...
+    ]
+}
+'''
+
+import base64
+import hashlib
+import io
+import logging
+import os
+from typing import Any, Dict, List
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_FOLDER = 'renditions'
+
+# Increase when format of renditions info changes so that it gets regenerated.
+RENDITIONS_VERSION = 4
+
+# Placeholder is upscaled by browser which makes it blurry. Larger size makes
+# it look sharper but increases html size.
+PLACEHOLDER_SIZE_PX = 16
+
+# Cards are 150px wide, book and person pages show 275px images.
+# 300 and 600 cover those on high density screens.
+RENDITION_WIDTHS = [150, 300, 600]
+
+# (extension, PIL format, save options). WebP goes first as it's preferred
+# format, JPEG is fallback for browsers that don't support WebP.
+RENDITION_FORMATS = [
+    ('webp', 'WEBP', {
+        'quality': 80,
+        'method': 6
+    }),
+    ('jpeg', 'JPEG', {
+        'quality': 82,
+        'optimize': True,
+        'progressive': True
+    }),
+]
+
+
+def _hash_content(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def _encode(image: Image.Image, pil_format: str, options: Dict[str,
+                                                               Any]) -> bytes:
+    # Metadata like EXIF or ICC profiles is dropped as we don't pass it
+    # to save().
+    output = io.BytesIO()
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def _open_image(content: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(content))
+    # Some photos are stored rotated and rely on EXIF to be shown correctly.
+    # As EXIF is stripped - need to apply rotation to pixels.
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        # Flatten transparent images onto white background, WebP supports
+        # transparency but JPEG doesn't.
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            image = image.convert('RGB')
+    return image
+
+
+def _placeholder(image: Image.Image) -> str:
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE_PX, PLACEHOLDER_SIZE_PX))
+    content = _encode(small, 'WEBP', {'quality': 50})
+    return 'data:image/webp;base64,' + base64.b64encode(content).decode()
+
+
+def _dominant_color(image: Image.Image) -> str:
+    # Reduce image to a few colors and pick the one that covers most pixels.
+    # Average color would be muddy for covers with contrast parts.
+    palette_image = image.resize((64, 64)).quantize(colors=5)
+    palette = palette_image.getpalette()
+    assert palette
+    _, index = max(palette_image.getcolors())
+    red, green, blue = palette[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def build_renditions(field: FieldFile) -> Dict[str, Any]:
+    '''
+    Generates renditions for the given image field and stores them in the
+    same storage. Returns info that should be stored on the model.
+    '''
+    with field.open('rb') as f:
+        content = f.read()
+    return _build(field, content, _hash_content(content))
+
+
+def _build(field: FieldFile, content: bytes, digest: str) -> Dict[str, Any]:
+    image = _open_image(content)
+    folder, filename = os.path.split(field.name)
+    stem = os.path.splitext(filename)[0]
+
+    # Don't upscale images. If original is smaller than some widths - use
+    # original width instead.
+    widths = sorted({min(width, image.width) for width in RENDITION_WIDTHS})
+    renditions: List[Dict[str, Any]] = []
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, pil_format, options in RENDITION_FORMATS:
+            name = f'{RENDITIONS_FOLDER}/{folder}/{stem}-{digest}-{width}.{extension}'
+            # Names include hash of the original so existing files are always
+            # up to date.
+            if not field.storage.exists(name):
+                field.storage.save(
+                    name, ContentFile(_encode(resized, pil_format, options)))
+            renditions.append({
+                'width': width,
+                'height': height,
+                'format': extension,
+                'name': name,
+            })
+    return {
+        'version': RENDITIONS_VERSION,
+        'source': field.name,
+        'source_hash': digest,
+        'width': image.width,
+        'height': image.height,
+        'color': _dominant_color(image),
+        'placeholder': _placeholder(image),
+        'renditions': renditions,
+    }
+
+
+def _is_current(info: Dict[str, Any], field: FieldFile) -> bool:
+    return (bool(info) and info.get('source') == field.name
+            and info.get('version') == RENDITIONS_VERSION)
+
+
+def get_renditions(field: FieldFile, current: Dict[str,
+                                                   Any]) -> Dict[str, Any]:
+    '''
+    Returns renditions info for the field. Renditions are regenerated only if
+    image changed since they were generated last time.
+    '''
+    if not field:
+        return {}
+    if not field._committed:
+        # Newly uploaded file. Store it first so that renditions are based on
+        # the final name. It may replace the image with the same name, so
+        # its content is compared below.
+        field.save(field.name, field.file, save=False)
+    elif _is_current(current, field):
+        return current
+    try:
+        with field.open('rb') as f:
+            content = f.read()
+        digest = _hash_content(content)
+        if _is_current(current, field) and current['source_hash'] == digest:
+            return current
+        return _build(field, content, digest)
+    except OSError as e:
+        # Don't fail saving a model because of broken or missing image. Page
+        # falls back to the original image in that case.
+        logger.warning('Failed to build renditions for %s: %s', field.name, e)
+        return {}
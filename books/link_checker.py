@@ -0,0 +1,219 @@
+'''
+Concurrent HTTP checker for audiobook links. Used by check_links command and
+by tests that verify that pages of the site respond.
+
+All requests go through a single keep-alive session whose connection pool is
+bounded by the number of workers. On top of that each host gets its own
+concurrency and rate limit so that we don't hammer a single store when many
+links point to it.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# Some stores respond with 403 to requests that don't look like a browser.
+USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/110.0 Safari/537.36')
+
+# Statuses that are worth retrying as they usually mean temporary problem.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Some servers don't implement HEAD. For those we fallback to GET.
+HEAD_NOT_SUPPORTED_STATUSES = {405, 501}
+
+# Never wait longer than that between retries even if server asks so via
+# Retry-After header.
+MAX_RETRY_DELAY_SEC = 30
+
+
+@dataclass
+class LinkCheckResult:
+    '''Result of checking a single url.'''
+    url: str
+    # None if request failed without response, for example on timeout.
+    status_code: Optional[int]
+    # Short description of network error if there was no response.
+    error: str
+    # Time of the last attempt.
+    latency_ms: int
+
+    def is_ok(self) -> bool:
+        '''Whether url works. Redirects are fine, castbox returns 302.'''
+        return self.status_code is not None and self.status_code < 400
+
+
+class HostThrottle:
+    '''
+    Limits number of concurrent requests and request rate per host.
+    Use as a context manager around each request:
+
+        with throttle.acquire(url):
+            session.get(url)
+    '''
+
+    def __init__(self, max_concurrency: int, max_rate: float):
+        self.max_concurrency = max_concurrency
+        # Minimum delay between starts of two requests to the same host.
+        self.min_interval_sec = 1 / max_rate if max_rate > 0 else 0
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    def semaphore(self, host: str) -> threading.BoundedSemaphore:
+        '''Semaphore limiting number of concurrent requests to the host.'''
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_concurrency)
+            return self._semaphores[host]
+
+    def reserve_slot(self, host: str) -> float:
+        '''
+        Reserves next start time of a request to the host. Returns how long
+        caller should sleep before sending request.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval_sec
+            return slot - now
+
+    def acquire(self, url: str) -> '_HostSlot':
+        '''Blocks until request to the url's host is allowed.'''
+        host = urlparse(url).netloc
+        return _HostSlot(self, host)
+
+
+class _HostSlot:
+
+    def __init__(self, throttle: HostThrottle, host: str):
+        self.semaphore = throttle.semaphore(host)
+        self.throttle = throttle
+        self.host = host
+
+    def __enter__(self) -> None:
+        self.semaphore.acquire()
+        delay = self.throttle.reserve_slot(self.host)
+        if delay > 0:
+            time.sleep(delay)
+
+    def __exit__(self, *args) -> None:
+        self.semaphore.release()
+
+
+def make_session(pool_size: int) -> requests.Session:
+    '''
+    Creates session that keeps connections alive. pool_size should match
+    number of threads using the session, otherwise connections get discarded.
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size,
+                          pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def retry_delay(response: Optional[requests.Response], attempt: int,
+                backoff_sec: float) -> float:
+    '''
+    Exponential backoff before retry number attempt + 1, longer if the server
+    asks so via Retry-After.
+    '''
+    delay = backoff_sec * (2**attempt)
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+    return min(delay, MAX_RETRY_DELAY_SEC)
+
+
+class LinkChecker:
+    '''Checks urls concurrently. See module docs.'''
+
+    def __init__(self,
+                 concurrency: int = 10,
+                 per_host_concurrency: int = 2,
+                 per_host_rate: float = 5,
+                 retries: int = 2,
+                 backoff_sec: float = 1,
+                 timeout_sec: float = 20):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_sec = backoff_sec
+        self.timeout_sec = timeout_sec
+        self.throttle = HostThrottle(per_host_concurrency, per_host_rate)
+        self.session = make_session(concurrency)
+
+    def _request(self, method: str, url: str) -> requests.Response:
+        with self.throttle.acquire(url):
+            response = self.session.request(method,
+                                            url,
+                                            timeout=self.timeout_sec,
+                                            allow_redirects=False,
+                                            stream=True)
+            # We need only status, don't download body and give connection
+            # back to the pool.
+            response.close()
+            return response
+
+    def check(self, url: str) -> LinkCheckResult:
+        '''Checks single url, retrying temporary failures.'''
+        method = 'HEAD'
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            response = None
+            error = ''
+            try:
+                response = self._request(method, url)
+            except requests.RequestException as e:
+                error = f'{type(e).__name__}: {e}'[:500]
+            latency_ms = round((time.monotonic() - start) * 1000)
+            if (response is not None and method == 'HEAD'
+                    and response.status_code in HEAD_NOT_SUPPORTED_STATUSES):
+                method = 'GET'
+                continue
+            retriable = response is None or response.status_code in RETRY_STATUSES
+            if not retriable or attempt >= self.retries:
+                return LinkCheckResult(url=url,
+                                       status_code=None if response is None
+                                       else response.status_code,
+                                       error=error,
+                                       latency_ms=latency_ms)
+            time.sleep(retry_delay(response, attempt, self.backoff_sec))
+            attempt += 1
+
+    def check_all(self, urls: Iterable[str]) -> Iterator[LinkCheckResult]:
+        '''
+        Checks given urls concurrently. Yields results in the same order as
+        urls. Threads are stopped once all urls are checked.
+        '''
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            yield from executor.map(self.check, urls)
+        finally:
+            # On Ctrl-C or when caller fails to save a result don't wait for
+            # the rest of queued urls.
+            executor.shutdown(cancel_futures=True)
+
+    def close(self) -> None:
+        '''Closes all pooled connections.'''
+        self.session.close()
+
+
+def check_urls(urls: Iterable[str], **kwargs) -> List[LinkCheckResult]:
+    '''Convenience wrapper that checks urls using LinkChecker.'''
+    checker = LinkChecker(**kwargs)
+    try:
+        return list(checker.check_all(urls))
+    finally:
+        checker.close()
@@ -0,0 +1,310 @@
+'''
+See Command desription.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import datetime
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand, CommandError
+import requests
+
+from books import link_checker
+from books.models import Book, BookStatus, Language, LinkType, Person, Tag
+from books.views import BOOKS_PER_PAGE
+
+
+@dataclass
+class Route:
+    '''Group of similar requests, results are reported per route.'''
+    name: str
+    # Share of requests going to this route relative to other routes.
+    weight: int
+    # Returns random path for the route, e.g. /books/some-book.
+    make_path: Callable[[random.Random], str]
+
+
+@dataclass
+class RouteStats:
+    '''Results of requests to a single route.'''
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    # Status code or exception name to count.
+    error_kinds: Dict[str, int] = field(default_factory=dict)
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    '''Nearest-rank percentile of already sorted values.'''
+    if not sorted_values:
+        return 0
+    rank = math.ceil(share * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+
+def summarize(stats: RouteStats, elapsed_sec: float) -> Dict[str, Any]:
+    '''Builds JSON-serializable summary of route results.'''
+    latencies = sorted(stats.latencies_ms)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': stats.errors,
+        'error_rate': round(stats.errors / count, 4) if count else 0,
+        'error_kinds': stats.error_kinds,
+        'rps': round(count / elapsed_sec, 2) if elapsed_sec else 0,
+        'mean_ms': round(sum(latencies) / count, 1) if count else 0,
+        'p50_ms': round(percentile(latencies, 0.5), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+    }
+
+
+def _build_routes() -> List[Route]:
+    '''
+    Builds mix of requests similar to real traffic. Slugs are taken from the
+    same DB the server uses.
+    '''
+    books = list(
+        Book.objects.filter(status=BookStatus.ACTIVE).values_list('slug',
+                                                                  flat=True))
+    people = list(Person.objects.values_list('slug', flat=True))
+    tags = list(Tag.objects.values_list('slug', flat=True))
+    link_types = list(LinkType.objects.values_list('name', flat=True))
+    titles = list(
+        Book.objects.filter(status=BookStatus.ACTIVE).values_list('title',
+                                                                  flat=True))
+    if not books or not people or not tags:
+        raise CommandError(
+            'DB has no books, people or tags. Load data first, for example '
+            'using generate_synthetic_data command.')
+    pages = max(1, math.ceil(len(books) / BOOKS_PER_PAGE))
+
+    def catalog_path(r: random.Random) -> str:
+        params: Dict[str, str] = {}
+        if r.random() < 0.3:
+            params['lang'] = r.choice(Language.values).lower()
+        if r.random() < 0.2:
+            params['paid'] = r.choice(['true', 'false'])
+        if link_types and r.random() < 0.2:
+            params['links'] = r.choice(link_types)
+        if r.random() < 0.4:
+            # Deep pages are rare.
+            params['page'] = str(min(pages, int(r.expovariate(1 / 3)) + 1))
+        path = '/catalog'
+        if r.random() < 0.5:
+            path += '/' + r.choice(tags)
+        return path + ('?' + urlencode(params) if params else '')
+
+    def search_path(r: random.Random) -> str:
+        word = r.choice(r.choice(titles).split())
+        return '/search?' + urlencode({'query': word})
+
+    return [
+        Route('index', 15, lambda r: '/'),
+        Route('catalog', 20, catalog_path),
+        Route('book', 30, lambda r: '/books/' + r.choice(books)),
+        Route('person', 15, lambda r: '/person/' + r.choice(people)),
+        Route('search', 10, search_path),
+        Route('sitemap', 2, lambda r: '/sitemap.txt'),
+        Route('data_json', 3, lambda r: '/data.json'),
+    ]
+
+
+class Command(BaseCommand):
+    '''See help.'''
+
+    help = '''Load benchmark for the public site. Sends weighted mix of
+requests (index, catalog with filters, book, person, search, sitemap,
+data.json) to running server and reports latency percentiles, requests/sec and
+error rate per route. Server must use the same DB as this command.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url',
+                            default='http://127.0.0.1:8000',
+                            help='URL of the server to benchmark.')
+        parser.add_argument('--concurrency',
+                            type=int,
+                            default=8,
+                            help='Number of parallel clients.')
+        parser.add_argument('--duration-sec',
+                            type=float,
+                            default=30,
+                            help='How long to send requests.')
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=None,
+            help='Stop after this many requests instead of --duration-sec.')
+        parser.add_argument(
+            '--warmup-requests',
+            type=int,
+            default=20,
+            help='Requests sent before measuring, not included in results.')
+        parser.add_argument('--timeout-sec',
+                            type=float,
+                            default=30,
+                            help='Timeout of a single request.')
+        parser.add_argument('--seed',
+                            type=int,
+                            default=0,
+                            help='Seed used to pick urls.')
+        parser.add_argument('--output',
+                            help='Path of JSON file to store results in.')
+        parser.add_argument(
+            '--compare',
+            help='Path of JSON file with results of previous run to compare '
+            'against.')
+
+    def handle(self, *args, **options):
+        if options['duration_sec'] <= 0 and options['requests'] is None:
+            raise CommandError('Set positive --duration-sec or --requests.')
+        self.base_url = options['base_url'].rstrip('/')
+        self.timeout_sec = options['timeout_sec']
+        routes = _build_routes()
+        # Urls are picked from single seeded generator so runs with the same
+        # seed send the same sequence of requests.
+        rng = random.Random(options['seed'])
+        weights = [route.weight for route in routes]
+
+        def next_request() -> Route:
+            return rng.choices(routes, weights=weights)[0]
+
+        session = link_checker.make_session(options['concurrency'])
+        try:
+            if options['warmup_requests'] > 0:
+                print(f'Warming up with {options["warmup_requests"]} '
+                      'requests...')
+                self._run(session, next_request, rng, options['concurrency'],
+                          None, options['warmup_requests'])
+            print(f'Benchmarking {self.base_url} with concurrency '
+                  f'{options["concurrency"]}...')
+            stats, elapsed_sec = self._run(session, next_request, rng,
+                                           options['concurrency'],
+                                           options['duration_sec'],
+                                           options['requests'])
+        finally:
+            session.close()
+
+        results = {
+            'started_at': datetime.datetime.now().isoformat(),
+            'base_url': self.base_url,
+            'concurrency': options['concurrency'],
+            'seed': options['seed'],
+            'elapsed_sec': round(elapsed_sec, 2),
+            'routes': {
+                route.name: summarize(stats[route.name], elapsed_sec)
+                for route in routes if stats[route.name].latencies_ms
+            },
+            'total': summarize(_merge(stats.values()), elapsed_sec),
+        }
+        self._print_results(results)
+        if options['compare']:
+            with open(options['compare'], 'r') as f:
+                self._print_comparison(json.load(f), results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f'Stored results in {options["output"]}')
+
+    def _run(
+            self, session: requests.Session, next_request: Callable[[], Route],
+            rng: random.Random, concurrency: int,
+            duration_sec: Optional[float], max_requests: Optional[int]
+    ) -> Tuple[Dict[str, RouteStats], float]:
+        '''
+        Sends requests from `concurrency` threads until duration passes or
+        max_requests are sent. Returns stats per route and elapsed time.
+        '''
+        lock = threading.Lock()
+        stats: Dict[str, RouteStats] = {}
+        sent = 0
+        start = time.perf_counter()
+        deadline = None
+        if max_requests is None and duration_sec is not None:
+            deadline = start + duration_sec
+
+        def take_request() -> Optional[Tuple[Route, str]]:
+            nonlocal sent
+            with lock:
+                if max_requests is not None and sent >= max_requests:
+                    return None
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+                sent += 1
+                route = next_request()
+                return route, route.make_path(rng)
+
+        def worker() -> None:
+            while True:
+                request = take_request()
+                if request is None:
+                    return
+                route, path = request
+                error = None
+                request_start = time.perf_counter()
+                try:
+                    response = session.get(self.base_url + path,
+                                           timeout=self.timeout_sec)
+                    if response.status_code >= 400:
+                        error = str(response.status_code)
+                except requests.RequestException as e:
+                    error = type(e).__name__
+                latency_ms = (time.perf_counter() - request_start) * 1000
+                with lock:
+                    route_stats = stats.setdefault(route.name, RouteStats())
+                    route_stats.latencies_ms.append(latency_ms)
+                    if error:
+                        route_stats.errors += 1
+                        route_stats.error_kinds[error] = (
+                            route_stats.error_kinds.get(error, 0) + 1)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [
+                    executor.submit(worker) for _ in range(concurrency)
+            ]:
+                future.result()
+        return stats, time.perf_counter() - start
+
+    def _print_results(self, results: Dict[str, Any]) -> None:
+        print(f'{"route":12} {"requests":>8} {"errors":>7} {"rps":>8} '
+              f'{"p50":>8} {"p95":>8} {"p99":>8}')
+        rows = list(results['routes'].items()) + [('total', results['total'])]
+        for name, summary in rows:
+            print(f'{name:12} {summary["requests"]:8} '
+                  f'{summary["error_rate"]:7.1%} {summary["rps"]:8.1f} '
+                  f'{summary["p50_ms"]:6.1f}ms {summary["p95_ms"]:6.1f}ms '
+                  f'{summary["p99_ms"]:6.1f}ms')
+
+    def _print_comparison(self, before: Dict[str, Any],
+                          after: Dict[str, Any]) -> None:
+        print('Change compared to previous run:')
+        rows = [(name, before['routes'].get(name), summary)
+                for name, summary in after['routes'].items()]
+        rows.append(('total', before['total'], after['total']))
+        for name, old, new in rows:
+            if old is None:
+                continue
+            changes = []
+            for metric in ['rps', 'p50_ms', 'p95_ms', 'p99_ms']:
+                if old[metric]:
+                    change = (new[metric] - old[metric]) / old[metric]
+                    changes.append(f'{metric} {change:+.1%}')
+            changes.append(
+                f'error_rate {old["error_rate"]:.1%} -> {new["error_rate"]:.1%}'
+            )
+            print(f'{name:12} ' + ', '.join(changes))
+
+
+def _merge(all_stats: Iterable[RouteStats]) -> RouteStats:
+    merged = RouteStats()
+    for stats in all_stats:
+        merged.latencies_ms.extend(stats.latencies_ms)
+        merged.errors += stats.errors
+        for kind, count in stats.error_kinds.items():
+            merged.error_kinds[kind] = merged.error_kinds.get(kind, 0) + count
+    return merged
@@ -0,0 +1,111 @@
+'''
+See Command desription.
+'''
+
+import datetime
+from typing import List
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from books.link_checker import LinkChecker, LinkCheckResult
+from books.models import Link, LinkHealth
+
+# Results are written to DB in batches so that progress is not lost if the
+# command is interrupted.
+SAVE_BATCH_SIZE = 100
+
+
+def _save_results(links: List[Link], results: List[LinkCheckResult]) -> None:
+    now = timezone.now()
+    healths = [
+        LinkHealth(link=link,
+                   status_code=result.status_code,
+                   error=result.error,
+                   latency_ms=result.latency_ms,
+                   last_checked=now) for link, result in zip(links, results)
+    ]
+    with transaction.atomic():
+        LinkHealth.objects.filter(link__in=links).delete()
+        LinkHealth.objects.bulk_create(healths)
+
+
+class Command(BaseCommand):
+    '''See help.'''
+
+    help = 'Checks that links to audiobooks respond and stores results in DB.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours',
+            type=float,
+            default=24,
+            help='Only links that were checked earlier than that are checked.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Check all links regardless of when they were checked.',
+        )
+        parser.add_argument('--concurrency',
+                            type=int,
+                            default=10,
+                            help='Total number of parallel requests.')
+        parser.add_argument('--per-host-concurrency',
+                            type=int,
+                            default=2,
+                            help='Number of parallel requests to one host.')
+        parser.add_argument('--per-host-rate',
+                            type=float,
+                            default=5,
+                            help='Max requests per second to one host.')
+        parser.add_argument('--retries',
+                            type=int,
+                            default=2,
+                            help='Retries for timeouts, 429 and 5xx.')
+        parser.add_argument('--backoff-sec',
+                            type=float,
+                            default=1,
+                            help='Delay before first retry, doubles after.')
+        parser.add_argument('--timeout-sec', type=float, default=20)
+
+    def handle(self, *args, **options):
+        links = Link.objects.order_by('uuid')
+        if not options['all']:
+            stale_before = timezone.now() - datetime.timedelta(
+                hours=options['max_age_hours'])
+            links = links.filter(
+                Q(health__isnull=True)
+                | Q(health__last_checked__lt=stale_before))
+        links = list(links)
+        print(f'Checking {len(links)} links...')
+
+        checker = LinkChecker(
+            concurrency=options['concurrency'],
+            per_host_concurrency=options['per_host_concurrency'],
+            per_host_rate=options['per_host_rate'],
+            retries=options['retries'],
+            backoff_sec=options['backoff_sec'],
+            timeout_sec=options['timeout_sec'])
+        dead = 0
+        batch_links: List[Link] = []
+        batch_results: List[LinkCheckResult] = []
+        results = checker.check_all(l.url for l in links)
+        try:
+            for link, result in zip(links, results):
+                if not result.is_ok():
+                    dead += 1
+                    print(
+                        f'{result.url}: {result.status_code or result.error}')
+                batch_links.append(link)
+                batch_results.append(result)
+                if len(batch_links) >= SAVE_BATCH_SIZE:
+                    _save_results(batch_links, batch_results)
+                    batch_links, batch_results = [], []
+            _save_results(batch_links, batch_results)
+        finally:
+            # Stops checking queued urls if saving failed or on Ctrl-C.
+            results.close()
+            checker.close()
+        print(f'Completed! {dead} of {len(links)} links are dead.')
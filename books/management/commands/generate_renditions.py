@@ -0,0 +1,49 @@
+'''
+See Command desription.
+'''
+
+from django.core.management.base import BaseCommand
+
+from books import images
+from books.models import Book, Person
+
+
+class Command(BaseCommand):
+    '''See help.'''
+
+    help = 'Generates resized renditions for existing book covers and photos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate renditions even if image did not change.',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        # Use update() instead of save() to avoid touching other fields.
+        print('Generating renditions for covers...')
+        updated = 0
+        for book in Book.objects.exclude(cover_image='').only(
+                'uuid', 'cover_image', 'cover_image_renditions'):
+            current = {} if force else book.cover_image_renditions
+            renditions = images.get_renditions(book.cover_image, current)
+            if renditions != book.cover_image_renditions:
+                Book.objects.filter(uuid=book.uuid).update(
+                    cover_image_renditions=renditions)
+                updated += 1
+        print(f'Updated {updated} books.')
+
+        print('Generating renditions for photos...')
+        updated = 0
+        for person in Person.objects.exclude(photo='').only(
+                'uuid', 'photo', 'photo_renditions'):
+            current = {} if force else person.photo_renditions
+            renditions = images.get_renditions(person.photo, current)
+            if renditions != person.photo_renditions:
+                Person.objects.filter(uuid=person.uuid).update(
+                    photo_renditions=renditions)
+                updated += 1
+        print(f'Updated {updated} people.')
+        print('Completed!')
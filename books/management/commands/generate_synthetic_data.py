@@ -0,0 +1,455 @@
+'''
+See Command desription.
+'''
+
+import datetime
+import io
+import itertools
+import random
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+import uuid
+from PIL import Image, ImageDraw
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template import defaultfilters
+from unidecode import unidecode
+
+from books import descriptions, images, outbox
+from books.models import (Book, BookStatus, Gender, Language, Link,
+                          LinkAvailability, LinkHealth, LinkType, Narration,
+                          OutboxAction, Person, Tag)
+
+# (belarusian, russian) pairs.
+MALE_FIRST_NAMES = [
+    ('Алесь', 'Алесь'),
+    ('Андрэй', 'Андрей'),
+    ('Васіль', 'Василий'),
+    ('Уладзімір', 'Владимир'),
+    ('Янка', 'Янка'),
+    ('Міхась', 'Михаил'),
+    ('Павел', 'Павел'),
+    ('Сяргей', 'Сергей'),
+    ('Віктар', 'Виктор'),
+    ('Якуб', 'Якуб'),
+    ('Максім', 'Максим'),
+    ('Кастусь', 'Константин'),
+]
+FEMALE_FIRST_NAMES = [
+    ('Алена', 'Елена'),
+    ('Вольга', 'Ольга'),
+    ('Святлана', 'Светлана'),
+    ('Ларыса', 'Лариса'),
+    ('Наталля', 'Наталья'),
+    ('Ганна', 'Анна'),
+    ('Еўдакія', 'Евдокия'),
+    ('Марыя', 'Мария'),
+    ('Таццяна', 'Татьяна'),
+    ('Юлія', 'Юлия'),
+]
+# (belarusian male, belarusian female, russian male, russian female).
+LAST_NAMES = [
+    ('Караткевіч', 'Караткевіч', 'Короткевич', 'Короткевич'),
+    ('Быкаў', 'Быкава', 'Быков', 'Быкова'),
+    ('Брыль', 'Брыль', 'Брыль', 'Брыль'),
+    ('Мележ', 'Мележ', 'Мележ', 'Мележ'),
+    ('Гарэцкі', 'Гарэцкая', 'Горецкий', 'Горецкая'),
+    ('Багдановіч', 'Багдановіч', 'Богданович', 'Богданович'),
+    ('Шамякін', 'Шамякіна', 'Шамякин', 'Шамякина'),
+    ('Адамовіч', 'Адамовіч', 'Адамович', 'Адамович'),
+    ('Танк', 'Танк', 'Танк', 'Танк'),
+    ('Бядуля', 'Бядуля', 'Бедуля', 'Бедуля'),
+    ('Чорны', 'Чорная', 'Чёрный', 'Чёрная'),
+    ('Крапіва', 'Крапіва', 'Крапива', 'Крапива'),
+    ('Зуёнак', 'Зуёнак', 'Зуёнок', 'Зуёнок'),
+    ('Лынькоў', 'Лынькова', 'Лыньков', 'Лынькова'),
+    ('Пташнікаў', 'Пташнікава', 'Пташников', 'Пташникова'),
+    ('Навуменка', 'Навуменка', 'Науменко', 'Науменко'),
+]
+# (belarusian, russian) pairs used to build book titles.
+TITLE_ADJECTIVES = [
+    ('Дзікае', 'Дикое'),
+    ('Залатое', 'Золотое'),
+    ('Старое', 'Старое'),
+    ('Чорнае', 'Чёрное'),
+    ('Апошняе', 'Последнее'),
+    ('Ціхае', 'Тихое'),
+    ('Доўгае', 'Долгое'),
+    ('Зімовае', 'Зимнее'),
+]
+TITLE_NOUNS = [
+    ('паляванне', 'охота'),
+    ('лета', 'лето'),
+    ('возера', 'озеро'),
+    ('поле', 'поле'),
+    ('сэрца', 'сердце'),
+    ('неба', 'небо'),
+    ('мора', 'море'),
+    ('падарожжа', 'путешествие'),
+]
+TITLE_SUFFIXES = [
+    ('караля Стаха', 'короля Стаха'),
+    ('над Нёманам', 'над Неманом'),
+    ('у Мінску', 'в Минске'),
+    ('і зоркі', 'и звёзды'),
+    ('', ''),
+]
+TAG_NAMES = [
+    'Сучасная проза',
+    'Класікі беларускай літаратуры',
+    'Дзецям і падлеткам',
+    'Паэзія',
+    'Фэнтэзі',
+    'Дэтэктывы',
+    'Гісторыя',
+    'Навукова-папулярнае',
+    'Драматургія',
+    'Казкі',
+]
+LINK_TYPES = [
+    ('knihi_com', 'Knihi.com', LinkAvailability.EVERYWHERE),
+    ('kobo', 'Kobo', LinkAvailability.EVERYWHERE),
+    ('litres', 'ЛітРэс', LinkAvailability.UNAVAILABLE_IN_BELARUS),
+    ('youtube', 'YouTube', LinkAvailability.EVERYWHERE),
+    ('soundcloud', 'SoundCloud', LinkAvailability.EVERYWHERE),
+    ('apple_podcasts', 'Apple Podcasts', LinkAvailability.EVERYWHERE),
+    ('audible', 'Audible', LinkAvailability.USA_ONLY),
+]
+DESCRIPTION_WORDS = [
+    'кніга', 'гісторыя', 'героі', 'вёска', 'горад', 'каханне', 'вайна',
+    'сям\'я', 'таямніца', 'дарога', 'памяць', 'сябры', 'лес', 'рака', 'час'
+]
+COVER_COLORS = [(67, 157, 185), (155, 185, 67), (123, 131, 134),
+                (184, 100, 157), (208, 90, 75), (205, 186, 50)]
+
+SYNTHETIC_IMAGES_PREFIX = 'synthetic'
+
+# Release dates are counted back from this date. Not using today so that
+# generated data doesn't depend on when command was run.
+LATEST_RELEASE_DATE = datetime.date(2024, 1, 1)
+
+
+def _zipf_cum_weights(count: int, exponent: float) -> List[float]:
+    '''
+    Cumulative weights of Zipf distribution: few items are very popular while
+    most appear rarely. Same as in real catalog where few authors wrote many
+    books. Cumulative weights are passed to random.choices() as otherwise it
+    computes them on every call.
+    '''
+    return list(
+        itertools.accumulate(1 / (rank + 1)**exponent
+                             for rank in range(count)))
+
+
+def _placeholder_image(width: int, height: int, color: Tuple[int, int, int],
+                       index: int) -> bytes:
+    image = Image.new('RGB', (width, height), color)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle(
+        (width // 10, height // 2 - 2, width * 9 // 10, height // 2 + 2),
+        fill=(255, 255, 255))
+    draw.text((width // 10, height // 10), f'#{index}', fill=(255, 255, 255))
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=80)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    '''See help.'''
+
+    help = '''Generates synthetic catalog of books, people, narrations and
+links for load and capacity testing. Same seed and sizes always produce the
+same data.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed',
+                            type=int,
+                            default=0,
+                            help='Seed of random generator.')
+        parser.add_argument('--books',
+                            type=int,
+                            default=1000,
+                            help='Number of books to generate.')
+        parser.add_argument(
+            '--people',
+            type=int,
+            default=None,
+            help='Number of people to generate. Defaults to half of books.')
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=10,
+            help='Number of distinct placeholder images shared by covers and '
+            'photos. Use 0 to generate data without images.')
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=1000,
+                            help='Number of rows inserted in single query.')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete all existing books, people and tags first.')
+        parser.add_argument(
+            '--allow-non-sqlite',
+            action='store_true',
+            help='Allow writing to non-sqlite DB. Make sure it is not prod!')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' and not options['allow_non_sqlite']:
+            raise CommandError(
+                f'Refusing to write synthetic data to {connection.vendor} DB. '
+                'Pass --allow-non-sqlite if this is intended.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        books_count = options['books']
+        people_count = options['people']
+        if people_count is None:
+            people_count = max(1, books_count // 2)
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                self._clear()
+            covers, photos = self._create_images(options['images'])
+            link_types = self._create_link_types()
+            tags = self._create_tags()
+            people = self._create_people(people_count, photos)
+            self._create_books(books_count, people, tags, link_types, covers)
+        print(f'Completed in {time.perf_counter() - start:.1f}s!')
+
+    def _clear(self) -> None:
+        print('Deleting existing data...')
+        # Plain DELETE as ORM delete() loads all rows to handle cascades
+        # which takes longer than generating data. Tables are cleared so
+        # that foreign keys point to already deleted rows.
+        models = [
+            LinkHealth, Link, Narration.narrators.through, Narration,
+            Book.authors.through, Book.translators.through, Book.tag.through,
+            Book, Person, Tag, LinkType
+        ]
+        for model in outbox.TRACKED_MODELS:
+            outbox.record_bulk(model, model.objects.values_list('pk',
+                                                                flat=True),
+                               OutboxAction.DELETE)
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute('DELETE FROM ' +
+                               connection.ops.quote_name(model._meta.db_table))
+
+    def _uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _bulk_create(self, model: Any, objects: Sequence[Any]) -> None:
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if model in outbox.TRACKED_MODELS:
+            outbox.record_bulk(model, [o.pk for o in objects],
+                               OutboxAction.CREATE)
+        print(f'Inserted {len(objects)} {model._meta.verbose_name_plural}')
+
+    def _create_images(
+            self, count: int
+    ) -> Tuple[List[Tuple[str, Dict]], List[Tuple[str, Dict]]]:
+        '''
+        Stores few placeholder images with renditions. They are shared by
+        all books and people as generating image per book would be slow.
+        Returns (name, renditions) of covers and photos.
+        '''
+        covers: List[Tuple[str, Dict]] = []
+        photos: List[Tuple[str, Dict]] = []
+        for i in range(count):
+            color = COVER_COLORS[i % len(COVER_COLORS)]
+            for folder, size, result in [('covers', (600, 600), covers),
+                                         ('photos', (400, 600), photos)]:
+                name = f'{folder}/{SYNTHETIC_IMAGES_PREFIX}-{i}.jpg'
+                if not default_storage.exists(name):
+                    default_storage.save(
+                        name, ContentFile(_placeholder_image(*size, color, i)))
+                field = Book(cover_image=name).cover_image
+                result.append((name, images.get_renditions(field, {})))
+        if count:
+            print(f'Stored {count} placeholder covers and photos')
+        return covers, photos
+
+    def _create_link_types(self) -> List[LinkType]:
+        link_types = []
+        for name, caption, availability in LINK_TYPES:
+            link_type, _ = LinkType.objects.get_or_create(
+                name=name,
+                defaults={
+                    'caption': caption,
+                    'icon': f'icons/{name}.png',
+                    'availability': availability,
+                })
+            link_types.append(link_type)
+        return link_types
+
+    def _create_tags(self) -> List[Tag]:
+        tags = []
+        for name in TAG_NAMES:
+            tag = Tag.objects.filter(name=name).first()
+            if tag is None:
+                tag = Tag.objects.create(name=name,
+                                         slug=defaultfilters.slugify(
+                                             unidecode(name)))
+            tags.append(tag)
+        return tags
+
+    def _create_people(self, count: int,
+                       photos: List[Tuple[str, Dict]]) -> List[Person]:
+        people = []
+        for i in range(count):
+            gender = self.rng.choices([Gender.MALE, Gender.FEMALE],
+                                      weights=[6, 4])[0]
+            first_names = (MALE_FIRST_NAMES
+                           if gender == Gender.MALE else FEMALE_FIRST_NAMES)
+            first, first_ru = self.rng.choice(first_names)
+            last_male, last_female, last_ru_male, last_ru_female = self.rng.choice(
+                LAST_NAMES)
+            if gender == Gender.MALE:
+                last, last_ru = last_male, last_ru_male
+            else:
+                last, last_ru = last_female, last_ru_female
+            name = f'{first} {last}'
+            description = self._description()
+            person = Person(
+                uuid=self._uuid(),
+                name=name,
+                name_ru=f'{first_ru} {last_ru}',
+                # Index keeps slugs unique as names repeat.
+                slug=f'{defaultfilters.slugify(unidecode(name))}-{i}',
+                gender=gender,
+                description=description,
+                # bulk_create doesn't call save() which renders it.
+                description_html=descriptions.render_person_description(
+                    description),
+                date_of_birth=datetime.date(1850, 1, 1) +
+                datetime.timedelta(days=self.rng.randrange(150 * 365)))
+            # Most people don't have photos.
+            if photos and self.rng.random() < 0.3:
+                person.photo, person.photo_renditions = self.rng.choice(photos)
+            people.append(person)
+        self._bulk_create(Person, people)
+        return people
+
+    def _description(self) -> str:
+        sentences = []
+        for _ in range(self.rng.randint(1, 6)):
+            words = self.rng.choices(DESCRIPTION_WORDS,
+                                     k=self.rng.randint(5, 15))
+            sentences.append(' '.join(words).capitalize() + '.')
+        return ' '.join(sentences)
+
+    def _title(self) -> Tuple[str, str]:
+        adjective, adjective_ru = self.rng.choice(TITLE_ADJECTIVES)
+        noun, noun_ru = self.rng.choice(TITLE_NOUNS)
+        suffix, suffix_ru = self.rng.choice(TITLE_SUFFIXES)
+        return (f'{adjective} {noun} {suffix}'.strip(),
+                f'{adjective_ru} {noun_ru} {suffix_ru}'.strip())
+
+    def _create_books(self, count: int, people: List[Person], tags: List[Tag],
+                      link_types: List[LinkType],
+                      covers: List[Tuple[str, Dict]]) -> None:
+        # Authors and narrators are shuffled separately so that most prolific
+        # authors aren't also most prolific narrators.
+        authors = list(people)
+        self.rng.shuffle(authors)
+        narrators = list(people)
+        self.rng.shuffle(narrators)
+        author_cum_weights = _zipf_cum_weights(len(authors), 1.1)
+        narrator_cum_weights = _zipf_cum_weights(len(narrators), 1.3)
+        tag_cum_weights = _zipf_cum_weights(len(tags), 0.8)
+        link_cum_weights = _zipf_cum_weights(len(link_types), 0.7)
+
+        books: List[Book] = []
+        narrations: List[Narration] = []
+        links: List[Link] = []
+        book_authors = []
+        book_translators = []
+        book_tags = []
+        narration_narrators = []
+        for i in range(count):
+            title, title_ru = self._title()
+            description = self._description()
+            book = Book(
+                uuid=self._uuid(),
+                title=title,
+                title_ru=title_ru,
+                slug=f'{defaultfilters.slugify(unidecode(title))}-{i}',
+                description=description,
+                description_html=descriptions.render_book_description(
+                    description),
+                # Newer books are more common.
+                date=LATEST_RELEASE_DATE -
+                datetime.timedelta(days=int(self.rng.expovariate(1 / 700))),
+                duration_sec=datetime.timedelta(
+                    minutes=self.rng.randint(20, 1500)),
+                status=self.rng.choices([BookStatus.ACTIVE, BookStatus.HIDDEN],
+                                        weights=[95, 5])[0],
+                promoted=self.rng.random() < 0.01)
+            if covers and self.rng.random() < 0.7:
+                book.cover_image, book.cover_image_renditions = self.rng.choice(
+                    covers)
+            books.append(book)
+
+            for author in set(
+                    self.rng.choices(authors,
+                                     cum_weights=author_cum_weights,
+                                     k=self.rng.choices([1, 2, 3],
+                                                        weights=[85, 12,
+                                                                 3])[0])):
+                book_authors.append(
+                    Book.authors.through(book_id=book.uuid,
+                                         person_id=author.uuid))
+            if self.rng.random() < 0.15:
+                book_translators.append(
+                    Book.translators.through(
+                        book_id=book.uuid,
+                        person_id=self.rng.choice(people).uuid))
+            for tag in set(
+                    self.rng.choices(tags,
+                                     cum_weights=tag_cum_weights,
+                                     k=self.rng.randint(1, 3))):
+                book_tags.append(
+                    Book.tag.through(book_id=book.uuid, tag_id=tag.id))
+
+            narrations_count = self.rng.choices([1, 2, 3], weights=[80, 15,
+                                                                    5])[0]
+            for _ in range(narrations_count):
+                narration = Narration(
+                    uuid=self._uuid(),
+                    book_id=book.uuid,
+                    paid=self.rng.random() < 0.25,
+                    language=self.rng.choices(
+                        [Language.BELARUSIAN, Language.RUSSIAN],
+                        weights=[85, 15])[0])
+                narrations.append(narration)
+                for narrator in set(
+                        self.rng.choices(narrators,
+                                         cum_weights=narrator_cum_weights,
+                                         k=self.rng.choices([1, 2],
+                                                            weights=[90,
+                                                                     10])[0])):
+                    narration_narrators.append(
+                        Narration.narrators.through(
+                            narration_id=narration.uuid,
+                            person_id=narrator.uuid))
+                for link_type in set(
+                        self.rng.choices(link_types,
+                                         cum_weights=link_cum_weights,
+                                         k=self.rng.randint(1, 4))):
+                    links.append(
+                        Link(uuid=self._uuid(),
+                             narration_id=narration.uuid,
+                             url_type=link_type,
+                             url=f'https://example.com/{link_type.name}/'
+                             f'{narration.uuid}'))
+
+        self._bulk_create(Book, books)
+        self._bulk_create(Book.authors.through, book_authors)
+        self._bulk_create(Book.translators.through, book_translators)
+        self._bulk_create(Book.tag.through, book_tags)
+        self._bulk_create(Narration, narrations)
+        self._bulk_create(Narration.narrators.through, narration_narrators)
+        self._bulk_create(Link, links)
@@ -3,9 +3,16 @@ See Command desription.
 '''
 
 import os
+import shutil
+import time
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 from django.conf import settings
+from django.db import connections
+
+from books import fixture_loader
+
+DATA_FILE = 'data/data.json'
 
 
 class Command(BaseCommand):
@@ -24,6 +31,12 @@ class Command(BaseCommand):
             help=
             'Creates superuser with using given email. Password is read from DJANGO_SUPERUSER_PASSWORD variable',
         )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help=
+            'Always creates database from scratch instead of copying cached one.',
+        )
 
     def handle(self, *args, **options):
         db_path = settings.DATABASES['default']['NAME']
@@ -33,11 +46,27 @@ class Command(BaseCommand):
             )
             return
         print(f'Creating database {db_path}')
+        start = time.monotonic()
         call_command('makemigrations')
-        call_command('migrate', 'books', 'zero')
-        call_command('migrate', 'user', 'zero')
-        call_command('migrate')
-        call_command('loaddata', 'data/data.json')
+        is_sqlite = settings.DATABASES['default']['ENGINE'].endswith('sqlite3')
+        use_cache = is_sqlite and not options['no_cache']
+        snapshot = fixture_loader.snapshot_path(DATA_FILE)
+        if use_cache and os.path.exists(snapshot):
+            print(f'Copying cached database {snapshot}')
+            connections['default'].close()
+            shutil.copyfile(snapshot, db_path)
+        else:
+            self._create_db()
+            if use_cache:
+                connections['default'].close()
+                os.makedirs(fixture_loader.SNAPSHOT_DIR, exist_ok=True)
+                # Copy under temporary name so that concurrent runs never
+                # see partially written snapshot.
+                tmp_snapshot = f'{snapshot}.{os.getpid()}.tmp'
+                shutil.copyfile(db_path, tmp_snapshot)
+                os.replace(tmp_snapshot, snapshot)
+                print(f'Cached database in {snapshot}')
+        print(f'Database created in {time.monotonic() - start:.1f}s')
         if 'create_superuser' in options and options[
                 'create_superuser'] is not None:
             superuser_pass = os.environ.get('DJANGO_SUPERUSER_PASSWORD', None)
@@ -46,3 +75,13 @@ class Command(BaseCommand):
             call_command('createsuperuser', '--no-input', email=email)
             print(f'Create superuser {email} with pass {superuser_pass}')
         print('Completed!')
+
+    def _create_db(self) -> None:
+        call_command('migrate', 'books', 'zero')
+        call_command('migrate', 'user', 'zero')
+        call_command('migrate')
+        counts = fixture_loader.load(DATA_FILE)
+        for label, count in counts.items():
+            print(f'Loaded {count} {label}')
+        # Loader doesn't call save() so rendered fields have to be filled.
+        call_command('render_descriptions')
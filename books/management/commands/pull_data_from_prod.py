@@ -2,7 +2,6 @@
 Pulls data and images from production to local repo.
 '''
 
-from itertools import chain
 import subprocess
 import os
 import tempfile
@@ -11,7 +10,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 import django
 
-from books.models import Book, Link, LinkType, Narration, Person, Tag
+from books import data_dump
 
 REMOTE_DB = 'remote'
 
@@ -20,6 +19,19 @@ class Command(BaseCommand):
     '''Pulls data and images from production to local repo.'''
     help = 'Pulls data and images from production to local repo.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--parallel',
+            type=int,
+            default=1,
+            help='Number of tables to dump in parallel connections. Tables are '
+            'read in separate transactions, so use it only when data is not '
+            'being edited.')
+        parser.add_argument('--chunk-size',
+                            type=int,
+                            default=data_dump.DEFAULT_CHUNK_SIZE,
+                            help='Number of rows read at once.')
+
     def handle(self, *args, **options):
         try:
             django.db.connections[REMOTE_DB].ensure_connection()
@@ -31,7 +43,7 @@ class Command(BaseCommand):
             return
         db_path = settings.DATABASES[REMOTE_DB]['NAME']
         print(f'Using database {db_path}')
-        for dir in ['covers', 'photos', 'icons']:
+        for dir in ['covers', 'photos', 'icons', 'renditions']:
             full_dir = os.path.join('data', dir)
             print(f'Pulling images to {dir}')
             subprocess.run([
@@ -42,22 +54,17 @@ class Command(BaseCommand):
 
         print('Dumping data from DB.')
 
-        all_people = Person.objects.using(REMOTE_DB).all().order_by('uuid')
-        all_tags = Tag.objects.using(REMOTE_DB).all()
-        all_books = Book.objects.using(REMOTE_DB).all().prefetch_related(
-            'authors', 'translators', 'tag').order_by('uuid')
-        all_narrations = Narration.objects.using(
-            REMOTE_DB).all().prefetch_related('narrators').order_by('uuid')
-        all_link_types = LinkType.objects.using(REMOTE_DB).all()
-        all_links = Link.objects.using(REMOTE_DB).all().order_by('uuid')
-        all_objects = list(
-            chain(all_people, all_tags, all_books, all_narrations,
-                  all_link_types, all_links))
-        with open('data/data.json', 'w', encoding='utf8') as f:
-            django.core.serializers.serialize('json',
-                                              all_objects,
-                                              indent=2,
-                                              stream=f)
+        # Write to a temporary file first so that failed dump doesn't leave
+        # data.json truncated.
+        tmp_file = 'data/data.json.tmp'
+        with open(tmp_file, 'w', encoding='utf8') as f:
+            stats = data_dump.dump(REMOTE_DB,
+                                   f,
+                                   chunk_size=options['chunk_size'],
+                                   workers=options['parallel'])
+        os.replace(tmp_file, 'data/data.json')
+        for table_stats in stats:
+            print(f'  {table_stats.report()}')
 
         last_pull_file = os.path.join(tempfile.gettempdir(),
                                       'audiobooks_last_pull')
@@ -3,49 +3,43 @@ Pushes books data and images to production.
 '''
 
 import datetime
-import io
 import os
 import subprocess
 import tempfile
-from typing import Iterable
-from django.db import models, connections
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 
 import django
 
-from books.models import Book, Link, LinkType, Narration, Person, Tag
+from books import data_sync
 
 REMOTE_DB = 'remote'
 
 
-def bulk_create_manytomany_relations(model_from, field_name: str,
-                                     model_from_name: str, model_to_name: str,
-                                     models: Iterable[models.Model]):
-    '''See https://stackoverflow.com/a/62658821'''
-    through_objs = []
-    for model in models:
-        for sec_model in getattr(model, field_name).all():
-            model_id = model.uuid if hasattr(model, 'uuid') else model.id
-            sec_model_id = sec_model.uuid if hasattr(sec_model,
-                                                     'uuid') else sec_model.id
-
-            through_objs.append(
-                getattr(model_from, field_name).through(
-                    **{
-                        f"{model_from_name.lower()}_id": model_id,
-                        f"{model_to_name.lower()}_id": sec_model_id,
-                    }))
-    getattr(
-        model_from,
-        field_name).through.objects.using(REMOTE_DB).bulk_create(through_objs)
-
-
 class Command(BaseCommand):
     '''See module docs.'''
-    help = 'Pushes books data and images to production.'
+    help = '''Pushes books data and images to production. Only differences
+between local data and production are written, in a single transaction. See
+books/data_sync.py.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print changes that would be pushed without pushing them.')
+        parser.add_argument(
+            '--rebuild-schema',
+            action='store_true',
+            help='If remote schema differs from local one, recreate all books '
+            'tables on remote (migrate books zero, migrate books) and push '
+            'all rows. This also drops tables that are not pushed: link '
+            'health (check_links rechecks all links), Algolia records (next '
+            'push_data_to_algolia re-pushes the whole index) and outbox. '
+            'Prod has no books data until the push completes.')
 
     def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        rebuild_schema = options['rebuild_schema']
 
         last_pull_file = os.path.join(tempfile.gettempdir(),
                                       'audiobooks_last_pull')
@@ -72,63 +66,57 @@ class Command(BaseCommand):
                 'audiobooks-prod"=tcp:5432')
             return
 
-        for dir in ['covers', 'photos', 'icons']:
+        print('Initializing local DB')
+        call_command('init_db_with_data')
+
+        if not dry_run:
+            # Applies new migrations if they were added on top of the ones
+            # recorded on remote, see README.
+            call_command('migrate', 'books', database=REMOTE_DB)
+        # Remote schema has to match local one to compare rows. Migrations
+        # aren't tracked by git, so remote may have recorded a migration with
+        # the same name but different content.
+        drift = data_sync.schema_drift('default', REMOTE_DB)
+        if drift:
+            print('Remote schema differs from local one:')
+            for line in drift:
+                print(f'  {line}')
+            if dry_run or not rebuild_schema:
+                print('Cannot compare data. Run with --rebuild-schema to '
+                      'recreate books tables on remote and push all rows.')
+                return
+            answer = input(
+                'All books tables on remote will be dropped, including link '
+                'health, Algolia records and outbox, and prod will be empty '
+                'until the push completes. Continue? yes/no\n')
+            if answer != 'yes':
+                return
+            print('Recreating books tables on remote')
+            call_command('migrate', 'books', 'zero', database=REMOTE_DB)
+            call_command('migrate', 'books', database=REMOTE_DB)
+            drift = data_sync.schema_drift('default', REMOTE_DB)
+            assert not drift, f'Schema still differs: {drift}'
+
+        print('Comparing local data with remote DB')
+        plan = data_sync.diff(data_sync.read_snapshot('default'),
+                              data_sync.read_snapshot(REMOTE_DB))
+        for line in plan.report():
+            print(f'  {line}')
+        if dry_run:
+            print('Dry run, nothing pushed.')
+            return
+
+        for dir in ['covers', 'photos', 'icons', 'renditions']:
             full_dir = os.path.join('data', dir)
             print(f'Pushing {dir}')
             subprocess.run(
                 ['gsutil', '-m', 'rsync', full_dir, f'gs://books_media/{dir}'],
                 check=True)
 
-        print('Initializing local DB')
-        call_command('init_db_with_data')
-
-        print('Pushing data to remote DB')
-        call_command('migrate', 'books', 'zero', database=REMOTE_DB)
-        call_command('migrate', 'books', database=REMOTE_DB)
-
-        print('Creating people...')
-        Person.objects.using(REMOTE_DB).bulk_create(Person.objects.all())
-
-        print('Creating tags...')
-        Tag.objects.using(REMOTE_DB).bulk_create(Tag.objects.all())
-
-        print('Creating books...')
-        books = Book.objects.all().prefetch_related('authors', 'tag',
-                                                    'translators')
-        Book.objects.using(REMOTE_DB).bulk_create(books)
-        bulk_create_manytomany_relations(Book, 'authors', 'book', 'person',
-                                         books)
-        bulk_create_manytomany_relations(Book, 'translators', 'book', 'person',
-                                         books)
-        bulk_create_manytomany_relations(Book, 'tag', 'book', 'tag', books)
-
-        print('Creating narrations...')
-        narrations = Narration.objects.all().prefetch_related(
-            'book', 'narrators')
-        Narration.objects.using(REMOTE_DB).bulk_create(narrations)
-        bulk_create_manytomany_relations(Narration, 'narrators', 'narration',
-                                         'person', narrations)
-
-        print('Creating link types...')
-        LinkType.objects.using(REMOTE_DB).bulk_create(LinkType.objects.all())
-
-        print('Creating links...')
-        Link.objects.using(REMOTE_DB).bulk_create(Link.objects.all())
-
-        # When inserting models with auto-incerment fields corresponding
-        # sequences are not updated and stay at 1. Which means trying to create
-        # new objects will throw "not unique primary key" error. So need
-        # manually reset sequences.
-        print('Resetting sequences...')
-        output = io.StringIO()
-        call_command('sqlsequencereset',
-                     'books',
-                     stdout=output,
-                     no_color=True,
-                     database=REMOTE_DB)
-        sql = output.getvalue()
-        with connections[REMOTE_DB].cursor() as cursor:
-            cursor.execute(sql)
-        output.close()
+        if plan.is_empty():
+            print('Remote DB is up to date.')
+        else:
+            print('Pushing changes to remote DB')
+            data_sync.apply(plan, REMOTE_DB)
 
         print('Completed!')
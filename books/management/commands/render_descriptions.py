@@ -0,0 +1,45 @@
+'''
+See Command desription.
+'''
+
+from typing import Callable, Type, Union
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books import descriptions, outbox
+from books.models import Book, OutboxAction, Person, Tag
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    '''See help.'''
+
+    help = '''Renders description_html of books, people and tags from their
+descriptions. Needed for rows that were created without calling save(), for
+example loaded by loaddata, or after rendering changes.'''
+
+    def handle(self, *args, **options):
+        self._render(Book, descriptions.render_book_description)
+        self._render(Person, descriptions.render_person_description)
+        self._render(Tag, descriptions.render_tag_description)
+        print('Completed!')
+
+    def _render(self, model: Type[Union[Book, Person, Tag]],
+                render: Callable[[str], str]) -> None:
+        print(
+            f'Rendering descriptions of {model._meta.verbose_name_plural}...')
+        # Use bulk_update instead of save() to avoid touching other fields.
+        changed = []
+        for obj in model.objects.only('pk', 'description',
+                                      'description_html').iterator():
+            html = render(obj.description)
+            if html != obj.description_html:
+                obj.description_html = html
+                changed.append(obj)
+        with transaction.atomic():
+            model.objects.bulk_update(changed, ['description_html'],
+                                      batch_size=BATCH_SIZE)
+            outbox.record_bulk(model, [obj.pk for obj in changed],
+                               OutboxAction.UPDATE)
+        print(f'Updated {len(changed)} {model._meta.verbose_name_plural}.')
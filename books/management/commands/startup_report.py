@@ -0,0 +1,134 @@
+'''
+See Command desription.
+'''
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Executed in a fresh interpreter. Measures phases of app start in the same
+# order as WSGI server does them and prints them as JSON.
+STARTUP_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+import django
+django_imported = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+settings_loaded = time.perf_counter()
+django.setup(set_prefix=False)
+apps_loaded = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+urls_loaded = time.perf_counter()
+print(json.dumps({
+    'django_import': django_imported - start,
+    'settings': settings_loaded - django_imported,
+    'apps': apps_loaded - settings_loaded,
+    'wsgi_and_urls': urls_loaded - apps_loaded,
+}))
+'''
+
+PHASES = ['interpreter', 'django_import', 'settings', 'apps', 'wsgi_and_urls']
+
+
+def parse_import_times(output: str) -> Dict[str, float]:
+    '''
+    Parses output of python -X importtime. Returns cumulative import time in
+    ms for each top-level package, counting only imports not nested into other
+    imports.
+    '''
+    packages: Dict[str, float] = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level.
+        if name.startswith('  '):
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative) / 1000
+    return packages
+
+
+class Command(BaseCommand):
+    '''See help.'''
+
+    help = '''Measures how long it takes to start the app in a fresh Python
+process: interpreter start, importing django, loading settings, setting up
+apps and models, loading WSGI app and urls. Also shows packages that take
+longest to import. Use it to track cold start time of App Engine instances.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Number of times to start the app. Median is reported.')
+        parser.add_argument('--top',
+                            type=int,
+                            default=15,
+                            help='Number of slowest packages to show.')
+        parser.add_argument('--output',
+                            help='Path of JSON file to store results in.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+        phase_runs: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+        package_runs: Dict[str, List[float]] = {}
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                env=env,
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=False)
+            total = time.perf_counter() - start
+            if process.returncode != 0:
+                raise CommandError('App failed to start:\n' + process.stderr)
+            phases = json.loads(process.stdout.strip().splitlines()[-1])
+            phases['interpreter'] = total - sum(phases.values())
+            for phase in PHASES:
+                phase_runs[phase].append(phases[phase] * 1000)
+            for package, ms in parse_import_times(process.stderr).items():
+                package_runs.setdefault(package, []).append(ms)
+
+        phases_ms = {
+            phase: round(statistics.median(runs), 1)
+            for phase, runs in phase_runs.items()
+        }
+        packages_ms = sorted(((package, round(statistics.median(runs), 1))
+                              for package, runs in package_runs.items()),
+                             key=lambda item: item[1],
+                             reverse=True)[:options['top']]
+        results = {
+            'settings_module': settings.SETTINGS_MODULE,
+            'runs': options['runs'],
+            'total_ms': round(sum(phases_ms.values()), 1),
+            'phases_ms': phases_ms,
+            'slowest_imports_ms': dict(packages_ms),
+        }
+
+        print(f'Startup time of {settings.SETTINGS_MODULE}, median of '
+              f'{options["runs"]} runs:')
+        for phase, ms in phases_ms.items():
+            print(f'  {phase:15} {ms:8.1f}ms')
+        print(f'  {"total":15} {results["total_ms"]:8.1f}ms')
+        print('Slowest top-level imports:')
+        for package, ms in packages_ms:
+            print(f'  {package:25} {ms:8.1f}ms')
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f'Stored results in {options["output"]}')
@@ -1,5 +1,7 @@
 from django.db import models
 
+from books import search
+
 
 class BookManager(models.Manager):
 
@@ -31,16 +33,23 @@ class BookManager(models.Manager):
         return self.handle_filter(field, value)
 
     def _handle_title(self, value: str) -> None:
-        return self.filter(title__icontains=value)
+        return search.search(self.all(), ['title'], value)
 
     def _handle_title_ru(self, value: str) -> None:
-        return self.filter(title_ru__icontains=value)
+        return search.search(self.all(), ['title_ru'], value)
 
     def _handle_author(self, value: str) -> None:
-        return self.filter(authors__name__icontains=value)
+        # Imported here as models module imports this one.
+        from books.models import Person
+        authors = search.search(Person.objects.all(), ['name', 'name_ru'],
+                                value)
+        return self.filter(authors__in=authors.values('uuid')).distinct()
 
     def _handle_tag(self, value: str) -> None:
-        return self.filter(tag__name__icontains=value)
+        from books.models import Tag
+        # Few tags, so they don't need an index.
+        tags = search.search(Tag.objects.all(), ['name'], value)
+        return self.filter(tag__in=tags.values('id')).distinct()
 
     def _handle_promoted(self, value: str) -> None:
         return self.filter(promoted=value)
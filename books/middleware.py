@@ -1,4 +1,19 @@
-from django.http import HttpRequest, HttpResponsePermanentRedirect
+import contextlib
+import contextvars
+from dataclasses import dataclass
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse, HttpResponsePermanentRedirect
+from django.template import base as template_base
+import requests
+
+from booksby import db_router
+
+logger = logging.getLogger(__name__)
 
 
 class WwwRedirectMiddleware:
@@ -12,4 +27,184 @@ class WwwRedirectMiddleware:
             return HttpResponsePermanentRedirect(request.get_raw_uri().replace(
                 '://www.', '://'))
         else:
-            return self.get_response(request)
\ No newline at end of file
+            return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    '''
+    Lets GET and HEAD requests to views marked with @replica_reads read from
+    DB replica. Keeps user on primary DB for a while after a write. See
+    booksby/db_router.py.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        with db_router.request_routing() as state:
+            response = self.get_response(request)
+        if state.wrote and settings.REPLICA_DATABASE:
+            response.set_cookie(db_router.STICKY_COOKIE,
+                                '1',
+                                max_age=settings.REPLICA_STICKY_SEC,
+                                httponly=True)
+        return response
+
+    def process_view(self, request: HttpRequest, view_func, view_args,
+                     view_kwargs):
+        state = db_router.current_state()
+        if (state is not None and getattr(view_func, 'replica_reads', False)
+                and request.method in ('GET', 'HEAD')
+                and db_router.STICKY_COOKIE not in request.COOKIES):
+            state.use_replica = True
+
+
+@dataclass
+class RequestTimings:
+    '''Time spent by a single request in different parts of the app.'''
+    sql_count: int = 0
+    sql_ms: float = 0
+    template_ms: float = 0
+    http_count: int = 0
+    http_ms: float = 0
+    # Templates include other templates. Only time of top-level template is
+    # counted to avoid counting the same time twice.
+    template_depth: int = 0
+
+
+# Timings of the current request. None if request is not sampled.
+_current_timings: contextvars.ContextVar[
+    Optional[RequestTimings]] = contextvars.ContextVar('request_timings',
+                                                       default=None)
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def _timed_template_render(render: Callable) -> Callable:
+
+    def wrapper(self, context):
+        timings = _current_timings.get()
+        if timings is None:
+            return render(self, context)
+        start = time.perf_counter()
+        timings.template_depth += 1
+        try:
+            return render(self, context)
+        finally:
+            timings.template_depth -= 1
+            if timings.template_depth == 0:
+                timings.template_ms += _elapsed_ms(start)
+
+    return wrapper
+
+
+def _timed_http_send(send: Callable) -> Callable:
+
+    def wrapper(self, request, **kwargs):
+        timings = _current_timings.get()
+        if timings is None:
+            return send(self, request, **kwargs)
+        start = time.perf_counter()
+        try:
+            return send(self, request, **kwargs)
+        finally:
+            timings.http_count += 1
+            timings.http_ms += _elapsed_ms(start)
+
+    return wrapper
+
+
+_hooks_installed = False
+
+
+def _install_hooks() -> None:
+    '''
+    Wraps template rendering and outbound HTTP requests so that they report
+    time to the current request. Django doesn't provide hooks for those.
+    Algolia and Google Cloud clients use requests library for HTTP.
+    '''
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    template_base.Template.render = _timed_template_render(
+        template_base.Template.render)
+    requests.Session.send = _timed_http_send(requests.Session.send)
+    _hooks_installed = True
+
+
+class ServerTimingMiddleware:
+    '''
+    Measures time spent by a request in SQL queries, template rendering and
+    outbound HTTP requests. Timings are returned in Server-Timing header (shown
+    in browser dev tools) and logged. Only SERVER_TIMING_SAMPLE_RATE share of
+    requests is measured.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_hooks()
+
+    def __call__(self, request: HttpRequest):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+
+        def execute_wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings.sql_count += 1
+                timings.sql_ms += _elapsed_ms(start)
+
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        total_ms = _elapsed_ms(start)
+
+        response['Server-Timing'] = _server_timing_header(timings, total_ms)
+        _log_timings(request, response, timings, total_ms)
+        return response
+
+
+def _server_timing_header(timings: RequestTimings, total_ms: float) -> str:
+    metrics: List[str] = [
+        f'sql;dur={timings.sql_ms:.1f};desc="SQL ({timings.sql_count} queries)"',
+        f'tpl;dur={timings.template_ms:.1f};desc="Templates"',
+        f'http;dur={timings.http_ms:.1f};desc="Outbound HTTP ({timings.http_count} requests)"',
+        f'total;dur={total_ms:.1f}',
+    ]
+    return ', '.join(metrics)
+
+
+def _log_timings(request: HttpRequest, response: HttpResponse,
+                 timings: RequestTimings, total_ms: float) -> None:
+    fields: Dict[str, Any] = {
+        'path': request.path,
+        'method': request.method,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 1),
+        'sql_count': timings.sql_count,
+        'sql_ms': round(timings.sql_ms, 1),
+        'template_ms': round(timings.template_ms, 1),
+        'http_count': timings.http_count,
+        'http_ms': round(timings.http_ms, 1),
+    }
+    # Cloud Logging stores json_fields as structured payload so logs can be
+    # filtered and aggregated by them.
+    logger.info('Request timings %s %s: %.1fms, %d queries',
+                request.method,
+                request.path,
+                total_ms,
+                timings.sql_count,
+                extra={'json_fields': fields})
@@ -6,10 +6,11 @@ import uuid
 from unidecode import unidecode
 from django.template import defaultfilters
 
-from django.db import models
+from django.db import models, router, transaction
 from django.db.models.deletion import CASCADE, SET_NULL
 from django.utils.translation import gettext as _
 from .managers import BookManager
+from . import descriptions, images
 
 
 def _get_image_name(folder: str, instance: Union['Person', 'Book'],
@@ -19,6 +20,24 @@ def _get_image_name(folder: str, instance: Union['Person', 'Book'],
     return os.path.join(folder, instance.slug + extension)
 
 
+class TrackedModel(models.Model):
+    '''
+    Model whose changes are recorded as OutboxEvent, see books/outbox.py.
+    Events are written by signal handlers. Save is wrapped in transaction so
+    the event is committed together with the change. Deletes and m2m changes
+    already run in transaction.
+    '''
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self),
+                                                           instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
 class Gender(models.TextChoices):
     '''
     Gender of a person. Needed to correctly choose forms of some words as belarusian
@@ -35,7 +54,7 @@ class Language(models.TextChoices):
     RUSSIAN = 'RUSSIAN'
 
 
-class Person(models.Model):
+class Person(TrackedModel):
     '''
     Model representing single person. Person can perform multiple roles, like being an
     author, translator or narrator. Those roles aren't set on person, but can be derived
@@ -51,6 +70,8 @@ class Person(models.Model):
                                max_length=100,
                                default='')
     description = models.TextField(_('Person Description'), blank=True)
+    # Rendered description. See books/descriptions.py.
+    description_html = models.TextField(blank=True, default='', editable=False)
     description_source = models.CharField(_('Person Description Source'),
                                           blank=True,
                                           max_length=500,
@@ -63,6 +84,10 @@ class Person(models.Model):
                                     blank=True,
                                     max_length=500,
                                     default='')
+    # Resized versions of photo. See books/images.py.
+    photo_renditions = models.JSONField(default=dict,
+                                        blank=True,
+                                        editable=False)
     slug = models.SlugField(_('Person slug'),
                             max_length=100,
                             unique=True,
@@ -82,12 +107,23 @@ class Person(models.Model):
         return f'{self.name}'
 
     def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        super().save(*args, **kwargs)
+
+    def fill_derived_fields(self) -> None:
+        '''
+        Fills fields computed from other fields. Called by save(), code saving
+        with bulk operations has to call it explicitly.
+        '''
         if self.slug != defaultfilters.slugify(self.slug) or self.slug == '':
             self.slug = defaultfilters.slugify(unidecode(self.name))
-        super().save(*args, **kwargs)
+        self.photo_renditions = images.get_renditions(self.photo,
+                                                      self.photo_renditions)
+        self.description_html = descriptions.render_person_description(
+            self.description)
 
 
-class Tag(models.Model):
+class Tag(TrackedModel):
     '''
     Tag is a group of books that have some common trait. For example different genres are
     examples of tags. Each book can and should have one or more tags.
@@ -98,6 +134,8 @@ class Tag(models.Model):
                             allow_unicode=True,
                             blank=True)
     description = models.TextField(_('Tag Description'), blank=True)
+    # Rendered description. See books/descriptions.py.
+    description_html = models.TextField(blank=True, default='', editable=False)
 
     hidden = models.BooleanField(_('Hidden'), default=False)
 
@@ -105,9 +143,15 @@ class Tag(models.Model):
         return f'{self.name}'
 
     def save(self, *args, **kwargs):
-        self.tag_slug = defaultfilters.slugify(unidecode(self.name))
+        self.fill_derived_fields()
         super().save(*args, **kwargs)
 
+    def fill_derived_fields(self) -> None:
+        '''See Person.fill_derived_fields().'''
+        self.tag_slug = defaultfilters.slugify(unidecode(self.name))
+        self.description_html = descriptions.render_tag_description(
+            self.description)
+
 
 class BookStatus(models.TextChoices):
     '''
@@ -117,7 +161,7 @@ class BookStatus(models.TextChoices):
     HIDDEN = 'HIDDEN'
 
 
-class Book(models.Model):
+class Book(TrackedModel):
     '''
     Book model represents a single book... It can have multiple authors and or translators. Single
     books can have multiple narrations if it was narrated by different groups of people. Each book
@@ -133,6 +177,8 @@ class Book(models.Model):
                                 max_length=100,
                                 default='')
     description = models.TextField(_('Book Description'), blank=True)
+    # Rendered Markdown description. See books/descriptions.py.
+    description_html = models.TextField(blank=True, default='', editable=False)
     description_source = models.CharField(_('Book Description Source'),
                                           blank=True,
                                           max_length=500,
@@ -156,6 +202,10 @@ class Book(models.Model):
                                           blank=True,
                                           max_length=500,
                                           default='')
+    # Resized versions of cover_image. See books/images.py.
+    cover_image_renditions = models.JSONField(default=dict,
+                                              blank=True,
+                                              editable=False)
     tag = models.ManyToManyField(Tag, related_name='books', blank=True)
     promoted = models.BooleanField(_('Promoted'), default=False)
     duration_sec = models.DurationField(_('Duration'), blank=True, null=True)
@@ -168,6 +218,19 @@ class Book(models.Model):
                                    blank=True,
                                    default='')
 
+    class Meta:
+        indexes = [
+            # Most pages list only active books, newest first.
+            models.Index(fields=['-date'],
+                         name='book_active_date_idx',
+                         condition=models.Q(status=BookStatus.ACTIVE)),
+            # Promoted books on the main page.
+            models.Index(fields=['-date'],
+                         name='book_active_promoted_idx',
+                         condition=models.Q(status=BookStatus.ACTIVE,
+                                            promoted=True)),
+        ]
+
     def __str__(self) -> str:
         return "%s (%s)" % (
             self.title,
@@ -176,17 +239,25 @@ class Book(models.Model):
         # f'{self.authors.all()[0]} - {self.title}'
 
     def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        super().save(*args, **kwargs)
+
+    def fill_derived_fields(self) -> None:
+        '''See Person.fill_derived_fields().'''
         # Update slug only if current slug uses belarusian letters (created in admin).
         # Otherwise don't update slug as it might be intentionally set to be different
         # from title.
         if self.slug != defaultfilters.slugify(self.slug) or self.slug == '':
             self.slug = defaultfilters.slugify(unidecode(self.title))
-        super().save(*args, **kwargs)
+        self.cover_image_renditions = images.get_renditions(
+            self.cover_image, self.cover_image_renditions)
+        self.description_html = descriptions.render_book_description(
+            self.description)
 
     objects = BookManager()
 
 
-class Narration(models.Model):
+class Narration(TrackedModel):
     '''
     Narration represents particular narration of a book. It's represented through a separate model so
     that we can visually separate narrations in UI. As different narration fo the same books have different
@@ -211,6 +282,13 @@ class Narration(models.Model):
                                 choices=Language.choices,
                                 blank=False)
 
+    class Meta:
+        indexes = [
+            # Catalog filters books by narration language and price.
+            models.Index(fields=['book', 'language', 'paid'],
+                         name='narration_book_lang_paid_idx'),
+        ]
+
     def __str__(self) -> str:
         return '%s read by %s' % (
             self.book,
@@ -227,7 +305,7 @@ class LinkAvailability(models.TextChoices):
     USA_ONLY = 'USA_ONLY'
 
 
-class LinkType(models.Model):
+class LinkType(TrackedModel):
     '''
     LinkType represents a particular source in internet where audibooks are hosted. Examples are
     Google podcasts, apple podcasts, Knizhny Voz, LitRes.
@@ -255,7 +333,7 @@ class LinkType(models.Model):
         return f'{self.name}'
 
 
-class Link(models.Model):
+class Link(TrackedModel):
     '''
     Link represents a URL link that points to page where users can find and listen to an audiobook.
     For example it can be link to particular Google Podcast or audiobook page on LitRes.
@@ -275,5 +353,98 @@ class Link(models.Model):
                                   on_delete=CASCADE,
                                   null=True)
 
+    class Meta:
+        indexes = [
+            # Catalog and person pages filter books by link types.
+            models.Index(fields=['narration', 'url_type'],
+                         name='link_narration_type_idx'),
+        ]
+
     def __str__(self) -> str:
         return f'{self.url} - {self.url_type}'
+
+
+class LinkHealth(models.Model):
+    '''
+    Result of the latest check of a Link done by check_links command. Kept separately
+    from Link so that check results don't end up in data.json and don't get overriden
+    when data is pushed to prod.
+    '''
+    link = models.OneToOneField(Link,
+                                primary_key=True,
+                                related_name='health',
+                                on_delete=CASCADE)
+    # Null when request failed without response, for example on timeout.
+    status_code = models.IntegerField(_('HTTP status'), null=True, blank=True)
+    error = models.CharField(_('Error'),
+                             max_length=500,
+                             blank=True,
+                             default='')
+    latency_ms = models.IntegerField(_('Latency, ms'), null=True, blank=True)
+    last_checked = models.DateTimeField(_('Last checked'), db_index=True)
+
+    def is_ok(self) -> bool:
+        '''Whether link worked during the last check.'''
+        return self.status_code is not None and self.status_code < 400
+
+    def __str__(self) -> str:
+        return f'{self.link.url} - {self.status_code or self.error}'
+
+
+class AlgoliaRecord(models.Model):
+    '''
+    Record pushed to Algolia search index by push_data_to_algolia command.
+    Hash of the pushed content is used to push only changed records. See
+    books/algolia.py.
+    '''
+    index_name = models.CharField(_('Index'), max_length=100)
+    object_id = models.CharField(_('Object ID'), max_length=100)
+    content_hash = models.CharField(_('Content hash'), max_length=64)
+    pushed_at = models.DateTimeField(_('Pushed at'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['index_name', 'object_id'],
+                                    name='algolia_record_unique_object'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.index_name}/{self.object_id}'
+
+
+class OutboxAction(models.TextChoices):
+    CREATE = 'CREATE'
+    UPDATE = 'UPDATE'
+    DELETE = 'DELETE'
+
+
+class OutboxEvent(models.Model):
+    '''
+    Change of a TrackedModel object. Written in the same transaction as the
+    change itself. Consumers read events in id order, see books/outbox.py.
+    '''
+    id = models.BigAutoField(primary_key=True)
+    # Model name, e.g. "book".
+    model = models.CharField(_('Model'), max_length=50)
+    object_id = models.CharField(_('Object ID'), max_length=100)
+    action = models.CharField(_('Action'),
+                              max_length=10,
+                              choices=OutboxAction.choices)
+    created_at = models.DateTimeField(_('Created at'),
+                                      auto_now_add=True,
+                                      db_index=True)
+
+    def __str__(self) -> str:
+        return f'{self.id}: {self.action} {self.model} {self.object_id}'
+
+
+class OutboxCursor(models.Model):
+    '''Id of the last OutboxEvent processed by a consumer.'''
+    consumer = models.CharField(_('Consumer'),
+                                max_length=100,
+                                primary_key=True)
+    last_event_id = models.BigIntegerField(_('Last event ID'), default=0)
+    updated_at = models.DateTimeField(_('Updated at'), auto_now=True)
+
+    def __str__(self) -> str:
+        return f'{self.consumer}: {self.last_event_id}'
@@ -0,0 +1,178 @@
+'''
+Transactional outbox of changes to books data. Every create, update and
+delete of Book, Person, Narration, Link, Tag and LinkType is recorded as
+OutboxEvent in the same transaction as the change. Changes of m2m fields
+(book authors, translators, tags and narration narrators) are recorded as
+update of the book or narration.
+
+Systems derived from books data (search index, data.json, caches) can consume
+events instead of rescanning all data. Each consumer has a cursor with the id
+of the last processed event:
+
+    def handle(events: List[OutboxEvent]) -> None:
+        ...
+
+    outbox.process('my-consumer', handle)
+
+Cursor moves only after handler succeeds, so events are delivered at least
+once and handlers must be idempotent. Events of concurrent transactions can
+be committed out of id order, so events younger than COMMIT_LAG are not
+delivered yet to not skip them.
+
+Signals are not sent by bulk operations (bulk_create, bulk_update,
+QuerySet.update), code using them has to call record_bulk(). Rows loaded from
+fixtures (loaddata) are not recorded.
+
+Events are kept for RETENTION and then deleted by the daily /cleanup_outbox
+job, so a consumer that doesn't run for longer than that has to rescan all
+data.
+'''
+
+import datetime
+from typing import Callable, Iterable, List, Optional, Type
+from django.db import models as db_models, transaction
+from django.db.models import Min
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+
+from books import models
+
+TRACKED_MODELS: List[Type[db_models.Model]] = [
+    models.Book,
+    models.Person,
+    models.Narration,
+    models.Link,
+    models.Tag,
+    models.LinkType,
+]
+
+COMMIT_LAG = datetime.timedelta(seconds=10)
+
+DEFAULT_BATCH_SIZE = 1000
+
+RETENTION = datetime.timedelta(days=30)
+
+
+def record_bulk(model: Type[db_models.Model],
+                object_ids: Iterable,
+                action: str,
+                using: Optional[str] = None) -> None:
+    '''Records events for objects changed by bulk operations.'''
+    events = [
+        models.OutboxEvent(model=model._meta.model_name,
+                           object_id=str(object_id),
+                           action=action) for object_id in object_ids
+    ]
+    models.OutboxEvent.objects.using(using).bulk_create(
+        events, batch_size=DEFAULT_BATCH_SIZE)
+
+
+def _on_save(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    action = (models.OutboxAction.CREATE
+              if created else models.OutboxAction.UPDATE)
+    record_bulk(sender, [instance.pk], action, using)
+
+
+def _on_delete(sender, instance, using, **kwargs):
+    record_bulk(sender, [instance.pk], models.OutboxAction.DELETE, using)
+
+
+def _on_m2m_changed(sender, instance, action, reverse, model, pk_set, using,
+                    **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_bulk(type(instance), [instance.pk],
+                        models.OutboxAction.UPDATE, using)
+    elif action in ('post_add', 'post_remove'):
+        # E.g. person.books_authored.add(book), the book changed.
+        record_bulk(model, pk_set, models.OutboxAction.UPDATE, using)
+    elif action == 'pre_clear':
+        # pk_set is not set for clear, so find objects that will change.
+        field = next(f for f in model._meta.many_to_many
+                     if f.remote_field.through == sender)
+        changed = model.objects.using(using).filter(**{
+            field.name: instance.pk
+        }).values_list('pk', flat=True)
+        record_bulk(model, list(changed), models.OutboxAction.UPDATE, using)
+
+
+def connect_signals() -> None:
+    '''Connects signal handlers that record events. Called on app start.'''
+    for model in TRACKED_MODELS:
+        post_save.connect(_on_save,
+                          sender=model,
+                          dispatch_uid=f'outbox_save_{model.__name__}')
+        post_delete.connect(_on_delete,
+                            sender=model,
+                            dispatch_uid=f'outbox_delete_{model.__name__}')
+        for field in model._meta.many_to_many:
+            m2m_changed.connect(
+                _on_m2m_changed,
+                sender=field.remote_field.through,
+                dispatch_uid=f'outbox_m2m_{model.__name__}_{field.name}')
+
+
+def read_events(
+        consumer: str,
+        limit: int = DEFAULT_BATCH_SIZE,
+        min_age: datetime.timedelta = COMMIT_LAG) -> List[models.OutboxEvent]:
+    '''Returns events not yet processed by consumer, oldest first.'''
+    cursor = models.OutboxCursor.objects.filter(consumer=consumer).first()
+    last_event_id = cursor.last_event_id if cursor else 0
+    return list(
+        models.OutboxEvent.objects.filter(id__gt=last_event_id,
+                                          created_at__lte=timezone.now() -
+                                          min_age).order_by('id')[:limit])
+
+
+def acknowledge(consumer: str, last_event_id: int) -> None:
+    '''Marks events up to last_event_id as processed by consumer.'''
+    models.OutboxCursor.objects.update_or_create(
+        consumer=consumer, defaults={'last_event_id': last_event_id})
+
+
+def process(consumer: str,
+            handler: Callable[[List[models.OutboxEvent]], None],
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            min_age: datetime.timedelta = COMMIT_LAG) -> int:
+    '''
+    Passes new events to handler in batches and moves consumer's cursor after
+    each handled batch. If handler raises, the batch is delivered again on
+    the next call. Returns number of processed events.
+    '''
+    processed = 0
+    while True:
+        events = read_events(consumer, batch_size, min_age)
+        if not events:
+            return processed
+        handler(events)
+        acknowledge(consumer, events[-1].id)
+        processed += len(events)
+
+
+def delete_processed_events(consumers: Iterable[str]) -> int:
+    '''
+    Deletes events processed by all given consumers that have a cursor.
+    Returns number of deleted events.
+    '''
+    with transaction.atomic():
+        last_event_id = models.OutboxCursor.objects.filter(
+            consumer__in=list(consumers)).aggregate(
+                last_event_id=Min('last_event_id'))['last_event_id']
+        if last_event_id is None:
+            return 0
+        deleted, _ = models.OutboxEvent.objects.filter(
+            id__lte=last_event_id).delete()
+    return deleted
+
+
+def delete_old_events(max_age: datetime.timedelta = RETENTION) -> int:
+    '''
+    Deletes events older than max_age whether consumers processed them or
+    not. Returns number of deleted events.
+    '''
+    deleted, _ = models.OutboxEvent.objects.filter(
+        created_at__lt=timezone.now() - max_age).delete()
+    return deleted
@@ -0,0 +1,102 @@
+'''
+Substring and fuzzy search by book titles and people names used by admin and
+BookManager filters.
+
+On Postgres values are normalized by books_search_normalize() SQL function:
+upper case, accents removed with unaccent and belarusian letters replaced with
+russian ones (ў -> у, і -> и, ё -> е) so that queries typed with either
+keyboard layout match. Normalized columns have pg_trgm GIN indexes that serve
+both substring (LIKE '%query%') and similarity (%) searches. Results are
+ranked by trigram similarity. Extensions, the function and indexes are created
+after migrations by create_search_indexes().
+
+On other databases (sqlite used locally) search falls back to icontains.
+'''
+
+from typing import List
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Func, Q, QuerySet, TextField, Value
+from django.db.models.functions import Greatest
+
+NORMALIZE_FUNCTION = 'books_search_normalize'
+
+# Annotation with similarity of results on Postgres.
+RANK = 'search_rank'
+
+# (table, column) pairs that get trigram index.
+INDEXED_COLUMNS = [
+    ('books_book', 'title'),
+    ('books_book', 'title_ru'),
+    ('books_person', 'name'),
+    ('books_person', 'name_ru'),
+]
+
+
+class Normalize(Func):
+    '''Normalizes text for search, see module docs. Postgres only.'''
+    function = NORMALIZE_FUNCTION
+    output_field = TextField()
+
+
+def index_name(table: str, column: str) -> str:
+    return f'{table}_{column}_trgm'
+
+
+def search_index_sql() -> List[str]:
+    '''SQL statements that create search function and indexes.'''
+    statements = [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE EXTENSION IF NOT EXISTS unaccent',
+        # unaccent() is not immutable as dictionary can change. Indexes
+        # require immutable function so it's wrapped with explicit
+        # dictionary.
+        f'''CREATE OR REPLACE FUNCTION {NORMALIZE_FUNCTION}(text)
+            RETURNS text AS $$
+                SELECT translate(upper(public.unaccent(
+                    'public.unaccent'::regdictionary, $1)), 'ЎІЁ', 'УИЕ')
+            $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE''',
+    ]
+    for table, column in INDEXED_COLUMNS:
+        statements.append(
+            f'CREATE INDEX IF NOT EXISTS {index_name(table, column)} '
+            f'ON {table} USING gin '
+            f'({NORMALIZE_FUNCTION}({column}) gin_trgm_ops)')
+    return statements
+
+
+def create_search_indexes(using: str) -> None:
+    '''Creates search indexes on Postgres DB. Does nothing on others.'''
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for sql in search_index_sql():
+            cursor.execute(sql)
+
+
+def search(queryset: QuerySet, fields: List[str], query: str) -> QuerySet:
+    '''
+    Filters queryset to objects that contain query in any of the fields or
+    are similar to it. On Postgres results are ordered from most similar.
+    '''
+    if connections[queryset.db].vendor != 'postgresql':
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+
+    normalized_query = Normalize(Value(query))
+    condition = Q()
+    similarities = []
+    for field in fields:
+        alias = f'_search_{field}'
+        queryset = queryset.annotate(**{alias: Normalize(F(field))})
+        condition |= Q(**{f'{alias}__contains': normalized_query})
+        condition |= Q(**{f'{alias}__trigram_similar': normalized_query})
+        similarities.append(TrigramSimilarity(F(alias), normalized_query))
+    rank = similarities[0] if len(similarities) == 1 else Greatest(
+        *similarities)
+    return queryset.filter(condition).annotate(**{
+        RANK: rank
+    }).order_by(f'-{RANK}')
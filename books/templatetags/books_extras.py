@@ -1,10 +1,11 @@
 '''Various helper template filters for books.'''
 
 from atexit import register
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from zoneinfo import ZoneInfo
 from django import template
 from datetime import datetime
+from django.db.models.fields.files import FieldFile
 from django.utils import html
 
 from books import models
@@ -87,20 +88,35 @@ def duration(book: models.Book) -> str:
     return minutes
 
 
-COVER_PATTERNS = [
-    '/static/cover_templates/cover_templates_blue.jpeg',
-    '/static/cover_templates/cover_templates_green.jpeg',
-    '/static/cover_templates/cover_templates_grey.jpeg',
-    '/static/cover_templates/cover_templates_purple.jpeg',
-    '/static/cover_templates/cover_templates_red.jpeg',
-    '/static/cover_templates/cover_templates_yellow.jpeg',
+# Colors of auto-generated covers for books that don't have cover image.
+# Each is (light, dark, line) color. Cover is a gradient from light to dark
+# with a line separating author and title.
+COVER_COLORS = [
+    # blue
+    ('#95c7d4', '#439db9', '#218baf'),
+    # green
+    ('#c6d396', '#9bb943', '#88af21'),
+    # grey
+    ('#b6bbbe', '#7b8386', '#5d6669'),
+    # purple
+    ('#d9b8d0', '#b8649d', '#af3f88'),
+    # red
+    ('#eeada7', '#d05a4b', '#c53a25'),
+    # yellow
+    ('#f1df84', '#cdba32', '#bfa713'),
 ]
 
 
 @register.filter
-def colors(book: models.Book) -> str:
-    '''Returns random cover template for a book that has no cover.'''
-    return COVER_PATTERNS[book.uuid.int % len(COVER_PATTERNS)]
+def cover_style(book: models.Book) -> str:
+    '''
+    Returns inline style for auto-generated cover of a book that has no cover.
+    Cover is drawn using CSS only so it doesn't require loading any images.
+    '''
+    light, dark, line = COVER_COLORS[book.uuid.int % len(COVER_COLORS)]
+    return (f'--cover-line-color: {line}; background-color: {dark}; '
+            f'background-image: radial-gradient(circle at 50% 30%, {light}, '
+            f'{dark});')
 
 
 MONTHS = [
@@ -143,3 +159,52 @@ def cite_source(source: str, cls: Optional[str]):
     return html.format_html(
         '<p class="citation {}">Крыніца: <a href="{}">{}</a></p>', cls,
         parts[1], parts[0])
+
+
+# Width of the rendition used as src for browsers that don't support srcset.
+DEFAULT_SRC_WIDTH = 300
+
+
+@register.simple_tag
+def responsive_image(image: FieldFile,
+                     renditions: Dict[str, Any],
+                     sizes: str,
+                     alt: str = '',
+                     css_class: str = '',
+                     loading: str = 'lazy'):
+    '''
+    Renders <picture> with WebP and JPEG renditions of an image, see
+    books/images.py. Browser picks rendition based on "sizes", which should
+    describe how wide the image is on the page, e.g. "150px".
+
+    If renditions were not generated - falls back to plain <img> with the
+    original image. Pass loading="eager" for images above the fold so that
+    browser doesn't delay them.
+    '''
+    if not renditions or not renditions.get('renditions'):
+        return html.format_html(
+            '<img class="{}" src="{}" alt="{}" loading="{}">', css_class,
+            image.url, alt, loading)
+    srcsets: Dict[str, List[str]] = {}
+    jpegs = []
+    for rendition in renditions['renditions']:
+        url = image.storage.url(rendition['name'])
+        srcsets.setdefault(rendition['format'],
+                           []).append(f'{url} {rendition["width"]}w')
+        if rendition['format'] == 'jpeg':
+            jpegs.append(rendition)
+    fallback = next((r for r in jpegs if r['width'] >= DEFAULT_SRC_WIDTH),
+                    jpegs[-1])
+    # Dominant color and blurry placeholder are shown until image is loaded.
+    style = ''
+    if 'color' in renditions:
+        style = (f'background-color: {renditions["color"]}; '
+                 f'background-image: url({renditions["placeholder"]}); '
+                 'background-size: cover;')
+    return html.format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" width="{}" '
+        'height="{}" alt="{}" loading="{}" style="{}"></picture>',
+        ', '.join(srcsets['webp']), sizes, css_class,
+        image.storage.url(fallback['name']), ', '.join(srcsets['jpeg']), sizes,
+        fallback['width'], fallback['height'], alt, loading, style)
@@ -10,6 +10,9 @@ urlpatterns = [
     path('search', views.search, name='search'),
     path('about', views.about, name='about'),
     path('push_data_to_algolia', views.push_data_to_algolia),
+    path('check_links', views.check_links),
+    path('cleanup_outbox', views.cleanup_outbox),
+    path('_ah/warmup', views.warmup_instance),
     path("404", views.page_not_found),
     path('robots.txt', views.robots_txt),
     path('sitemap.txt', views.sitemap),
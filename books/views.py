@@ -1,13 +1,15 @@
+import dataclasses
 from dataclasses import dataclass
 import datetime
 import json
 import logging
 import bisect
+import time
 from typing import Dict, List, Union
 from uuid import UUID
 from django import views
 from django.conf import settings
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.views.decorators.cache import cache_control
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.files.storage import default_storage
@@ -16,9 +18,9 @@ from django.core.paginator import Paginator, Page
 from django.core.management import call_command
 from django.urls import reverse
 from django.db.models import query
-from algoliasearch.search_client import SearchClient
 
-from books import serializers
+from books import outbox, serializers, warmup
+from booksby.db_router import replica_reads
 from books.templatetags.books_extras import to_human_language
 
 from .models import Book, BookStatus, LinkType, Person, Tag, Language
@@ -84,6 +86,7 @@ def maybe_filter_links(books_query: query.QuerySet,
         narrations__links__url_type__name__in=links.split(','))
 
 
+@replica_reads
 def index(request: HttpRequest) -> HttpResponse:
     '''Index page, starting page'''
     # Getting all Tags and creating querystring objects for each to pass to template
@@ -117,6 +120,7 @@ def get_query_params_without(request: HttpRequest, param: str) -> str:
     return '?' + params.urlencode()
 
 
+@replica_reads
 def catalog(request: HttpRequest, tag_slug: str = '') -> HttpResponse:
     '''Catalog page for specific tag or all books'''
 
@@ -189,6 +193,7 @@ def catalog(request: HttpRequest, tag_slug: str = '') -> HttpResponse:
     return render(request, 'books/catalog.html', context)
 
 
+@replica_reads
 def book_detail(request: HttpRequest, slug: str) -> HttpResponse:
     '''Detailed book page'''
     book = get_object_or_404(Book, slug=slug)
@@ -197,7 +202,8 @@ def book_detail(request: HttpRequest, slug: str) -> HttpResponse:
     # language. That determine whether we show language once at the top
     # or separately for each narration.
     single_language = None
-    narrations = book.narrations.all()
+    narrations = book.narrations.prefetch_related('narrators',
+                                                  'links__url_type')
     if len(narrations) > 0:
         single_language = narrations[0].language
         for narration in narrations:
@@ -209,7 +215,7 @@ def book_detail(request: HttpRequest, slug: str) -> HttpResponse:
         'book': book,
         'authors': book.authors.all(),
         'translators': book.translators.all(),
-        'narrations': book.narrations.all(),
+        'narrations': narrations,
         'tags': book.tag.all(),
         'single_language': single_language,
         'show_russian_title': single_language == Language.RUSSIAN,
@@ -218,25 +224,25 @@ def book_detail(request: HttpRequest, slug: str) -> HttpResponse:
     return render(request, 'books/book-detail.html', context)
 
 
+@replica_reads
 def person_detail(request: HttpRequest, slug: str) -> HttpResponse:
     '''Detailed book page'''
 
     # TODO: remove it later if all good
     # identified_person = get_object_or_404(Person, slug=slug)
 
-    # Prefetch all books in the relationships
-    person = Person.objects.prefetch_related(
-        'books_authored', 'books_translated',
-        'narrations').filter(slug=slug).first()
+    # Books are loaded below with filters applied so nothing to prefetch here.
+    person = Person.objects.filter(slug=slug).first()
 
     if person:
         author = maybe_filter_links(
-            person.books_authored.all().filter(status=BookStatus.ACTIVE),
-            request)
+            person.books_authored.all().filter(
+                status=BookStatus.ACTIVE).prefetch_related('authors'), request)
         translator = maybe_filter_links(
-            person.books_translated.all().filter(status=BookStatus.ACTIVE),
-            request)
-        narrations = person.narrations.all().filter()
+            person.books_translated.all().filter(
+                status=BookStatus.ACTIVE).prefetch_related('authors'), request)
+        narrations = person.narrations.all().select_related(
+            'book').prefetch_related('book__authors')
         if request.GET.get('links'):
             links = request.GET.get('links').split(',')
             narrations = narrations.filter(links__url_type__name__in=links)
@@ -259,11 +265,15 @@ def person_detail(request: HttpRequest, slug: str) -> HttpResponse:
         pass  #TODO: implement 404 page
 
 
+@replica_reads
 def search(request: HttpRequest) -> HttpResponse:
     '''Search results'''
     query = request.GET.get('query')
 
     if query:
+        # Imported here as algolia client takes ~0.1s to import which slows
+        # down instance start while only search page needs it.
+        from algoliasearch.search_client import SearchClient
         client = SearchClient.create(settings.ALGOLIA_APPLICATION_ID,
                                      settings.ALGOLIA_SEARCH_KEY)
         index = client.init_index(settings.ALGOLIA_INDEX)
@@ -311,6 +321,7 @@ def search(request: HttpRequest) -> HttpResponse:
     return render(request, 'books/search.html', context)
 
 
+@replica_reads
 def about(request: HttpRequest) -> HttpResponse:
     '''About us page containing info about the website and the team.'''
     people = [
@@ -341,6 +352,42 @@ def push_data_to_algolia(request: HttpRequest) -> HttpResponse:
     return HttpResponse(status=204)
 
 
+def check_links(request: HttpRequest) -> HttpResponse:
+    '''
+    HTTP hook that checks links which weren't checked recently.
+    It's called daily by an appengine job.
+    '''
+    call_command('check_links')
+    return HttpResponse(status=204)
+
+
+def cleanup_outbox(request: HttpRequest) -> HttpResponse:
+    '''
+    HTTP hook that deletes outbox events older than outbox.RETENTION.
+    It's called daily by an appengine job.
+    '''
+    deleted = outbox.delete_old_events()
+    logger.info('Deleted %s outbox events', deleted)
+    return HttpResponse(status=204)
+
+
+def warmup_instance(request: HttpRequest) -> HttpResponse:
+    '''
+    HTTP hook called by App Engine when it starts a new instance, before
+    sending user traffic to it. Returns time taken by each warmup step.
+    '''
+    start = time.perf_counter()
+    steps = warmup.run_warmup(request)
+    total_ms = round((time.perf_counter() - start) * 1000, 1)
+    fields = {step.name: step.duration_ms for step in steps}
+    fields['total'] = total_ms
+    logger.info('Warmup took %sms', total_ms, extra={'json_fields': fields})
+    return JsonResponse({
+        'steps': [dataclasses.asdict(step) for step in steps],
+        'total_ms': total_ms,
+    })
+
+
 def page_not_found(request: HttpRequest) -> HttpResponse:
     '''Helper method to test 404 page rendering locally, where using real 404 shows stack trace.'''
     return views.defaults.page_not_found(request, None)
@@ -358,6 +405,7 @@ def robots_txt(request: HttpRequest) -> HttpResponse:
     return render(request, 'robots.txt', context)
 
 
+@replica_reads
 def sitemap(request: HttpRequest) -> HttpResponse:
     '''
     Serve sitemap in text format.
@@ -472,6 +520,7 @@ def update_read_by_author_tag(request: HttpRequest) -> HttpResponse:
     return HttpResponse(status=204)
 
 
+@replica_reads
 def birthdays(request: HttpRequest) -> HttpResponse:
     '''Birthday page'''
     now = datetime.datetime.now()
@@ -508,4 +557,4 @@ def birthdays(request: HttpRequest) -> HttpResponse:
     context = {
         'people_with_info': people_with_info,
     }
-    return render(request, 'books/stats/birthdays.html', context)
\ No newline at end of file
+    return render(request, 'books/stats/birthdays.html', context)
@@ -0,0 +1,142 @@
+'''
+Warms up a fresh instance before it gets real traffic. App Engine calls
+/_ah/warmup on new instances, so work done here is not paid by the first user:
+DB connections, url resolver, compiled templates, static files manifest and
+rendering of the most visited pages.
+'''
+
+from dataclasses import dataclass
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections, router
+from django.http import HttpRequest
+from django.template import loader
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+
+from books.models import Book, BookStatus, Person, Tag
+
+logger = logging.getLogger(__name__)
+
+# Templates rendered by public pages. Includes are compiled as part of the
+# template including them.
+TEMPLATES = [
+    'base.html',
+    '404.html',
+    'robots.txt',
+    'books/index.html',
+    'books/catalog.html',
+    'books/book-detail.html',
+    'books/person.html',
+    'books/search.html',
+    'books/about.html',
+    'books/articles/article.html',
+    'books/articles/audiobooksby-database.html',
+    'books/articles/covers-guide.html',
+    'books/articles/how-to-publish-audiobook.html',
+]
+
+
+@dataclass
+class WarmupStep:
+    '''Result of a single warmup step.'''
+    name: str
+    duration_ms: float
+    error: Optional[str] = None
+
+
+def open_db_connections() -> None:
+    '''Connects to databases used for reading and writing data.'''
+    aliases = {router.db_for_read(Book), router.db_for_write(Book)}
+    if settings.REPLICA_DATABASE:
+        aliases.add(settings.REPLICA_DATABASE)
+    for alias in sorted(aliases):
+        connection = connections[alias]
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def load_urls() -> None:
+    '''Populates url resolver and its reverse lookup dicts.'''
+    get_resolver().url_patterns
+    reverse('index')
+
+
+def load_static_manifest() -> None:
+    '''
+    Manifest storage reads staticfiles.json on first access. Other storages
+    just build the url.
+    '''
+    staticfiles_storage.url('css/app.css')
+
+
+def compile_templates() -> None:
+    '''Loads templates, cached template loader keeps them compiled.'''
+    for name in TEMPLATES:
+        loader.get_template(name)
+
+
+def hot_pages() -> List[str]:
+    '''Paths of the most visited pages.'''
+    paths = [reverse('index'), reverse('catalog-all-books'), reverse('about')]
+    tag = Tag.objects.order_by('name').first()
+    if tag:
+        paths.append(reverse('catalog-for-tag', args=(tag.slug, )))
+    book = Book.objects.filter(
+        status=BookStatus.ACTIVE).order_by('-date').first()
+    if book:
+        paths.append(reverse('book-detail-page', args=(book.slug, )))
+    person = Person.objects.order_by('name').first()
+    if person:
+        paths.append(reverse('person-detail-page', args=(person.slug, )))
+    return paths
+
+
+def render_hot_pages(request: HttpRequest) -> None:
+    '''
+    Renders most visited pages once. That runs template tags and filters,
+    and loads DB pages used by the most common queries. Pages are requested
+    with the host of the warmup request so they pass ALLOWED_HOSTS check.
+    '''
+    factory = RequestFactory()
+    for path in hot_pages():
+        match = resolve(path)
+        page_request = factory.get(path,
+                                   HTTP_HOST=request.get_host(),
+                                   secure=request.is_secure())
+        response = match.func(page_request, *match.args, **match.kwargs)
+        if response.status_code != 200:
+            raise Exception(f'{path} returned {response.status_code}')
+
+
+def run_warmup(request: HttpRequest) -> List[WarmupStep]:
+    '''
+    Runs all warmup steps. Failed step doesn't stop the rest as warmup is
+    best-effort, the error is returned instead.
+    '''
+    steps: List[Tuple[str, Callable[[], None]]] = [
+        ('db_connections', open_db_connections),
+        ('urls', load_urls),
+        ('static_manifest', load_static_manifest),
+        ('templates', compile_templates),
+        ('hot_pages', lambda: render_hot_pages(request)),
+    ]
+    results: List[WarmupStep] = []
+    for name, step in steps:
+        start = time.perf_counter()
+        error = None
+        try:
+            step()
+        except Exception as e:
+            logger.exception('Warmup step %s failed', name)
+            error = f'{type(e).__name__}: {e}'
+        results.append(
+            WarmupStep(name=name,
+                       duration_ms=round((time.perf_counter() - start) * 1000,
+                                         1),
+                       error=error))
+    return results
@@ -0,0 +1,51 @@
+'''
+Logging handler that sends logs to Google Cloud Logging. Cloud Logging client
+is slow to import and create, so it's done on the first log record instead of
+on app start.
+'''
+
+import logging
+import threading
+from typing import Optional
+
+
+class LazyCloudLoggingHandler(logging.Handler):
+    '''
+    Wraps google.cloud.logging CloudLoggingHandler and creates it only when
+    the first record is logged.
+    '''
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self._handler: Optional[logging.Handler] = None
+        self._handler_lock = threading.Lock()
+
+    def _get_handler(self) -> logging.Handler:
+        if self._handler is None:
+            with self._handler_lock:
+                if self._handler is None:
+                    from google.cloud import logging as cloud_logging
+                    from google.cloud.logging.handlers import CloudLoggingHandler
+                    handler = CloudLoggingHandler(cloud_logging.Client())
+                    handler.setLevel(self.level)
+                    if self.formatter:
+                        handler.setFormatter(self.formatter)
+                    self._handler = handler
+        return self._handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            handler = self._get_handler()
+        except Exception:
+            self.handleError(record)
+            return
+        handler.handle(record)
+
+    def flush(self) -> None:
+        if self._handler is not None:
+            self._handler.flush()
+
+    def close(self) -> None:
+        if self._handler is not None:
+            self._handler.close()
+        super().close()
@@ -0,0 +1,96 @@
+'''
+Sends reads of public pages to read replica of the database. Everything else
+(admin, cron hooks, management commands, writes) uses the primary "default"
+database.
+
+Views opt into replica reads with @replica_reads decorator. Reads go to the
+replica only during GET/HEAD requests handled by such views, see
+books.middleware.ReplicaRoutingMiddleware. Replica lags behind primary, so
+once a request writes anything its remaining reads go to primary and the
+response sets a cookie that keeps the user on primary for
+REPLICA_STICKY_SEC seconds. That way an editor sees their changes right after
+saving them.
+
+Replica is enabled by REPLICA_DATABASE setting containing its alias in
+DATABASES. When empty all queries go to primary.
+'''
+
+import contextlib
+import contextvars
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, TypeVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set on responses of requests that wrote to DB.
+STICKY_COOKIE = 'use_primary_db'
+
+
+@dataclass
+class RoutingState:
+    '''Routing decisions of a single request.'''
+    use_replica: bool = False
+    # Whether request wrote to DB, after that all reads go to primary.
+    wrote: bool = False
+
+
+# Not set outside of requests, e.g. in management commands.
+_routing_state: contextvars.ContextVar[Optional[RoutingState]] = (
+    contextvars.ContextVar('db_routing_state', default=None))
+
+View = TypeVar('View', bound=Callable)
+
+
+def replica_reads(view: View) -> View:
+    '''Marks view as read-only public view that can read from replica.'''
+    setattr(view, 'replica_reads', True)
+    return view
+
+
+@contextlib.contextmanager
+def request_routing() -> Iterator[RoutingState]:
+    '''Tracks routing state while handling a single request.'''
+    state = RoutingState()
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+def current_state() -> Optional[RoutingState]:
+    '''Routing state of the current request if any.'''
+    return _routing_state.get()
+
+
+class ReplicaRouter:
+    '''Database router, see module docs.'''
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        state = _routing_state.get()
+        if state is None or not settings.REPLICA_DATABASE:
+            return None
+        if state.use_replica and not state.wrote:
+            return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        if not settings.REPLICA_DATABASE:
+            return None
+        # Objects read from replica are saved to primary. Without it Django
+        # would write to the database the instance was loaded from.
+        instance = hints.get('instance')
+        if (instance is not None
+                and instance._state.db == settings.REPLICA_DATABASE):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # Replica has the same data as primary.
+        aliases = {DEFAULT_DB_ALIAS, settings.REPLICA_DATABASE}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
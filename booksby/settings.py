@@ -11,11 +11,12 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import environ
-from google.cloud import secretmanager, logging
 
 import os
 import io
 
+from booksby import settings_secrets
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # Set the project base directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,15 +35,10 @@ if os.path.isfile(env_file):
     # Use a local secret file, if provided
     env.read_env(env_file)
 elif os.environ.get("GOOGLE_CLOUD_PROJECT", None):
-    # Pull secrets from Secret Manager
+    # Pull secrets from cache file stored at deploy or from Secret Manager.
+    # See booksby/settings_secrets.py.
     project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-
-    client = secretmanager.SecretManagerServiceClient()
-    settings_name = os.environ.get("SETTINGS_NAME", "django_settings")
-    name = f"projects/{project_id}/secrets/{settings_name}/versions/latest"
-    payload = client.access_secret_version(
-        name=name).payload.data.decode("UTF-8")
-
+    payload = settings_secrets.load_settings_env(project_id)
     env.read_env(io.StringIO(payload))
 else:
     raise Exception(
@@ -66,11 +62,17 @@ ALLOWED_HOSTS = env('ALLOWED_HOSTS')
 INSTALLED_APPS = [
     'rest_framework', 'django.contrib.admin', 'django.contrib.auth',
     'django.contrib.contenttypes', 'django.contrib.sessions',
-    'django.contrib.messages', 'django.contrib.staticfiles', 'books', 'user',
+    'django.contrib.messages', 'django.contrib.staticfiles',
+    'django.contrib.postgres', 'books', 'user',
     'markdownify.apps.MarkdownifyConfig'
 ]
 
 MIDDLEWARE = [
+    # Goes first to measure time of all other middlewares.
+    'books.middleware.ServerTimingMiddleware',
+    # Goes before session and auth middlewares so their writes make request
+    # sticky to primary DB.
+    'books.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -125,6 +127,24 @@ DATABASES = {
     }
 }
 
+# Read replica used by public pages. See booksby/db_router.py.
+if env('REPLICA_DATABASE_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': env('REPLICA_DATABASE_HOST'),
+        'PORT': env('REPLICA_DATABASE_PORT', default=env('DATABASE_PORT')),
+        # Tests use default test DB instead of creating separate one.
+        'TEST': {
+            'MIRROR': 'default'
+        },
+    }
+# Alias of replica in DATABASES. Empty to read everything from primary.
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else ''
+# How long user reads from primary after writing to DB, to not see stale
+# data due to replica lag.
+REPLICA_STICKY_SEC = 30
+DATABASE_ROUTERS = ['booksby.db_router.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -181,27 +201,46 @@ else:
     STATIC_URL = '/static/'
     STATIC_ROOT = os.path.join(BASE_DIR, 'static')
     STATICFILES_DIRS = [os.path.join(BASE_DIR, 'books/static')]
-
-    # StackDriver setup
-    client = logging.Client()
-    # Connects the logger to the root logging handler; by default
-    # this captures all logs at INFO level and higher
-    client.setup_logging()
-
+    # Hashed file names that are cached for a year, see app.yaml. Requires
+    # running collectstatic before deploy.
+    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+
+    # StackDriver setup. Cloud Logging client is created on the first log
+    # record to not slow down instance start. Handler is attached to the root
+    # logger so it captures all logs at INFO level and higher. Logs of cloud
+    # libraries go to stderr to avoid sending logs about sending logs.
     LOGGING = {
         'version': 1,
         'handlers': {
             'stackdriver': {
                 'level': 'INFO',
-                'class': 'google.cloud.logging.handlers.CloudLoggingHandler',
-                'client': client
-            }
+                'class': 'booksby.cloud_logging.LazyCloudLoggingHandler',
+            },
+            'console': {
+                'level': 'INFO',
+                'class': 'logging.StreamHandler',
+            },
+        },
+        'root': {
+            'handlers': ['stackdriver'],
+            'level': 'INFO'
         },
         'loggers': {
             'django': {
-                'handlers': ['stackdriver'],
                 'level': 'INFO'
-            }
+            },
+            'google.cloud': {
+                'handlers': ['console'],
+                'propagate': False
+            },
+            'google.auth': {
+                'handlers': ['console'],
+                'propagate': False
+            },
+            'google.api_core': {
+                'handlers': ['console'],
+                'propagate': False
+            },
         },
     }
 
@@ -243,6 +282,11 @@ ALGOLIA_APPLICATION_ID = env('ALGOLIA_APPLICATION_ID', default='')
 ALGOLIA_SEARCH_KEY = env('ALGOLIA_SEARCH_KEY', default='')
 ALGOLIA_MODIFY_KEY = env('ALGOLIA_MODIFY_KEY', default='')
 
+# Share of requests (0..1) for which ServerTimingMiddleware measures time spent
+# in SQL, templates and outbound HTTP. Overhead is small so it's fine to keep
+# it on in prod, set to 1 to measure every request.
+SERVER_TIMING_SAMPLE_RATE = env.float('SERVER_TIMING_SAMPLE_RATE', default=0.1)
+
 # for debugging sql
 if env('ENV') == 'local':
     LOGGING = {
@@ -0,0 +1,71 @@
+'''
+Loading of settings secrets on App Engine.
+
+Secrets are stored in Secret Manager as env file. Fetching them on instance
+start requires importing Secret Manager client (~0.3s) and making a blocking
+call, both add to cold start latency. To avoid that secrets can be fetched
+once at deploy time and stored in SECRETS_CACHE_FILE which is uploaded together
+with the app:
+
+python -m booksby.settings_secrets --project <project-id>
+
+If the file is missing, secrets are fetched from Secret Manager.
+'''
+
+import argparse
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Not committed to git, see .gitignore.
+SECRETS_CACHE_FILE = os.path.join(BASE_DIR, '.env.secrets')
+
+DEFAULT_SETTINGS_NAME = 'django_settings'
+
+
+def fetch_from_secret_manager(project_id: str, settings_name: str) -> str:
+    '''Returns latest version of the secret env file.'''
+    # Imported here as it's slow to import and needed only when cache is
+    # missing.
+    from google.cloud import secretmanager
+    client = secretmanager.SecretManagerServiceClient()
+    name = f'projects/{project_id}/secrets/{settings_name}/versions/latest'
+    return client.access_secret_version(name=name).payload.data.decode('UTF-8')
+
+
+def load_settings_env(project_id: str) -> str:
+    '''
+    Returns content of secret env file. Uses cache file stored at deploy if
+    it exists.
+    '''
+    if os.path.isfile(SECRETS_CACHE_FILE):
+        with open(SECRETS_CACHE_FILE, 'r') as f:
+            return f.read()
+    settings_name = os.environ.get('SETTINGS_NAME', DEFAULT_SETTINGS_NAME)
+    return fetch_from_secret_manager(project_id, settings_name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Fetches settings from Secret Manager and stores them in '
+        'cache file that is used instead of Secret Manager on app start.')
+    parser.add_argument('--project',
+                        default=os.environ.get('GOOGLE_CLOUD_PROJECT'),
+                        required=not os.environ.get('GOOGLE_CLOUD_PROJECT'),
+                        help='Google Cloud project id.')
+    parser.add_argument('--settings-name',
+                        default=os.environ.get('SETTINGS_NAME',
+                                               DEFAULT_SETTINGS_NAME),
+                        help='Name of the secret.')
+    parser.add_argument('--output', default=SECRETS_CACHE_FILE)
+    args = parser.parse_args()
+    payload = fetch_from_secret_manager(args.project, args.settings_name)
+    # Create file readable only by current user as it contains secrets.
+    fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(payload)
+    print(f'Stored secrets in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,12 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(tempfile.gettempdir(), 'audiobooksby.sqlite3'),
     },
+    # Same file as default so it can be used to try replica routing locally
+    # by setting REPLICA_DATABASE = 'replica'. Tests use it as separate DB.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'audiobooksby.sqlite3'),
+    },
     'remote': {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': env("DATABASE_NAME"),
@@ -24,4 +30,5 @@ DATABASES = {
 }
 
 MEDIA_ROOT = 'data'
+REPLICA_DATABASE = ''
 LOGGING = {}
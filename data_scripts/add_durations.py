@@ -3,8 +3,7 @@ import os
 import subprocess
 from typing import List, Optional
 import bs4
-import requests
-from . import books
+from . import books, fetch
 
 MININFORM_DIRS = [
     entry for entry in os.walk('/home/nbeloglazov/audiobooks/Аудиокниги')
@@ -12,11 +11,7 @@ MININFORM_DIRS = [
 
 
 def _get_page(url: str) -> bs4.BeautifulSoup:
-    resp = requests.get(url)
-    resp.encoding = 'utf8'
-    if resp.status_code != 200:
-        raise ValueError(f'URL {url} returned {resp.status_code}')
-    return bs4.BeautifulSoup(resp.text, 'html.parser')
+    return fetch.get_html(url)
 
 
 def _get_duration_from_folder(folder_or_file: str) -> int:
@@ -0,0 +1,79 @@
+'''
+Benchmark of importing books with add_or_update_book(). Run on database with
+synthetic data:
+
+    python manage.py generate_synthetic_data --books 10000 --settings=booksby.sqlite_settings
+    python -m data_scripts.benchmark_books_data --books 1000
+
+Half of imported books match existing ones by title and author, other half
+are new. Changes are rolled back at the end so the database stays the same.
+'''
+import argparse
+import os
+import random
+import time
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booksby.sqlite_settings')
+django.setup()
+
+from django.db import transaction
+from books.models import Book, Person
+
+from data_scripts import unit_of_work
+from data_scripts.books import BooksData, add_or_update_book
+
+
+class _Rollback(Exception):
+    pass
+
+
+def main() -> None:
+    '''See module description.'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books',
+                        type=int,
+                        default=1000,
+                        help='Number of books to import.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rand = random.Random(args.seed)
+
+    start = time.monotonic()
+    data = BooksData(
+        people=list(Person.objects.all()),
+        books=list(Book.objects.all()),
+    )
+    print(f'Loaded {len(data.books)} books and {len(data.people)} people '
+          f'in {time.monotonic() - start:.2f}s')
+    existing = rand.sample(data.books, min(args.books // 2, len(data.books)))
+    incoming = [(book.title, [data.first_author(book).name])
+                for book in existing]
+    for i in range(args.books - len(incoming)):
+        incoming.append((f'Benchmark book {i}', [f'Benchmark author {i}']))
+    rand.shuffle(incoming)
+
+    start = time.monotonic()
+    try:
+        with transaction.atomic():
+            # Same as sync.py, changes are written at the end.
+            with unit_of_work.join():
+                for title, authors in incoming:
+                    add_or_update_book(data,
+                                       title=title,
+                                       description='',
+                                       authors=authors,
+                                       narrators=[],
+                                       translators=[],
+                                       cover_url='',
+                                       duration_sec=0)
+            raise _Rollback()
+    except _Rollback:
+        pass
+    elapsed = time.monotonic() - start
+    print(f'Imported {len(incoming)} books in {elapsed:.2f}s, '
+          f'{elapsed / len(incoming) * 1000:.1f}ms per book')
+
+
+if __name__ == '__main__':
+    main()
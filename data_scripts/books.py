@@ -7,24 +7,109 @@ Each run script should use this module in the following way:
 4. Call write_books_data() to update data.json.
 '''
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import datetime
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from datetime import date
 from uuid import UUID
 from unidecode import unidecode
 from django.template import defaultfilters
 from django.core.files import File
-from books.models import Book, BookStatus, Narration, Person, Link, LinkType
-from . import image
+from books.models import Book, BookStatus, Narration, Person, Link
+from . import image, unit_of_work
+
+
+def _normalize(string: str) -> str:
+    return string.lower()
 
 
 @dataclass
 class BooksData:
-    '''All book-related data in one object.'''
+    '''
+    All book-related data in one object. Indexes of people by name and books by
+    title and slug make lookups constant time, so importing books is linear in
+    number of imported books. Use add_person() and add_book() to add objects so
+    that indexes stay up to date.
+    '''
     people: List[Person]
     books: List[Book]
+    _people_by_name: Dict[str, Person] = field(default_factory=dict,
+                                               init=False,
+                                               repr=False)
+    _books_by_title: Dict[str, List[Book]] = field(default_factory=dict,
+                                                   init=False,
+                                                   repr=False)
+    _books_by_slug: Dict[str, Book] = field(default_factory=dict,
+                                            init=False,
+                                            repr=False)
+    # Book uuid -> indexed (title, slug) to update index when they change.
+    _indexed_books: Dict[UUID, Tuple[str, str]] = field(default_factory=dict,
+                                                        init=False,
+                                                        repr=False)
+    # Book uuid -> author with the smallest uuid, same as
+    # book.authors.first().
+    _first_authors: Dict[UUID, Person] = field(default_factory=dict,
+                                               init=False,
+                                               repr=False)
+
+    def __post_init__(self):
+        people, books = self.people, self.books
+        self.people, self.books = [], []
+        for person in people:
+            self.add_person(person)
+        people_by_uuid = {person.uuid: person for person in self.people}
+        authors = Book.authors.through.objects.filter(
+            book_id__in=[book.uuid for book in books]).values_list(
+                'book_id', 'person_id')
+        for book_id, person_id in authors:
+            first = self._first_authors.get(book_id)
+            if first is None or person_id < first.uuid:
+                self._first_authors[book_id] = people_by_uuid.get(
+                    person_id) or Person.objects.get(uuid=person_id)
+        for book in books:
+            self.add_book(book)
+
+    def add_person(self, person: Person) -> None:
+        self.people.append(person)
+        # Keep the first person if there are people with the same name.
+        self._people_by_name.setdefault(_normalize(person.name), person)
+
+    def find_person(self, name: str) -> Optional[Person]:
+        '''Finds person by name ignoring case.'''
+        return self._people_by_name.get(_normalize(name))
+
+    def add_book(self,
+                 book: Book,
+                 authors: Optional[List[Person]] = None) -> None:
+        '''
+        Adds new book or updates indexes of the existing one after its title,
+        slug or authors changed.
+        '''
+        indexed = self._indexed_books.get(book.uuid)
+        if indexed is None:
+            self.books.append(book)
+        else:
+            title, slug = indexed
+            self._books_by_title[title].remove(book)
+            if self._books_by_slug.get(slug) is book:
+                del self._books_by_slug[slug]
+        title = _normalize(book.title)
+        self._books_by_title.setdefault(title, []).append(book)
+        self._books_by_slug.setdefault(book.slug, book)
+        self._indexed_books[book.uuid] = (title, book.slug)
+        if authors:
+            self._first_authors[book.uuid] = min(authors, key=lambda a: a.uuid)
+
+    def find_books_by_title(self, title: str) -> List[Book]:
+        '''Finds books by title ignoring case, in order they were added.'''
+        return self._books_by_title.get(_normalize(title), [])
+
+    def has_slug(self, slug: str) -> bool:
+        return slug in self._books_by_slug
+
+    def first_author(self, book: Book) -> Optional[Person]:
+        return self._first_authors.get(book.uuid)
 
 
 def _slugify(string: str) -> str:
@@ -32,12 +117,13 @@ def _slugify(string: str) -> str:
 
 
 def _get_or_add_person(data: BooksData, name: str) -> Person:
-    for person in data.people:
-        if person.name.lower() == name.lower():
-            return person
+    person = data.find_person(name)
+    if person is not None:
+        return person
     person = Person(name=name)
-    person.save()
-    data.people.append(person)
+    with unit_of_work.join() as uow:
+        uow.save(person)
+    data.add_person(person)
     return person
 
 
@@ -47,42 +133,43 @@ def _get_or_create_people(data: BooksData, people: List[str]) -> List[Person]:
 
 def add_or_update_link(narration: Narration, url_type: str, url: str) -> None:
     '''Adds or update links of a given book in DB. Compares links by type.'''
-    link_type = LinkType.objects.filter(name=url_type).first()
-    existing_link = Link.objects.filter(url_type=link_type,
-                                        narration=narration)
-    if existing_link.count() == 0:
-        link = Link(narration=narration, url_type=link_type, url=url)
-        link.save()
-    else:
-        link = existing_link[0]
-        link.url = url
-        link.save()
+    with unit_of_work.join() as uow:
+        link_type = uow.link_type(url_type)
+        link = uow.find_link(narration, link_type)
+        if link is None:
+            link = Link(narration=narration, url_type=link_type, url=url)
+        else:
+            link.url = url
+        uow.save(link)
 
 
 def set_photo_from_file(person: Person, path: str) -> None:
     '''Given person and path to local file - updates or sets photo on person and saves.'''
     with open(path, 'rb') as f:
-        person.photo.save(person.slug + '.jpg', File(f))
-    person.save()
+        person.photo.save(person.slug + '.jpg', File(f), save=False)
+    with unit_of_work.join() as uow:
+        uow.save(person)
 
 
 def _maybe_add_narration(data: BooksData, book: Book,
-                         narrators_names: List[str]) -> Narration:
-    existing_narrations = book.narrations.all()
+                         narrators_names: List[str],
+                         uow: unit_of_work.UnitOfWork) -> Narration:
+    existing_narrations = uow.narrations(book)
     narrators = _get_or_create_people(data, narrators_names)
     ids: Dict[UUID, bool] = {}
     for narrator in narrators:
         ids[narrator.uuid] = True
     for narration in existing_narrations:
-        if narration.narrators.count() == 0 and len(narrators) == 0:
+        narrator_ids = uow.narrator_ids(narration)
+        if len(narrator_ids) == 0 and len(narrators) == 0:
             return narration
-        first_narrator = narration.narrators.first()
-        if first_narrator and ids.get(first_narrator.uuid, False):
+        # Same as narration.narrators.first().
+        first_narrator_id = min(narrator_ids, default=None)
+        if first_narrator_id and ids.get(first_narrator_id, False):
             return narration
     narration = Narration(book=book)
-    narration.save()
-    narration.narrators.set(narrators)
-    narration.save()
+    uow.save(narration)
+    uow.set_m2m(narration, 'narrators', narrators)
     return narration
 
 
@@ -94,52 +181,63 @@ def add_or_update_book(data: BooksData, title: str, description: str,
 
     If given book already exists in BooksData (compared by title) -
     the existing book object is updated. Some fields are overriden, some are
-    merged. If the book doesn't exist - a new books is created with provided fields.'''
+    merged. If the book doesn't exist - a new books is created with provided fields.
+
+    Changes are written by the current unit of work, see unit_of_work.py.'''
+    with unit_of_work.join() as uow:
+        return _add_or_update_book(data, title, description, authors,
+                                   narrators, translators, cover_url,
+                                   duration_sec, uow)
+
+
+def _add_or_update_book(data: BooksData, title: str, description: str,
+                        authors: List[str], narrators: List[str],
+                        translators: List[str], cover_url: str,
+                        duration_sec: int,
+                        uow: unit_of_work.UnitOfWork) -> Narration:
     book = None
     authors_full = _get_or_create_people(data, authors)
     slug = _slugify(title)
-    for existing_book in data.books:
-        title_a = existing_book.title.lower()
-        title_b = title.lower()
-        if slug == existing_book.slug:
-            slug = _slugify(f'{title}-{authors[0]}')
-        # Try handling cases where some books might have shorten names and different
-        # sources have different variations of those names.
-        if title_a == title_b:
-            existing_author = existing_book.authors.all().first()
-            assert existing_author
-            new_author = authors_full[0]
-            if new_author != existing_author:
-                print(
-                    f'Books "{existing_book.title}" and "{title}" look similar but '
-                    +
-                    f'have different authors. Existing {existing_author.name} '
-                    + f'new author {new_author.name}. Not merging.')
-            else:
-                book = existing_book
-                break
+    if data.has_slug(slug):
+        slug = _slugify(f'{title}-{authors[0]}')
+    # Try handling cases where some books might have shorten names and different
+    # sources have different variations of those names.
+    for existing_book in data.find_books_by_title(title):
+        existing_author = data.first_author(existing_book)
+        assert existing_author
+        new_author = authors_full[0]
+        if new_author != existing_author:
+            print(
+                f'Books "{existing_book.title}" and "{title}" look similar but '
+                + f'have different authors. Existing {existing_author.name} ' +
+                f'new author {new_author.name}. Not merging.')
+        else:
+            book = existing_book
+            break
     if book is None:
         book = Book(title=title,
                     description=description,
                     date=date.today(),
                     slug=slug)
-        book.save()
+        uow.save(book)
     print(book.cover_image)
     if (book.cover_image is None or book.cover_image == ''
             or book.cover_image.name is None) and len(cover_url):
         print('trying image')
         cover_image = image.download_and_resize_image(cover_url, book.slug)
         with open(cover_image, 'rb') as f:
-            book.cover_image.save(os.path.basename(cover_image), File(f))
-        book.save()
-    data.books.append(book)
-    book.authors.set(authors_full)
+            book.cover_image.save(os.path.basename(cover_image),
+                                  File(f),
+                                  save=False)
+    uow.set_m2m(book, 'authors', authors_full)
+    data.add_book(book, authors_full)
     if len(translators):
-        book.translators.set(_get_or_create_people(data, translators))
+        uow.set_m2m(book, 'translators',
+                    _get_or_create_people(data, translators))
     if description != '' and description is not None:
         book.description = description
     book.duration_sec = datetime.timedelta(seconds=duration_sec)
     book.status = BookStatus.ACTIVE
-    book.save()
-    narration = _maybe_add_narration(data, book, narrators)
+    uow.save(book)
+    narration = _maybe_add_narration(data, book, narrators, uow)
     return narration
@@ -0,0 +1,189 @@
+'''
+Per-source state of sync commands that allows skipping items which didn't
+change since the last run and resuming interactive imports.
+
+State of each source is stored in data/sync_state/<source>.json next to
+data.json and is committed together with it. It contains fingerprints of
+processed items keyed by item id (url, id in the source catalog) and an
+optional cursor, e.g. page of the catalog where the last run stopped.
+
+Syncers get state of the running command with current() and check each item
+before processing it:
+
+    state = checkpoints.current()
+    key, fp = book['id'], checkpoints.fingerprint(book)
+    if state.is_unchanged(key, fp):
+        continue
+    ... add or update the book ...
+    state.mark(key, fp)
+
+State is saved by sync.py only after changes are written to the database and
+data.json, so it never claims items that weren't saved.
+
+mark() is also the point where an interrupted run stops, see interruptible().
+Ctrl-C pressed while an item is being written takes effect when the item is
+marked, so that the unit of work doesn't contain half of an item, e.g. a book
+without authors.
+'''
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import signal
+from typing import Any, Dict, Iterator, Optional
+
+from data_scripts import unit_of_work
+
+STATE_DIR = 'data/sync_state'
+
+
+class Interrupted(KeyboardInterrupt):
+    '''Sync was stopped with Ctrl-C between items.'''
+
+
+def _registrations() -> int:
+    uow = unit_of_work.current()
+    return uow.registrations if uow is not None else 0
+
+
+def fingerprint(*parts: Any) -> str:
+    '''Hash of JSON-serializable parts of an item.'''
+    serialized = json.dumps(parts,
+                            sort_keys=True,
+                            ensure_ascii=False,
+                            default=str)
+    return hashlib.sha256(serialized.encode('utf8')).hexdigest()
+
+
+class SourceState:
+    '''See module docs.'''
+
+    def __init__(self,
+                 source: str,
+                 path: Optional[str] = None,
+                 cursor: Any = None,
+                 items: Optional[Dict[str, str]] = None):
+        self.source = source
+        # None for state that isn't saved.
+        self.path = path
+        self.cursor = cursor
+        # Item key -> fingerprint.
+        self.items: Dict[str, str] = items or {}
+        self.processed = 0
+        self.skipped = 0
+        # Set by interruptible() on Ctrl-C while an item is being written.
+        self.stop_requested = False
+        # Unit of work registrations when the last item was marked.
+        self._registrations_at_mark = 0
+
+    def is_unchanged(self, key: str, fp: str = '') -> bool:
+        '''
+        Whether item was processed by a previous run and its fingerprint is
+        the same. Counts the item as skipped if so.
+        '''
+        unchanged = self.items.get(key) == fp
+        if unchanged:
+            self.skipped += 1
+        return unchanged
+
+    def mark(self, key: str, fp: str = '') -> None:
+        '''
+        Records that item is processed. Call after item is added. Raises
+        Interrupted if stop was requested while the item was written.
+        '''
+        self.items[key] = fp
+        self.processed += 1
+        self._registrations_at_mark = _registrations()
+        if self.stop_requested:
+            raise Interrupted()
+
+    def is_writing_item(self) -> bool:
+        '''Whether unit of work got registrations since the last mark().'''
+        return _registrations() != self._registrations_at_mark
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump({
+                'cursor': self.cursor,
+                'items': self.items
+            },
+                      f,
+                      ensure_ascii=False,
+                      indent=2,
+                      sort_keys=True)
+            f.write('\n')
+        os.replace(tmp_path, self.path)
+
+    def report(self) -> str:
+        return (f'{self.source}: {self.processed} items processed, '
+                f'{self.skipped} unchanged skipped')
+
+
+def load(source: str, directory: str = STATE_DIR) -> SourceState:
+    '''Reads state of the source or returns empty one.'''
+    path = os.path.join(directory, f'{source}.json')
+    if not os.path.exists(path):
+        return SourceState(source, path)
+    with open(path, 'r', encoding='utf8') as f:
+        saved = json.load(f)
+    return SourceState(source,
+                       path,
+                       cursor=saved.get('cursor'),
+                       items=saved.get('items'))
+
+
+_current: contextvars.ContextVar[Optional[SourceState]] = (
+    contextvars.ContextVar('data_scripts_source_state', default=None))
+
+
+@contextlib.contextmanager
+def use(state: SourceState) -> Iterator[SourceState]:
+    '''Makes state returned by current() inside the block.'''
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+def current() -> SourceState:
+    '''
+    State of the running sync command. Outside of sync.py returns empty
+    state that isn't saved, so syncers process all items.
+    '''
+    state = _current.get()
+    if state is None:
+        return SourceState('')
+    return state
+
+
+@contextlib.contextmanager
+def interruptible(state: SourceState) -> Iterator[None]:
+    '''
+    Makes Ctrl-C inside the block raise Interrupted between items of state.
+    If an item is being written, stop is delayed until mark() of the item.
+    Ctrl-C pressed again raises KeyboardInterrupt right away, so that nothing
+    is saved. Must be used in the main thread.
+    '''
+
+    def on_interrupt(signum: int, frame: Any) -> None:
+        if state.stop_requested:
+            raise KeyboardInterrupt()
+        if not state.is_writing_item():
+            raise Interrupted()
+        state.stop_requested = True
+        print('Stopping after the current item, press Ctrl-C again to stop '
+              'without saving anything')
+
+    state._registrations_at_mark = _registrations()
+    previous = signal.signal(signal.SIGINT, on_interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
@@ -0,0 +1,174 @@
+'''
+Shared HTTP layer of data_scripts scrapers.
+
+All requests go through one keep-alive session with timeouts and retries of
+temporary failures. Requests to a single host are limited in concurrency and
+rate, the same way check_links does it (see books/link_checker.py), so that
+scrapers stay polite to the sites. Responses can be cached on disk and
+replayed offline, see http_cache.py.
+
+Detail pages are fetched in parallel with map(), which returns results in
+the order of inputs:
+
+    for url, page in zip(urls, fetch.map(fetch.get_html, urls)):
+        _add_book(data, url, page)
+
+Functions passed to map() run in worker threads and must only fetch and
+parse. Database writes stay in the calling thread, so they happen in the
+same order as without concurrency and go to the current unit of work.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+import bs4
+import requests
+
+from books.link_checker import (RETRY_STATUSES, HostThrottle, make_session,
+                                retry_delay)
+from data_scripts.http_cache import HttpCache, request_key
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class Fetcher:
+    '''See module docs.'''
+
+    def __init__(self,
+                 concurrency: int = 8,
+                 per_host_concurrency: int = 4,
+                 per_host_rate: float = 10,
+                 retries: int = 2,
+                 backoff_sec: float = 1,
+                 timeout_sec: float = 30,
+                 cache: Optional[HttpCache] = None):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_sec = backoff_sec
+        self.timeout_sec = timeout_sec
+        self.throttle = HostThrottle(per_host_concurrency, per_host_rate)
+        self.session = make_session(concurrency)
+        self.cache = cache
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        '''
+        Sends request retrying network errors and temporary failures.
+        Raises ValueError if response status is not 200.
+        '''
+        if self.cache is None:
+            return self._check_status(self._send(method, url, **kwargs))
+        key = request_key(method, url, **kwargs)
+        cached = self.cache.get(key)
+        if self.cache.offline:
+            if cached is None:
+                raise ValueError(f'URL {url} is not in HTTP cache')
+            return cached.to_response()
+        if cached is not None and method == 'GET':
+            kwargs['headers'] = {
+                **kwargs.get('headers', {}),
+                **cached.validators()
+            }
+        response = self._send(method, url, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached.to_response()
+        self._check_status(response)
+        self.cache.put(key, response)
+        return response
+
+    def _check_status(self, response: requests.Response) -> requests.Response:
+        if response.status_code != 200:
+            raise ValueError(
+                f'URL {response.url} returned {response.status_code}')
+        return response
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        attempt = 0
+        while True:
+            response = None
+            try:
+                with self.throttle.acquire(url):
+                    response = self.session.request(method,
+                                                    url,
+                                                    timeout=self.timeout_sec,
+                                                    **kwargs)
+            except requests.RequestException:
+                if attempt >= self.retries:
+                    raise
+            if response is not None and (response.status_code
+                                         not in RETRY_STATUSES
+                                         or attempt >= self.retries):
+                return response
+            time.sleep(retry_delay(response, attempt, self.backoff_sec))
+            attempt += 1
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        '''
+        Calls fn for all items concurrently. Yields results in the same order
+        as items, re-raising the exception of a failed call.
+        '''
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            yield from executor.map(fn, items)
+        finally:
+            # Don't wait for the rest of items if caller stopped early, e.g.
+            # sync was interrupted.
+            executor.shutdown(cancel_futures=True)
+
+    def close(self) -> None:
+        '''Closes all pooled connections.'''
+        self.session.close()
+
+
+_default: Optional[Fetcher] = None
+_default_lock = threading.Lock()
+
+
+def configure(**kwargs) -> Fetcher:
+    '''
+    Replaces fetcher shared by all scrapers with a new one. Takes the same
+    arguments as Fetcher.
+    '''
+    global _default
+    with _default_lock:
+        if _default is not None:
+            _default.close()
+        _default = Fetcher(**kwargs)
+        return _default
+
+
+def default() -> Fetcher:
+    '''Fetcher shared by all scrapers.'''
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Fetcher()
+        return _default
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    '''GET request with the shared fetcher. See Fetcher.request.'''
+    return default().request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    '''POST request with the shared fetcher. See Fetcher.request.'''
+    return default().request('POST', url, **kwargs)
+
+
+def get_json(url: str, **kwargs) -> Any:
+    '''Fetches and parses JSON.'''
+    return get(url, **kwargs).json()
+
+
+def get_html(url: str, **kwargs) -> bs4.BeautifulSoup:
+    '''Fetches and parses html page. Pages are expected in utf8.'''
+    resp = get(url, **kwargs)
+    resp.encoding = 'utf8'
+    return bs4.BeautifulSoup(resp.text, 'html.parser')
+
+
+def map(fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+    '''Concurrent ordered map with the shared fetcher. See Fetcher.map.'''
+    return default().map(fn, items)
@@ -0,0 +1,131 @@
+'''
+On-disk cache of HTTP responses fetched by scrapers, see fetch.py.
+
+Bodies are stored content-addressed by their sha256, so identical pages are
+stored once. Each request (method, url with params, body) has an entry that
+points to the body and keeps the headers needed to revalidate it: ETag and
+Last-Modified. When the cached request is sent again, it's sent as a
+conditional request and the cached body is used if the server responds with
+304 Not Modified.
+
+In offline mode requests are never sent: responses are replayed from the
+cache and missing ones fail. This allows re-running a scraper after a parser
+fix in seconds and running scrapers in tests from recorded responses.
+
+    cache/
+        entries/<request key>.json
+        bodies/<first two chars of sha256>/<sha256>
+'''
+
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'audiobooks_http_cache')
+
+# Headers that are stored with the body. Content-Type is needed to decode
+# text, the rest to revalidate.
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+
+def request_key(method: str, url: str, **kwargs) -> str:
+    '''
+    Key of the request. Takes the same arguments as requests.request, only
+    params and data affect the key.
+    '''
+    prepared = requests.Request(method,
+                                url,
+                                params=kwargs.get('params'),
+                                data=kwargs.get('data')).prepare()
+    body = prepared.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf8')
+    digest = hashlib.sha256(f'{prepared.method} {prepared.url}\n'.encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    '''Response stored in the cache.'''
+    url: str
+    headers: Dict[str, str]
+    body: bytes
+
+    def validators(self) -> Dict[str, str]:
+        '''Headers of a conditional request that revalidates the response.'''
+        headers = {}
+        if 'ETag' in self.headers:
+            headers['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+    def to_response(self) -> requests.Response:
+        '''Builds requests response with status 200 from the cached one.'''
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        return response
+
+
+class HttpCache:
+    '''See module docs.'''
+
+    def __init__(self, directory: str = DEFAULT_DIR, offline: bool = False):
+        self.directory = directory
+        self.offline = offline
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, 'entries', f'{key}.json')
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.directory, 'bodies', body_hash[:2], body_hash)
+
+    def _write(self, path: str, content: bytes) -> None:
+        # Scrapers fetch in several threads. Write into a temporary file and
+        # rename so that readers never see a partially written file.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                        suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        '''Returns cached response of the request or None.'''
+        try:
+            with open(self._entry_path(key), 'r', encoding='utf8') as f:
+                entry: Dict[str, Any] = json.load(f)
+            with open(self._body_path(entry['body']), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        return CachedResponse(url=entry['url'],
+                              headers=entry['headers'],
+                              body=body)
+
+    def put(self, key: str, response: requests.Response) -> None:
+        '''Stores successful response of the request.'''
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        if not os.path.exists(self._body_path(body_hash)):
+            self._write(self._body_path(body_hash), response.content)
+        entry = {
+            'url': response.url,
+            'headers': {
+                name: response.headers[name]
+                for name in STORED_HEADERS if name in response.headers
+            },
+            'body': body_hash,
+        }
+        self._write(self._entry_path(key),
+                    json.dumps(entry, ensure_ascii=False, indent=2).encode())
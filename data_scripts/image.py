@@ -4,17 +4,17 @@ import io
 import os
 import tempfile
 from PIL import Image
-import requests
 
-MAX_IMAGE_SIZE_PX = 500
+from data_scripts import fetch
+
+# Matches the largest rendition width, see books/images.py.
+MAX_IMAGE_SIZE_PX = 600
 
 
 def download_and_resize_image(url: str, name: str) -> str:
     """Downloads image, resizes it to match max size limit and stores in in temp folder returning path."""
 
-    resp = requests.get(url)
-    if resp.status_code != 200:
-        raise ValueError(f"URL {url} returned {resp.status_code}")
+    resp = fetch.get(url)
     image = Image.open(io.BytesIO(resp.content))
     if not image.format:
         raise ValueError(f"Can't determine image format of URL {url}")
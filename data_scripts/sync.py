@@ -3,8 +3,8 @@ Script for managing DB data stored in JSON. Managing includes syncing data from
 other sources like podcasts, knizhny voz, litres. It also provides script for validating
 that data is correct. See SYNC_COMMANDS for various commands.
 '''
+import argparse
 import os
-import sys
 from typing import Callable, Dict
 import django
 
@@ -14,20 +14,20 @@ django.setup()
 from django.core import management
 from books.models import Book, Person, Tag
 
-from . import sync_yandex, add_durations, sync_add_translations, sync_from_json, sync_kamunikat, sync_knihi_com, sync_knizhny_voz, sync_litres, sync_mininform, sync_podcasts, sync_soundcloud
+from books import data_dump
+from . import checkpoints, fetch, http_cache, sync_yandex, add_durations, sync_add_translations, sync_from_json, sync_kamunikat, sync_knihi_com, sync_knizhny_voz, sync_litres, sync_mininform, sync_podcasts, sync_soundcloud, unit_of_work, working_db
 from data_scripts.books import BooksData
 
 
 def _initialize_db() -> None:
-    management.call_command('makemigrations')
-    management.call_command('migrate', 'books', 'zero')
-    management.call_command('migrate')
-    management.call_command('loaddata', 'data/data.json')
+    # Database is created from scratch, so working database state is stale.
+    working_db.invalidate()
+    management.call_command('init_db_with_data')
 
 
 def _dump_db() -> None:
     with open('data/data.json', 'w', encoding='utf8') as f:
-        management.call_command('dumpdata', 'books', indent=2, stdout=f)
+        data_dump.dump('default', f)
     management.call_command('loaddata', 'data/data.json')
 
 
@@ -46,22 +46,69 @@ SYNC_COMMANDS: Dict[str, Callable[[BooksData], None]] = {
 }
 
 
+def _run(command: str, data: BooksData,
+         state: checkpoints.SourceState) -> None:
+    # Changes are written at the end in one transaction, nothing is written
+    # if the command fails.
+    with unit_of_work.join(), checkpoints.use(state):
+        with checkpoints.interruptible(state):
+            try:
+                SYNC_COMMANDS[command](data)
+            except checkpoints.Interrupted:
+                # Stopped between items, so the unit of work has only whole
+                # items. Save them and the state of marked ones, so that the
+                # next run continues after them.
+                print('Interrupted, saving processed items')
+
+
 def main() -> None:
     """Run mains"""
-    assert len(sys.argv) == 2, 'Must pass sync command to run.'
-    command = sys.argv[1]
-    if command not in SYNC_COMMANDS:
-        available_commands = ', '.join(SYNC_COMMANDS.keys())
-        raise ValueError(f'Must pass a command. One of {available_commands}')
-    _initialize_db()
-
-    print(f'Running "{command}"')
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=SYNC_COMMANDS.keys())
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Reuse database of the previous run and rewrite only changed '
+        'entries of data.json. See working_db.py.')
+    parser.add_argument(
+        '--http-cache',
+        choices=['off', 'revalidate', 'offline'],
+        default='revalidate',
+        help='Cache fetched pages on disk and revalidate them with '
+        'conditional requests, or replay them without network in offline '
+        'mode. See http_cache.py.')
+    parser.add_argument('--http-cache-dir', default=http_cache.DEFAULT_DIR)
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Process all items of the source, including ones that did not '
+        'change since the last run. See checkpoints.py.')
+    args = parser.parse_args()
+    if args.http_cache != 'off':
+        fetch.configure(cache=http_cache.HttpCache(
+            args.http_cache_dir, offline=args.http_cache == 'offline'))
+    if args.incremental:
+        working_db.prepare()
+    else:
+        _initialize_db()
+
+    print(f'Running "{args.command}"')
     data = BooksData(
         people=list(Person.objects.all()),
         books=list(Book.objects.all()),
     )
-    SYNC_COMMANDS[command](data)
-    _dump_db()
+    state = checkpoints.load(args.command)
+    if args.full:
+        state = checkpoints.SourceState(args.command, state.path)
+    _run(args.command, data, state)
+    if args.incremental:
+        written = working_db.save_changes()
+        print(f'Updated {written} objects in data.json')
+    else:
+        _dump_db()
+    # Only after changes are in data.json.
+    state.save()
+    print(state.report())
 
 
 if __name__ == '__main__':
@@ -1,10 +1,8 @@
 from dataclasses import dataclass
 from typing import List, Tuple
-import bs4
-import requests
 
 from data_scripts.util import open_url
-from . import books
+from . import books, checkpoints, fetch
 
 
 @dataclass
@@ -35,8 +33,12 @@ def _get_raw_books(start: int) -> List[RawBook]:
     return result
 
 
-def _get_description_and_photo(url: str) -> Tuple[str, str]:
-    page = open_url(url)
+def _book_url(raw_book: RawBook) -> str:
+    return f'https://kamunikat.org{raw_book.url}'
+
+
+def _get_description_and_photo(raw_book: RawBook) -> Tuple[str, str]:
+    page = open_url(_book_url(raw_book))
     description = ''
     if page.select_one('.VolumeSummary p') is not None:
         description = page.select_one('.VolumeSummary p').string
@@ -50,11 +52,12 @@ def _get_description_and_photo(url: str) -> Tuple[str, str]:
     return (description, cover_url)
 
 
-def _add_book(data: books.BooksData, idx: int, raw_book: RawBook) -> None:
+def _add_book(data: books.BooksData, idx: int, raw_book: RawBook,
+              description: str, cover_url: str) -> None:
     print(f'\n\n#{idx + 1}')
     print(raw_book.title)
     print(f'author: {raw_book.author}')
-    url = f'https://kamunikat.org{raw_book.url}'
+    url = _book_url(raw_book)
     print(url)
     print('')
     print('what to do? 1 - skip, 2 - accept, 3 - edit')
@@ -76,7 +79,6 @@ def _add_book(data: books.BooksData, idx: int, raw_book: RawBook) -> None:
         new_author = input('-> ')
         if len(new_author) > 0:
             raw_book.author = new_author
-    description, cover_url = _get_description_and_photo(url)
     print(description)
     print(cover_url)
     narration = books.add_or_update_book(data,
@@ -93,10 +95,31 @@ def _add_book(data: books.BooksData, idx: int, raw_book: RawBook) -> None:
 
 
 def run(data: books.BooksData) -> None:
-    '''Run mains'''
-    start = 50
-    offset = 0
-    step = 10
-    for idx, raw_book in enumerate(_get_raw_books(start)):
-        if idx >= offset and idx < offset + step:
-            _add_book(data, idx, raw_book)
\ No newline at end of file
+    '''
+    Goes through catalog pages and asks to review books that weren't reviewed
+    before. Can be interrupted, the next run continues from the same page.
+    '''
+    state = checkpoints.current()
+    # Cursor is pub_start of the page interrupted run stopped at.
+    start = state.cursor or 0
+    while True:
+        state.cursor = start
+        raw_books = _get_raw_books(start)
+        if not raw_books:
+            break
+        new_books = []
+        for idx, raw_book in enumerate(raw_books, start=start):
+            # Taken before user edits the book.
+            fp = checkpoints.fingerprint(raw_book.title, raw_book.author)
+            if not state.is_unchanged(raw_book.url, fp):
+                new_books.append((idx, raw_book, fp))
+        # Book pages are loaded in background while user reviews books.
+        pages = fetch.map(_get_description_and_photo,
+                          [raw_book for _, raw_book, _ in new_books])
+        for (idx, raw_book, fp), page in zip(new_books, pages):
+            description, cover_url = page
+            _add_book(data, idx, raw_book, description, cover_url)
+            state.mark(raw_book.url, fp)
+        start += len(raw_books)
+    # Whole catalog is reviewed, next run starts from the first page.
+    state.cursor = None
@@ -1,10 +1,8 @@
 from dataclasses import dataclass
 from typing import List
-import bs4
-import requests
 
 from data_scripts.util import open_url
-from . import books
+from . import books, checkpoints
 
 
 @dataclass
@@ -95,9 +93,16 @@ def _add_book(data: books.BooksData, idx: int, raw_book: RawBook) -> None:
 
 
 def run(data: books.BooksData) -> None:
-    '''Run mains'''
-    start = 140
-    step = 10
+    '''
+    Asks to review books that weren't reviewed before. Can be interrupted,
+    the next run continues with the remaining books.
+    '''
+    state = checkpoints.current()
     for idx, raw_book in enumerate(_get_raw_books()):
-        if idx >= start and idx < start + step:
-            _add_book(data, idx, raw_book)
\ No newline at end of file
+        # Taken before user edits the book.
+        fp = checkpoints.fingerprint(raw_book.title, raw_book.author,
+                                     raw_book.narrator)
+        if state.is_unchanged(raw_book.url, fp):
+            continue
+        _add_book(data, idx, raw_book)
+        state.mark(raw_book.url, fp)
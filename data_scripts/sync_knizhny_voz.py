@@ -1,8 +1,7 @@
 '''Syncer that loads data from https://knizhnyvoz.by/books/'''
 
 from typing import Any, List, Dict, Set
-import requests
-from . import books
+from . import books, checkpoints, fetch
 
 DATA_URL = 'https://knizhnyvoz.by/books/'
 
@@ -62,15 +61,16 @@ def _clean_name(raw_name: str) -> List[str]:
 
 
 def _get_duration_sec(id: str) -> int:
-    chapters: List[Dict] = requests.get(
-        'https://knizhnyvoz.herokuapp.com/books/' + id).json()
+    chapters: List[Dict] = fetch.get_json(
+        'https://knizhnyvoz.herokuapp.com/books/' + id)
     duration_ms = 0
     for chapter in chapters:
         duration_ms += chapter['duration']
     return int(duration_ms / 1000)
 
 
-def add_or_sync_book_voz(data: books.BooksData, book: dict[str, Any]) -> None:
+def add_or_sync_book_voz(data: books.BooksData, book: dict[str, Any],
+                         duration_sec: int) -> None:
     '''
     Given a book object from knizhnyvoz JSON - picks and cleans necessary
     parts and adds it to BooksData. To understand that method better check
@@ -104,7 +104,7 @@ def add_or_sync_book_voz(data: books.BooksData, book: dict[str, Any]) -> None:
         narrators=narrators_list,
         translators=translators,
         cover_url=book['imageUri'],
-        duration_sec=_get_duration_sec(book['id']))
+        duration_sec=duration_sec)
     books.add_or_update_link(narration=narration,
                              url_type='knizhny_voz',
                              url='https://knizhnyvoz.by/app/book/' +
@@ -113,9 +113,15 @@ def add_or_sync_book_voz(data: books.BooksData, book: dict[str, Any]) -> None:
 
 def run(data: books.BooksData):
     'Synchronizes data.json with data from http://knizhnyvoz.by'
-    resp = requests.get(DATA_URL)
-    if resp.status_code != 200:
-        raise ValueError(f'URL {DATA_URL} returned {resp.status_code}')
-    data_json: list[dict[str, Any]] = resp.json()
-    for book_json in data_json:
-        add_or_sync_book_voz(data, book_json)
+    state = checkpoints.current()
+    data_json: list[dict[str, Any]] = fetch.get_json(DATA_URL)
+    changed = [
+        book_json for book_json in data_json if not state.is_unchanged(
+            book_json['id'], checkpoints.fingerprint(book_json))
+    ]
+    # Durations need a request per book, fetch them in parallel.
+    durations = fetch.map(_get_duration_sec,
+                          [book_json['id'] for book_json in changed])
+    for book_json, duration_sec in zip(changed, durations):
+        add_or_sync_book_voz(data, book_json, duration_sec)
+        state.mark(book_json['id'], checkpoints.fingerprint(book_json))
@@ -8,10 +8,9 @@ extra books which aren't included in search results.
 
 import datetime
 import re
-from typing import List, Optional
-import requests
+from typing import Optional, Tuple
 import bs4
-from . import books
+from . import books, checkpoints, fetch
 
 # Dictionary that helps to fix some errors on LitRes data.
 REPLACEMENTS = {
@@ -29,8 +28,8 @@ def _maybe_replace(string: str) -> str:
 
 
 def _find_mybook_url_by_title(title: str) -> Optional[str]:
-    resp = requests.get('https://mybook.ru/search/audiobooks', {'q': title})
-    soup = bs4.BeautifulSoup(resp.text, 'html.parser')
+    soup = fetch.get_html('https://mybook.ru/search/audiobooks',
+                          params={'q': title})
     for link in soup.select('a'):
         if link.attrs.get('href', '').startswith('/author/'):
             return 'https://mybook.ru' + link['href']
@@ -42,11 +41,21 @@ LITRES_DURATION_FORMAT = re.compile(
     r'(?P<hours>\d+?) ч. (?P<minutes>\d+?) мин. (?P<seconds>\d+?) сек.')
 
 
-def _sync_book(data: books.BooksData, url: str) -> None:
-    resp = requests.get(url)
-    if resp.status_code != 200:
-        raise ValueError(f'URL {url} returned {resp.status_code}')
-    soup = bs4.BeautifulSoup(resp.text, 'html.parser')
+def _fetch_book(url: str) -> Tuple[bs4.BeautifulSoup, str]:
+    '''Returns book page and its fingerprint.'''
+    resp = fetch.get(url)
+    resp.encoding = 'utf8'
+    return (bs4.BeautifulSoup(resp.text, 'html.parser'),
+            checkpoints.fingerprint(resp.text))
+
+
+def _find_mybook_url(soup: bs4.BeautifulSoup) -> Optional[str]:
+    orig_title = soup.select_one('.biblio_book_name h1').string
+    return _find_mybook_url_by_title(orig_title)
+
+
+def _sync_book(data: books.BooksData, url: str, soup: bs4.BeautifulSoup,
+               mybook_url: Optional[str]) -> None:
     orig_title = soup.select_one('.biblio_book_name h1').string
     title = _maybe_replace(orig_title)
     print(f'Processing {title}')
@@ -88,7 +97,6 @@ def _sync_book(data: books.BooksData, url: str) -> None:
                                          duration_sec=int(
                                              duration.total_seconds()))
     books.add_or_update_link(narration, 'litres', url)
-    mybook_url = _find_mybook_url_by_title(orig_title)
     if mybook_url is not None:
         books.add_or_update_link(narration, 'mybook', mybook_url)
 
@@ -104,5 +112,11 @@ EXTRA_BOOKS = [
 def run(data: books.BooksData):
     '''Sync function. See module description for details.'''
     urls = EXTRA_BOOKS
-    for url in urls:
-        _sync_book(data, url)
+    state = checkpoints.current()
+    changed = [(url, soup, fp)
+               for url, (soup, fp) in zip(urls, fetch.map(_fetch_book, urls))
+               if not state.is_unchanged(url, fp)]
+    mybook_urls = fetch.map(_find_mybook_url, [soup for _, soup, _ in changed])
+    for (url, soup, fp), mybook_url in zip(changed, mybook_urls):
+        _sync_book(data, url, soup, mybook_url)
+        state.mark(url, fp)
@@ -2,12 +2,12 @@
 
 from dataclasses import dataclass
 import datetime
+import hashlib
 from typing import Dict, List, Optional
 import django
-import requests
 import feedparser
 
-from . import books
+from . import books, checkpoints, fetch
 
 
 @dataclass
@@ -37,8 +37,7 @@ def _find_apple_podcast_id(title: str) -> Optional[int]:
     '''Helper function to find id of an podcast on apple. This needed for podcast.ru later.'''
     params = {'media': 'podcast', 'term': title}
 
-    resp = requests.get('https://itunes.apple.com/search',
-                        params=params).json()
+    resp = fetch.get_json('https://itunes.apple.com/search', params=params)
     if resp['resultCount'] == 0:
         return None
     return resp['results'][0]['collectionId']
@@ -58,7 +57,7 @@ def _get_podcast_urls(title: str) -> Dict[str, str]:
         apple_id
     ) + '},"query":"query GetPodcast($id: Int!) { podcast(id: $id) ' + \
         '{ linkCastbox linkSpotify linkGoogle linkItunes linkYandex}}"}'
-    resp = requests.post('https://podcast.ru/graphql', data=query).json()
+    resp = fetch.post('https://podcast.ru/graphql', data=query).json()
     links = resp['data']['podcast']
     return {
         'google_podcast': links['linkGoogle'],
@@ -69,8 +68,12 @@ def _get_podcast_urls(title: str) -> Dict[str, str]:
     }
 
 
-def _sync_from_podcast(data: books.BooksData, podcast: Podcast) -> None:
-    rss = feedparser.parse(podcast.rss_feed)
+def _fetch_rss(podcast: Podcast) -> bytes:
+    return fetch.get(podcast.rss_feed).content
+
+
+def _sync_from_podcast(data: books.BooksData, podcast: Podcast,
+                       rss: feedparser.FeedParserDict) -> None:
     feed = rss['feed']
     title = feed['title']
     print(f'processing {title}')
@@ -105,5 +108,14 @@ def _sync_from_podcast(data: books.BooksData, podcast: Podcast) -> None:
 
 def run(data: books.BooksData) -> None:
     '''Run mains'''
-    for podcast in PODCASTS[0:1]:
-        _sync_from_podcast(data, podcast)
+    state = checkpoints.current()
+    podcasts = PODCASTS[0:1]
+    for podcast, rss in zip(podcasts, fetch.map(_fetch_rss, podcasts)):
+        # Config of the podcast is part of the fingerprint as it affects
+        # links and narrators.
+        fp = checkpoints.fingerprint(podcast.podcasts, podcast.narrators,
+                                     hashlib.sha256(rss).hexdigest())
+        if state.is_unchanged(podcast.rss_feed, fp):
+            continue
+        _sync_from_podcast(data, podcast, feedparser.parse(rss))
+        state.mark(podcast.rss_feed, fp)
@@ -9,8 +9,7 @@ from datetime import datetime
 import json
 import os
 import re
-import requests
-from . import books, image
+from . import books, checkpoints, fetch, image, unit_of_work
 from django.core.files import File
 
 RADIO_SVABODA_URLS = [
@@ -51,16 +50,19 @@ PENBELARUS_URLS = [
 ]
 
 
-def _sync_book(data: books.BooksData, url: str, url_type: str) -> None:
+def _fetch_page(url: str) -> str:
+    resp = fetch.get(url)
+    resp.encoding = 'utf8'
+    return resp.text
+
+
+def _sync_book(data: books.BooksData, url: str, url_type: str,
+               page: str) -> None:
     print(f'Processing url {url}. ')
     is_cont = input('Continue? -> ')
     if is_cont != 'y' and is_cont != 'yes':
         return
-    resp = requests.get(url)
-    resp.encoding = 'utf8'
-    if resp.status_code != 200:
-        raise ValueError(f'URL returned {resp.status_code}')
-    match = re.search('window.__sc_hydration = (.*);</script>', resp.text)
+    match = re.search('window.__sc_hydration = (.*);</script>', page)
     if match is None:
         raise ValueError('Did not found JSON in html source.')
     json_data = json.loads(match.group(1))
@@ -107,14 +109,17 @@ def _sync_book(data: books.BooksData, url: str, url_type: str) -> None:
         cover_url=cover if cover_book_or_author == 'book' else '',
         duration_sec=round(playlist['duration'] / 1000))
     assert narration.book
-    author = narration.book.authors.first()
+    author = data.first_author(narration.book)
     if cover != '' and cover_book_or_author == 'author' and (
             author.photo is None or author.photo == ''
             or author.photo.name is None):
         cover_image = image.download_and_resize_image(cover, author.slug)
         with open(cover_image, 'rb') as f:
-            author.photo.save(os.path.basename(cover_image), File(f))
-        author.save()
+            author.photo.save(os.path.basename(cover_image),
+                              File(f),
+                              save=False)
+        with unit_of_work.join() as uow:
+            uow.save(author)
     narration.book.date = datetime.fromisoformat(
         playlist['created_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d')
     books.add_or_update_link(narration, url_type, url)
@@ -123,11 +128,14 @@ def _sync_book(data: books.BooksData, url: str, url_type: str) -> None:
 def run(data: books.BooksData) -> None:
     '''Run mains'''
     # for url in RADIO_SVABODA_URLS:
-    #     _sync_book(data, url, 'radio_svaboda')
+    #     _sync_book(data, url, 'radio_svaboda', _fetch_page(url))
     # for url in MOVA_NANOVA_URLS:
-    #     _sync_book(data, url, 'movananova')
-    start = 100
-    step = 10
-    for idx, url in enumerate(PENBELARUS_URLS):
-        if idx >= start and idx < start + step:
-            _sync_book(data, url, 'penbelarus')
+    #     _sync_book(data, url, 'movananova', _fetch_page(url))
+    state = checkpoints.current()
+    # Playlists are asked about once. Run can be interrupted, the next one
+    # continues with the remaining playlists.
+    urls = [url for url in PENBELARUS_URLS if not state.is_unchanged(url)]
+    # Playlist pages are loaded in background while user reviews books.
+    for url, page in zip(urls, fetch.map(_fetch_page, urls)):
+        _sync_book(data, url, 'penbelarus', page)
+        state.mark(url)
@@ -3,7 +3,8 @@ Import audiobooks from Yandex.Music Vyseishaya Shkola collection.
 '''
 import json
 from typing import List
-from data_scripts import books
+import bs4
+from data_scripts import books, checkpoints, fetch
 from data_scripts.util import open_url
 
 BASE_URL = 'https://music.yandex.by'
@@ -22,8 +23,8 @@ def _get_books_urls() -> List[str]:
     return [BASE_URL + link.attrs['href'] for link in links]
 
 
-def _maybe_add_book(data: books.BooksData, url: str) -> None:
-    page = open_url(url)
+def _maybe_add_book(data: books.BooksData, url: str,
+                    page: bs4.BeautifulSoup) -> None:
     print(f'processing {url}')
     title_parts = page.select_one('.page-album__title').string.split('.')
     for script in page.select('script'):
@@ -75,5 +76,9 @@ def _maybe_add_book(data: books.BooksData, url: str) -> None:
 
 def run(data: books.BooksData) -> None:
     '''Run mains'''
-    for url in _get_books_urls():
-        _maybe_add_book(data, url)
\ No newline at end of file
+    state = checkpoints.current()
+    urls = [url for url in _get_books_urls() if not state.is_unchanged(url)]
+    # Album pages are loaded in background while user reviews books.
+    for url, page in zip(urls, fetch.map(open_url, urls)):
+        _maybe_add_book(data, url, page)
+        state.mark(url)
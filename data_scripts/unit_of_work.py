@@ -0,0 +1,224 @@
+'''
+Unit of work that batches writes of data_scripts importers.
+
+Instead of saving objects right away, importers register them in the unit of
+work. New and changed objects and m2m assignments are collected during the
+sync run and written at the end with bulk operations in a single transaction.
+If the sync fails halfway nothing is written to the database. Image files
+saved to storage are not rolled back.
+
+Bulk operations skip save() and signals, so flush() does what they would do:
+fills derived fields (slug, renditions, rendered descriptions) with
+fill_derived_fields() and records outbox events.
+
+Lookups that importers do while objects are not written yet (link types by
+name, narrations of a book, narrators of a narration, link of a narration by
+type) are answered from the unit of work, which loads existing data with a
+few queries on first use.
+
+    with unit_of_work.join() as uow:
+        uow.save(person)
+        uow.set_m2m(book, 'authors', [person])
+
+join() reuses the unit of work of the enclosing join() if there is one, so
+helpers can be called both inside a sync run and on their own.
+
+Registrations of an item interrupted halfway can't be told apart from the
+rest, so sync.py lets Ctrl-C stop the run only between items, see
+checkpoints.interruptible().
+'''
+
+import contextlib
+import contextvars
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+from django.db import models as db_models, transaction
+
+from books import outbox
+from books.models import Book, Link, LinkType, Narration, OutboxAction, Person
+
+# Models in the order they are inserted, parents first.
+MODELS: List[Type[db_models.Model]] = [Person, Book, Narration, Link]
+
+BATCH_SIZE = 500
+
+
+def _fill_derived_fields(obj: db_models.Model) -> None:
+    # Narration and Link have no derived fields.
+    if hasattr(obj, 'fill_derived_fields'):
+        obj.fill_derived_fields()
+
+
+_current: contextvars.ContextVar[Optional['UnitOfWork']] = (
+    contextvars.ContextVar('data_scripts_unit_of_work', default=None))
+
+
+class UnitOfWork:
+    '''See module docs.'''
+
+    def __init__(self):
+        # Model -> pk -> object. Dicts keep order of registration.
+        self._new: Dict[Type[db_models.Model], Dict[Any, db_models.Model]] = {}
+        self._dirty: Dict[Type[db_models.Model], Dict[Any,
+                                                      db_models.Model]] = {}
+        # (model, m2m field name) -> object pk -> related objects.
+        self._m2m: Dict[Tuple[Type[db_models.Model], str],
+                        Dict[Any, List[db_models.Model]]] = {}
+        self._link_types: Optional[Dict[str, LinkType]] = None
+        # Book uuid -> narrations.
+        self._narrations: Optional[Dict[Any, List[Narration]]] = None
+        # Narration uuid -> uuids of narrators.
+        self._narrator_ids: Dict[Any, List[Any]] = {}
+        # (narration uuid, link type id) -> link.
+        self._links: Optional[Dict[Tuple[Any, Any], Link]] = None
+        # Number of save() and set_m2m() calls, tells whether an item is being
+        # written.
+        self.registrations = 0
+
+    def save(self, obj: db_models.Model) -> None:
+        '''
+        Registers object to be inserted or updated on flush, with all its
+        fields, like save() does.
+        '''
+        self.registrations += 1
+        model = type(obj)
+        if obj._state.adding:
+            if obj.pk not in self._new.setdefault(model, {}):
+                # Fields like slug of new objects may be used right away, e.g.
+                # in image names. Otherwise they are filled on flush.
+                _fill_derived_fields(obj)
+                self._new[model][obj.pk] = obj
+                self._index(obj)
+        else:
+            self._dirty.setdefault(model, {})[obj.pk] = obj
+
+    def set_m2m(self, obj: db_models.Model, field_name: str,
+                related: List[db_models.Model]) -> None:
+        '''Replaces related objects of m2m field on flush, like set() does.'''
+        self.registrations += 1
+        self._m2m.setdefault((type(obj), field_name),
+                             {})[obj.pk] = list(related)
+        if isinstance(obj, Narration) and field_name == 'narrators':
+            self._narrator_ids[obj.pk] = [person.pk for person in related]
+
+    def link_type(self, name: str) -> Optional[LinkType]:
+        if self._link_types is None:
+            self._link_types = {}
+            for link_type in LinkType.objects.order_by('id'):
+                self._link_types.setdefault(link_type.name, link_type)
+        return self._link_types.get(name)
+
+    def _load_narrations(self) -> Dict[Any, List[Narration]]:
+        if self._narrations is None:
+            self._narrations = {}
+            for narration in Narration.objects.all():
+                self._narrations.setdefault(narration.book_id,
+                                            []).append(narration)
+            narrators = Narration.narrators.through.objects.order_by(
+                'id').values_list('narration_id', 'person_id')
+            for narration_id, person_id in narrators:
+                self._narrator_ids.setdefault(narration_id,
+                                              []).append(person_id)
+        return self._narrations
+
+    def narrations(self, book: Book) -> List[Narration]:
+        '''Narrations of the book including not yet written ones.'''
+        return self._load_narrations().get(book.pk, [])
+
+    def narrator_ids(self, narration: Narration) -> List[Any]:
+        '''
+        Uuids of narrators of the narration including not yet written ones.
+        '''
+        self._load_narrations()
+        return self._narrator_ids.get(narration.pk, [])
+
+    def _load_links(self) -> Dict[Tuple[Any, Any], Link]:
+        if self._links is None:
+            self._links = {}
+            for link in Link.objects.all():
+                self._links.setdefault((link.narration_id, link.url_type_id),
+                                       link)
+        return self._links
+
+    def find_link(self, narration: Narration,
+                  link_type: Optional[LinkType]) -> Optional[Link]:
+        '''Link of the narration with given type including new ones.'''
+        return self._load_links().get(
+            (narration.pk, link_type.pk if link_type else None))
+
+    def _index(self, obj: db_models.Model) -> None:
+        '''Makes new object visible to lookups.'''
+        if isinstance(obj, Narration):
+            self._load_narrations().setdefault(obj.book_id, []).append(obj)
+        elif isinstance(obj, Link):
+            self._load_links().setdefault((obj.narration_id, obj.url_type_id),
+                                          obj)
+
+    def flush(self) -> None:
+        '''Writes all registered changes in a single transaction.'''
+        with transaction.atomic():
+            for model in MODELS:
+                new = list(self._new.get(model, {}).values())
+                dirty = [
+                    obj for pk, obj in self._dirty.get(model, {}).items()
+                    if pk not in self._new.get(model, {})
+                ]
+                for obj in new + dirty:
+                    _fill_derived_fields(obj)
+                model.objects.bulk_create(new, batch_size=BATCH_SIZE)
+                fields = [
+                    f.name for f in model._meta.concrete_fields
+                    if not f.primary_key
+                ]
+                model.objects.bulk_update(dirty, fields, batch_size=BATCH_SIZE)
+                outbox.record_bulk(model, [obj.pk for obj in new],
+                                   OutboxAction.CREATE)
+                outbox.record_bulk(model, [obj.pk for obj in dirty],
+                                   OutboxAction.UPDATE)
+
+            for (model, field_name), assignments in self._m2m.items():
+                field = model._meta.get_field(field_name)
+                through = field.remote_field.through
+                from_column = field.m2m_column_name()
+                to_column = field.m2m_reverse_name()
+                pks = list(assignments)
+                for i in range(0, len(pks), BATCH_SIZE):
+                    through.objects.filter(
+                        **{
+                            f'{from_column}__in': pks[i:i + BATCH_SIZE]
+                        }).delete()
+                through.objects.bulk_create([
+                    through(**{
+                        from_column: pk,
+                        to_column: related.pk
+                    }) for pk, related_objects in assignments.items()
+                    for related in related_objects
+                ],
+                                            batch_size=BATCH_SIZE)
+                outbox.record_bulk(model, pks, OutboxAction.UPDATE)
+        self._new = {}
+        self._dirty = {}
+        self._m2m = {}
+
+
+def current() -> Optional[UnitOfWork]:
+    '''Unit of work of the enclosing join() or None.'''
+    return _current.get()
+
+
+@contextlib.contextmanager
+def join() -> Iterator[UnitOfWork]:
+    '''
+    Returns current unit of work or starts a new one that is flushed when the
+    block exits without exception.
+    '''
+    current = _current.get()
+    if current is not None:
+        yield current
+        return
+    uow = UnitOfWork()
+    token = _current.set(uow)
+    try:
+        yield uow
+    finally:
+        _current.reset(token)
+    uow.flush()
@@ -1,13 +1,10 @@
 '''Shared utils used by data sync scripts.'''
 
 import bs4
-import requests
+
+from data_scripts import fetch
 
 
 def open_url(url: str) -> bs4.BeautifulSoup:
     '''Fetches and parses html page.'''
-    resp = requests.get(url)
-    resp.encoding = 'utf8'
-    if resp.status_code != 200:
-        raise ValueError(f'URL {url} returned {resp.status_code}')
-    return bs4.BeautifulSoup(resp.text, 'html.parser')
+    return fetch.get_html(url)
@@ -0,0 +1,101 @@
+'''
+Working database of sync commands in incremental mode.
+
+The database is kept between runs. State file next to it stores the key of
+data.json written by the last run together with migrations and Django
+version, the one fixture_loader.snapshot_path() uses. When the key is still
+the same (data.json wasn't changed by git pull or manual edits and models
+didn't change) the database is reused as is, otherwise it's created again
+with init_db_with_data.
+
+Rows changed by a sync command are taken from the outbox (see
+books/outbox.py) and only their entries are rewritten in data.json.
+'''
+
+import datetime
+import json
+import os
+from typing import Dict, List, Set, Type
+from django.apps import apps
+from django.conf import settings
+from django.core import management
+from django.db import models as db_models
+
+from books import data_dump, fixture_loader, outbox
+from books.models import OutboxEvent
+
+DATA_FILE = 'data/data.json'
+
+# Outbox consumer name.
+CONSUMER = 'data_json'
+
+
+def _state_file() -> str:
+    return f'{settings.DATABASES["default"]["NAME"]}.sync_state.json'
+
+
+def _data_key() -> str:
+    return fixture_loader.snapshot_path(DATA_FILE)
+
+
+def _read_state() -> Dict[str, str]:
+    if not os.path.exists(_state_file()):
+        return {}
+    with open(_state_file(), 'r', encoding='utf8') as f:
+        return json.load(f)
+
+
+def invalidate() -> None:
+    '''Makes the next run create the database again.'''
+    if os.path.exists(_state_file()):
+        os.remove(_state_file())
+
+
+def prepare() -> None:
+    '''
+    Reuses working database if it matches data.json and migrations or
+    creates it.
+    '''
+    db_path = settings.DATABASES['default']['NAME']
+    state = _read_state()
+    if os.path.exists(db_path) and state.get('data_key') == _data_key():
+        print(f'Reusing database {db_path}')
+        return
+    invalidate()
+    management.call_command('init_db_with_data')
+    # Only changes made after this point need to be written to data.json.
+    last_event = OutboxEvent.objects.order_by('-id').first()
+    outbox.acknowledge(CONSUMER, last_event.id if last_event else 0)
+    _write_state()
+
+
+def _write_state() -> None:
+    with open(_state_file(), 'w', encoding='utf8') as f:
+        json.dump({'data_key': _data_key()}, f)
+
+
+def save_changes() -> int:
+    '''
+    Writes rows changed since the last run to data.json. Returns number of
+    written rows.
+    '''
+    changed: Dict[Type[db_models.Model], Set[str]] = {}
+
+    def collect(events: List[OutboxEvent]) -> None:
+        for event in events:
+            model = apps.get_model('books', event.model)
+            changed.setdefault(model, set()).add(event.object_id)
+
+    # If writing fails, events are acknowledged but data.json isn't updated.
+    # Invalidate state so the next run starts from data.json again.
+    invalidate()
+    # Sync runs in a single process so there are no concurrent transactions.
+    outbox.process(CONSUMER, collect, min_age=datetime.timedelta(0))
+    tmp_file = f'{DATA_FILE}.tmp'
+    with open(DATA_FILE, 'r', encoding='utf8') as source:
+        with open(tmp_file, 'w', encoding='utf8') as stream:
+            written = data_dump.update('default', source, stream, changed)
+    os.replace(tmp_file, DATA_FILE)
+    _write_state()
+    outbox.delete_processed_events([CONSUMER])
+    return written
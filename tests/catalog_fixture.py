@@ -0,0 +1,70 @@
+import datetime
+from typing import List
+
+from books import models
+from books.views import TAGS_TO_SHOW_ON_MAIN_PAGE
+
+# Enough books for several catalog pages.
+BOOKS_COUNT = 40
+PEOPLE_COUNT = 12
+
+LINK_TYPES = ['knihi_com', 'kobo', 'youtube']
+
+
+def create_catalog_fixture() -> None:
+    '''
+    Creates small but representative catalog: books with several authors,
+    narrations in different languages, free and paid, with links of
+    different types. Data is deterministic so tests can rely on it.
+    '''
+    tags = [
+        models.Tag.objects.create(name=name, slug=f'tag-{i}')
+        for i, name in enumerate(TAGS_TO_SHOW_ON_MAIN_PAGE + ['Паэзія'])
+    ]
+    link_types = [
+        models.LinkType.objects.create(
+            name=name,
+            caption=name.capitalize(),
+            icon=f'icons/{name}.png',
+            availability=models.LinkAvailability.EVERYWHERE)
+        for name in LINK_TYPES
+    ]
+    people: List[models.Person] = []
+    for i in range(PEOPLE_COUNT):
+        people.append(
+            models.Person.objects.create(name=f'Асоба {i}',
+                                         slug=f'person-{i}',
+                                         date_of_birth=datetime.date(
+                                             1950 + i, i % 12 + 1, i + 1)))
+
+    for i in range(BOOKS_COUNT):
+        book = models.Book.objects.create(title=f'Кніга {i}',
+                                          slug=f'book-{i}',
+                                          date=datetime.date(2022, 1, 1) +
+                                          datetime.timedelta(days=i),
+                                          status=models.BookStatus.ACTIVE,
+                                          promoted=i % 10 == 0)
+        book.authors.set([people[i % PEOPLE_COUNT]])
+        if i % 3 == 0:
+            book.authors.add(people[(i + 1) % PEOPLE_COUNT])
+        if i % 5 == 0:
+            book.translators.set([people[(i + 2) % PEOPLE_COUNT]])
+        book.tag.set([tags[i % len(tags)]])
+        languages = [models.Language.BELARUSIAN]
+        if i % 4 == 0:
+            languages.append(models.Language.RUSSIAN)
+        for language in languages:
+            narration = models.Narration.objects.create(book=book,
+                                                        language=language,
+                                                        paid=i % 2 == 0)
+            narration.narrators.set([people[(i + 3) % PEOPLE_COUNT]])
+            for j, link_type in enumerate(link_types[:1 + i % 3]):
+                models.Link.objects.create(
+                    narration=narration,
+                    url_type=link_type,
+                    url=f'https://example.com/{link_type.name}/{i}/{j}')
+
+    models.Book.objects.create(title='Схаваная кніга',
+                               slug='hidden-book',
+                               date=datetime.date(2022, 1, 1),
+                               status=models.BookStatus.HIDDEN)
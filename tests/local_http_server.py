@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class StubResponse:
+    '''Response returned by LocalHttpServer for a given path.'''
+    status: int = 200
+    body: bytes = b''
+    headers: Dict[str, str] = field(default_factory=dict)
+    # If set, response is returned only for this method. Other methods get 405.
+    method: Optional[str] = None
+
+
+class LocalHttpServer:
+    '''
+    HTTP server running in background thread that stands in for external sites
+    in tests. Each path is mapped to a list of responses which are returned one
+    after another, the last response repeats. All requests are recorded.
+    '''
+
+    def __init__(self):
+        self.routes: Dict[str, List[StubResponse]] = {}
+        # List of (method, path, headers) of all received requests.
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                           self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    def start(self) -> 'LocalHttpServer':
+        '''Starts serving requests.'''
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        '''Stops server and waits for the thread to finish.'''
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def url(self, path: str) -> str:
+        '''Returns absolute url for the given path.'''
+        host, port = self._server.server_address
+        return f'http://{host}:{port}{path}'
+
+    def requests_to(self, path: str) -> List[str]:
+        '''Returns methods of all requests received for the path.'''
+        with self._lock:
+            return [method for method, p, _ in self.requests if p == path]
+
+    def _respond(self, method: str, path: str,
+                 headers: Dict[str, str]) -> StubResponse:
+        with self._lock:
+            self.requests.append((method, path, headers))
+            responses = self.routes.get(path)
+            if not responses:
+                return StubResponse(status=404)
+            response = responses[0]
+            if len(responses) > 1:
+                responses.pop(0)
+        if response.method is not None and response.method != method:
+            return StubResponse(status=405)
+        return response
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            '''Serves responses configured in LocalHttpServer.routes.'''
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self, method: str) -> None:
+                response = server._respond(method, self.path,
+                                           dict(self.headers.items()))
+                self.send_response(response.status)
+                for name, value in response.headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(response.body)))
+                self.end_headers()
+                if method != 'HEAD':
+                    self.wfile.write(response.body)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_HEAD(self):
+                self._handle('HEAD')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
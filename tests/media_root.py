@@ -0,0 +1,17 @@
+import shutil
+import tempfile
+from django.test import SimpleTestCase, override_settings
+
+
+def use_temp_media_root(test: SimpleTestCase) -> str:
+    '''
+    Points MEDIA_ROOT to a new temporary directory until the test ends, so
+    that images saved by the test don't end up in media/. Call from setUp.
+    Returns the directory.
+    '''
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    return media_root
@@ -0,0 +1,134 @@
+import datetime
+from typing import Any, Dict, List
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from books import models
+
+
+class FakeResponse:
+
+    def wait(self) -> 'FakeResponse':
+        return self
+
+
+class FakeIndex:
+    '''In-memory replacement of algolia SearchIndex.'''
+
+    def __init__(self):
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.calls: List[str] = []
+
+    def replace_all_objects(self, objects):
+        self.calls.append('replace_all_objects')
+        self.objects = {o['objectID']: dict(o) for o in objects}
+        return FakeResponse()
+
+    def partial_update_objects(self, objects, request_options):
+        self.calls.append('partial_update_objects')
+        assert request_options == {'createIfNotExists': True}
+        for o in objects:
+            self.objects.setdefault(o['objectID'], {}).update(o)
+        return FakeResponse()
+
+    def delete_objects(self, object_ids):
+        self.calls.append('delete_objects')
+        for object_id in object_ids:
+            del self.objects[object_id]
+        return FakeResponse()
+
+
+@override_settings(ALGOLIA_APPLICATION_ID='app',
+                   ALGOLIA_MODIFY_KEY='key',
+                   ALGOLIA_INDEX='books')
+class PushDataToAlgoliaTests(TestCase):
+    '''Tests for push_data_to_algolia command and books/algolia.py.'''
+
+    def setUp(self):
+        self.index = FakeIndex()
+        patcher = mock.patch(
+            'books.management.commands.push_data_to_algolia.SearchClient')
+        client = patcher.start()
+        self.addCleanup(patcher.stop)
+        client.create.return_value.init_index.return_value = self.index
+
+        self.author = models.Person.objects.create(name='Аўтар', slug='autar')
+        self.narrator = models.Person.objects.create(name='Чытальнік',
+                                                     slug='chytalnik')
+        # Has no active books so isn't searchable.
+        models.Person.objects.create(name='Нехта', slug='niehta')
+        self.book = models.Book.objects.create(title='Кніга',
+                                               slug='kniha',
+                                               date=datetime.date(2022, 1, 1),
+                                               status=models.BookStatus.ACTIVE)
+        self.book.authors.set([self.author])
+        narration = models.Narration.objects.create(
+            book=self.book, language=models.Language.BELARUSIAN)
+        narration.narrators.set([self.narrator])
+
+    def _push(self, *args: str) -> None:
+        self.index.calls.clear()
+        call_command('push_data_to_algolia', *args)
+
+    def _slugs(self) -> List[str]:
+        return sorted(o['slug'] for o in self.index.objects.values())
+
+    def test_first_push_adds_all_records(self):
+        self._push()
+
+        self.assertEqual(['autar', 'chytalnik', 'kniha'], self._slugs())
+        self.assertEqual(
+            {
+                'objectID': str(self.book.uuid),
+                'model': 'book',
+                'title': 'Кніга',
+                'title_ru': '',
+                'slug': 'kniha',
+                'authors': ['Аўтар'],
+                'authors_ru': [''],
+            }, self.index.objects[str(self.book.uuid)])
+
+    def test_push_without_changes_does_nothing(self):
+        self._push()
+
+        with self.assertNumQueries(4):
+            self._push()
+
+        self.assertEqual([], self.index.calls)
+
+    def test_pushes_only_changed_records(self):
+        self._push()
+        self.author.name = 'Новае імя'
+        self.author.save()
+
+        self._push()
+
+        self.assertEqual(['partial_update_objects'], self.index.calls)
+        self.assertEqual('Новае імя',
+                         self.index.objects[str(self.author.uuid)]['name'])
+        self.assertEqual(['Новае імя'],
+                         self.index.objects[str(self.book.uuid)]['authors'])
+        self.assertEqual(3, models.AlgoliaRecord.objects.count())
+
+    def test_deletes_removed_records(self):
+        self._push()
+        self.book.status = models.BookStatus.HIDDEN
+        self.book.save()
+
+        self._push()
+
+        self.assertEqual(['delete_objects'], self.index.calls)
+        self.assertEqual([], self._slugs())
+        self.assertEqual(0, models.AlgoliaRecord.objects.count())
+
+    def test_full_push_replaces_index(self):
+        self._push()
+        self.index.objects['stale'] = {'objectID': 'stale', 'slug': 'stale'}
+
+        self._push('--full')
+
+        self.assertEqual(['replace_all_objects'], self.index.calls)
+        self.assertEqual(['autar', 'chytalnik', 'kniha'], self._slugs())
+        self._push()
+        self.assertEqual([], self.index.calls)
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.test import LiveServerTestCase
+
+from books.management.commands.benchmark_site import percentile
+from tests.catalog_fixture import create_catalog_fixture
+
+
+class BenchmarkSiteTests(LiveServerTestCase):
+    '''Runs benchmark_site command against live test server.'''
+
+    def setUp(self):
+        create_catalog_fixture()
+        search_client = mock.MagicMock()
+        search_client.create().init_index().search.return_value = {'hits': []}
+        patcher = mock.patch('algoliasearch.search_client.SearchClient',
+                             search_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        self.output = os.path.join(output_dir.name, 'results.json')
+
+    def _benchmark(self, *args: str) -> dict:
+        call_command('benchmark_site', f'--base-url={self.live_server_url}',
+                     '--requests=60', '--concurrency=3', '--warmup-requests=0',
+                     f'--output={self.output}', *args)
+        with open(self.output, 'r') as f:
+            return json.load(f)
+
+    def test_stores_results_per_route(self):
+        results = self._benchmark()
+
+        self.assertEqual(60, results['total']['requests'])
+        self.assertEqual(0, results['total']['errors'])
+        self.assertGreater(results['total']['rps'], 0)
+        self.assertEqual(
+            60, sum(r['requests'] for r in results['routes'].values()))
+        for name in ['index', 'catalog', 'book', 'person']:
+            summary = results['routes'][name]
+            self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+            self.assertLessEqual(summary['p95_ms'], summary['p99_ms'])
+
+    def test_compares_with_previous_run(self):
+        previous = os.path.join(os.path.dirname(self.output), 'previous.json')
+        with open(previous, 'w') as f:
+            json.dump(self._benchmark(), f)
+
+        with mock.patch('builtins.print') as mock_print:
+            self._benchmark(f'--compare={previous}')
+
+        printed = '\n'.join(
+            str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertIn('Change compared to previous run:', printed)
+        self.assertRegex(printed, r'total +rps [+-]\d')
+
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(50, percentile(values, 0.5))
+        self.assertEqual(95, percentile(values, 0.95))
+        self.assertEqual(100, percentile(values, 1))
+        self.assertEqual(0, percentile([], 0.5))
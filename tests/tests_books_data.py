@@ -0,0 +1,56 @@
+import datetime
+from django.test import TestCase
+
+from books import models
+from data_scripts.books import BooksData, add_or_update_book
+
+
+class BooksDataTests(TestCase):
+    '''Tests for indexed BooksData used by data_scripts importers.'''
+
+    def setUp(self):
+        self.author = models.Person.objects.create(name='Аўтар', slug='autar')
+        self.book = models.Book.objects.create(title='Кніга',
+                                               slug='kniga',
+                                               date=datetime.date(2022, 1, 1),
+                                               status=models.BookStatus.ACTIVE)
+        self.book.authors.add(self.author)
+        self.data = BooksData(people=list(models.Person.objects.all()),
+                              books=list(models.Book.objects.all()))
+
+    def _import(self, title: str, author: str) -> models.Narration:
+        return add_or_update_book(self.data,
+                                  title=title,
+                                  description='',
+                                  authors=[author],
+                                  narrators=[],
+                                  translators=[],
+                                  cover_url='',
+                                  duration_sec=0)
+
+    def test_finds_people_and_books_ignoring_case(self):
+        self.assertEqual(self.author, self.data.find_person('аўтар'))
+        self.assertEqual([self.book], self.data.find_books_by_title('КНІГА'))
+        self.assertEqual(self.author, self.data.first_author(self.book))
+        self.assertTrue(self.data.has_slug('kniga'))
+
+    def test_updates_existing_book_without_duplicates(self):
+        narration = self._import('кніга', 'АЎТАР')
+        self._import('Кніга', 'Аўтар')
+
+        self.assertEqual(self.book, narration.book)
+        self.assertEqual([self.book], self.data.books)
+        self.assertEqual(1, models.Book.objects.count())
+        self.assertEqual(1, models.Person.objects.count())
+
+    def test_same_title_different_author_creates_book(self):
+        narration = self._import('Кніга', 'Іншы аўтар')
+
+        book = narration.book
+        self.assertNotEqual(self.book, book)
+        self.assertEqual('kniga-inshy-autar', book.slug)
+        self.assertEqual([self.book, book],
+                         self.data.find_books_by_title('Кніга'))
+        self.assertEqual('Іншы аўтар', self.data.first_author(book).name)
+        # Next import of the same book finds it by the new author.
+        self.assertEqual(book, self._import('Кніга', 'Іншы аўтар').book)
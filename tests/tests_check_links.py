@@ -0,0 +1,119 @@
+import datetime
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from books import models
+from books.link_checker import LinkChecker
+from tests.local_http_server import LocalHttpServer, StubResponse
+
+
+class CheckLinksTests(TestCase):
+    '''Tests for check_links command that run against local HTTP server.'''
+
+    def setUp(self):
+        self.server = LocalHttpServer().start()
+        self.addCleanup(self.server.stop)
+        book = models.Book.objects.create(title='Кніга',
+                                          date=datetime.date(2022, 1, 1),
+                                          status=models.BookStatus.ACTIVE)
+        self.narration = models.Narration.objects.create(
+            book=book, language=models.Language.BELARUSIAN)
+        self.link_type = models.LinkType.objects.create(
+            name='test', availability=models.LinkAvailability.EVERYWHERE)
+
+    def _add_link(self, path: str, *responses: StubResponse) -> models.Link:
+        self.server.routes[path] = list(responses)
+        return models.Link.objects.create(url=self.server.url(path),
+                                          url_type=self.link_type,
+                                          narration=self.narration)
+
+    def _check_links(self, *args) -> None:
+        call_command('check_links', '--backoff-sec=0', *args)
+
+    def test_stores_status_of_each_link(self):
+        ok = self._add_link('/ok', StubResponse(200))
+        redirect = self._add_link('/redirect', StubResponse(302))
+        missing = self._add_link('/missing', StubResponse(404))
+
+        self._check_links()
+
+        self.assertEqual(200,
+                         models.LinkHealth.objects.get(link=ok).status_code)
+        self.assertTrue(models.LinkHealth.objects.get(link=redirect).is_ok())
+        health = models.LinkHealth.objects.get(link=missing)
+        self.assertEqual(404, health.status_code)
+        self.assertFalse(health.is_ok())
+        self.assertIsNotNone(health.latency_ms)
+        self.assertEqual(['HEAD'], self.server.requests_to('/ok'))
+
+    def test_retries_temporary_errors(self):
+        link = self._add_link('/flaky', StubResponse(503), StubResponse(429),
+                              StubResponse(200))
+
+        self._check_links('--retries=2')
+
+        self.assertEqual(200,
+                         models.LinkHealth.objects.get(link=link).status_code)
+        self.assertEqual(3, len(self.server.requests_to('/flaky')))
+
+    def test_gives_up_after_retries(self):
+        link = self._add_link('/down', StubResponse(503))
+
+        self._check_links('--retries=1')
+
+        self.assertEqual(503,
+                         models.LinkHealth.objects.get(link=link).status_code)
+        self.assertEqual(2, len(self.server.requests_to('/down')))
+
+    def test_falls_back_to_get_when_head_not_supported(self):
+        link = self._add_link('/get-only', StubResponse(200, method='GET'))
+
+        self._check_links()
+
+        self.assertEqual(200,
+                         models.LinkHealth.objects.get(link=link).status_code)
+        self.assertEqual(['HEAD', 'GET'], self.server.requests_to('/get-only'))
+
+    def test_records_network_errors(self):
+        link = models.Link.objects.create(url='http://127.0.0.1:1/closed',
+                                          url_type=self.link_type,
+                                          narration=self.narration)
+
+        self._check_links('--retries=0')
+
+        health = models.LinkHealth.objects.get(link=link)
+        self.assertIsNone(health.status_code)
+        self.assertIn('ConnectionError', health.error)
+
+    def test_rechecks_only_stale_links(self):
+        fresh = self._add_link('/fresh', StubResponse(200))
+        stale = self._add_link('/stale', StubResponse(200))
+        models.LinkHealth.objects.create(link=fresh,
+                                         status_code=200,
+                                         last_checked=timezone.now())
+        models.LinkHealth.objects.create(link=stale,
+                                         status_code=404,
+                                         last_checked=timezone.now() -
+                                         datetime.timedelta(days=2))
+
+        self._check_links('--max-age-hours=24')
+
+        self.assertEqual([], self.server.requests_to('/fresh'))
+        self.assertEqual(['HEAD'], self.server.requests_to('/stale'))
+        self.assertEqual(200,
+                         models.LinkHealth.objects.get(link=stale).status_code)
+
+    def test_stops_checking_when_caller_stops(self):
+        for i in range(20):
+            self.server.routes[f'/link/{i}'] = [StubResponse(200)]
+        checker = LinkChecker(concurrency=1, per_host_rate=0)
+        self.addCleanup(checker.close)
+        results = checker.check_all(
+            self.server.url(f'/link/{i}') for i in range(20))
+
+        next(results)
+        results.close()
+
+        # Url that was being checked when caller stopped may complete.
+        self.assertLessEqual(len(self.server.requests), 3)
@@ -0,0 +1,206 @@
+import json
+import os
+import signal
+import tempfile
+from typing import Any, Dict, List
+from unittest import mock
+from PIL import Image
+from django.test import SimpleTestCase, TestCase
+
+from books import models
+from data_scripts import (books, checkpoints, fetch, sync, sync_knizhny_voz,
+                          unit_of_work)
+from data_scripts.books import BooksData
+from data_scripts.http_cache import CachedResponse, HttpCache, request_key
+from tests.media_root import use_temp_media_root
+
+
+class SourceStateTests(SimpleTestCase):
+    '''Tests for state of sync sources.'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_saves_and_loads_state(self):
+        state = checkpoints.load('kamunikat', self.directory)
+        self.assertFalse(state.is_unchanged('/book', 'a'))
+        state.mark('/book', 'a')
+        state.cursor = 20
+        state.save()
+
+        loaded = checkpoints.load('kamunikat', self.directory)
+        self.assertEqual(20, loaded.cursor)
+        self.assertTrue(loaded.is_unchanged('/book', 'a'))
+        self.assertFalse(loaded.is_unchanged('/book', 'b'))
+        self.assertEqual('kamunikat: 0 items processed, 1 unchanged skipped',
+                         loaded.report())
+
+    def test_current_outside_of_sync_is_not_saved(self):
+        state = checkpoints.current()
+        state.mark('/book')
+        state.save()
+        self.assertIsNone(state.path)
+
+
+class InterruptTests(TestCase):
+    '''Tests for stopping sync with Ctrl-C between items.'''
+
+    def setUp(self):
+        self.state = checkpoints.SourceState('test')
+
+    def _press_ctrl_c(self) -> None:
+        signal.getsignal(signal.SIGINT)(signal.SIGINT, None)
+
+    def _add_person(self, uow: unit_of_work.UnitOfWork, name: str) -> None:
+        uow.save(models.Person(name=name))
+
+    def test_stops_right_away_between_items(self):
+        with unit_of_work.join() as uow, checkpoints.interruptible(self.state):
+            self._add_person(uow, 'Першы')
+            self.state.mark('1')
+            with self.assertRaises(checkpoints.Interrupted):
+                self._press_ctrl_c()
+        self.assertEqual(1, models.Person.objects.count())
+
+    def test_finishes_item_that_is_being_written(self):
+        with unit_of_work.join() as uow, checkpoints.interruptible(self.state):
+            self._add_person(uow, 'Першы')
+            self.state.mark('1')
+            self._add_person(uow, 'Другі')
+            self._press_ctrl_c()
+            self._add_person(uow, 'Трэці')
+            with self.assertRaises(checkpoints.Interrupted):
+                self.state.mark('2')
+        self.assertEqual({'1': '', '2': ''}, self.state.items)
+        self.assertEqual(3, models.Person.objects.count())
+
+    def test_second_ctrl_c_stops_without_saving(self):
+        with self.assertRaises(KeyboardInterrupt) as raised:
+            with unit_of_work.join() as uow, checkpoints.interruptible(
+                    self.state):
+                self._add_person(uow, 'Першы')
+                self._press_ctrl_c()
+                self._press_ctrl_c()
+        self.assertNotIsInstance(raised.exception, checkpoints.Interrupted)
+        self.assertFalse(models.Person.objects.exists())
+
+    def test_restores_signal_handler(self):
+        handler = signal.getsignal(signal.SIGINT)
+        with checkpoints.interruptible(self.state):
+            self.assertNotEqual(handler, signal.getsignal(signal.SIGINT))
+        self.assertEqual(handler, signal.getsignal(signal.SIGINT))
+
+
+class SyncInterruptTests(TestCase):
+    '''Interrupts sync.py while a book is being added.'''
+
+    def setUp(self):
+        self.cover_path = os.path.join(use_temp_media_root(self), 'cover.jpg')
+        Image.new('RGB', (10, 10)).save(self.cover_path, 'JPEG')
+        self.state = checkpoints.SourceState('test')
+        # Times Ctrl-C is pressed while cover of the second book downloads.
+        self.ctrl_c_count = 0
+
+    def _download_cover(self, url: str, slug: str) -> str:
+        if url == 'https://example.com/2.jpg':
+            for _ in range(self.ctrl_c_count):
+                signal.getsignal(signal.SIGINT)(signal.SIGINT, None)
+        return self.cover_path
+
+    def _run_command(self, data: books.BooksData) -> None:
+        state = checkpoints.current()
+        for index in range(1, 4):
+            books.add_or_update_book(
+                data,
+                title=f'Кніга {index}',
+                description='',
+                authors=[f'Аўтар {index}'],
+                narrators=[],
+                translators=[],
+                cover_url=f'https://example.com/{index}.jpg',
+                duration_sec=60)
+            state.mark(str(index))
+
+    def _sync(self) -> None:
+        with mock.patch.dict(sync.SYNC_COMMANDS, {'test': self._run_command}), \
+                mock.patch.object(books.image, 'download_and_resize_image',
+                                  self._download_cover):
+            sync._run('test', books.BooksData(people=[], books=[]), self.state)
+
+    def _titles_and_authors(self) -> List[Any]:
+        return [(book.title, [author.name for author in book.authors.all()])
+                for book in models.Book.objects.order_by('title')]
+
+    def test_writes_book_interrupted_halfway_completely(self):
+        self.ctrl_c_count = 1
+        self._sync()
+        self.assertEqual([('Кніга 1', ['Аўтар 1']), ('Кніга 2', ['Аўтар 2'])],
+                         self._titles_and_authors())
+        self.assertEqual({'1': '', '2': ''}, self.state.items)
+
+    def test_second_ctrl_c_writes_nothing(self):
+        self.ctrl_c_count = 2
+        with self.assertRaises(KeyboardInterrupt):
+            self._sync()
+        self.assertEqual([], self._titles_and_authors())
+        self.assertFalse(models.Person.objects.exists())
+
+
+class KnizhnyVozCheckpointTests(TestCase):
+    '''Runs knizhny_voz scraper twice against recorded responses.'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = HttpCache(directory.name, offline=True)
+        fetch.configure(cache=self.cache)
+        self.addCleanup(fetch.configure)
+        models.LinkType.objects.create(
+            name='knizhny_voz',
+            availability=models.LinkAvailability.EVERYWHERE)
+        self.state = checkpoints.SourceState('knizhny_voz')
+
+    def _record(self, url: str, content: Any) -> None:
+        response = CachedResponse(url=url,
+                                  headers={},
+                                  body=json.dumps(content).encode())
+        self.cache.put(request_key('GET', url), response.to_response())
+
+    def _book(self, id: str, title: str) -> Dict[str, Any]:
+        self._record(f'https://knizhnyvoz.herokuapp.com/books/{id}',
+                     [{
+                         'duration': 60000
+                     }])
+        return {
+            'id': id,
+            'name': title,
+            'author': 'Аўтар',
+            'roles': [],
+            'description': '',
+            'imageUri': '',
+        }
+
+    def _sync(self, *catalog: Dict[str, Any]) -> None:
+        self._record(sync_knizhny_voz.DATA_URL, list(catalog))
+        with checkpoints.use(self.state):
+            sync_knizhny_voz.run(
+                BooksData(people=list(models.Person.objects.all()),
+                          books=list(models.Book.objects.all())))
+
+    def test_skips_unchanged_books(self):
+        first = self._book('1', 'Першая')
+        self._sync(first)
+        self.assertEqual(1, self.state.processed)
+
+        second = self._book('2', 'Другая')
+        self._sync(first, second)
+        self.assertEqual(1, self.state.skipped)
+        self.assertEqual(2, self.state.processed)
+
+        self._sync(dict(first, description='Апісанне'), second)
+        self.assertEqual(2, self.state.skipped)
+        self.assertEqual(3, self.state.processed)
+        self.assertEqual('Апісанне',
+                         models.Book.objects.get(title='Першая').description)
@@ -0,0 +1,116 @@
+import datetime
+import io
+from itertools import chain
+from django.core import serializers
+from django.test import TestCase, TransactionTestCase
+
+from books import data_dump, models
+
+
+def _create_data() -> None:
+    link_type = models.LinkType.objects.create(
+        name='podcast', availability=models.LinkAvailability.EVERYWHERE)
+    tag = models.Tag.objects.create(name='Казкі', slug='kazki')
+    people = [
+        models.Person.objects.create(name=f'Асоба {i}', slug=f'asoba-{i}')
+        for i in range(5)
+    ]
+    for i in range(5):
+        book = models.Book.objects.create(title=f'Кніга {i}',
+                                          slug=f'kniha-{i}',
+                                          date=datetime.date(2022, 1, 1),
+                                          status=models.BookStatus.ACTIVE)
+        book.authors.add(people[i], people[(i + 1) % 5])
+        book.tag.add(tag)
+        narration = models.Narration.objects.create(
+            book=book, language=models.Language.BELARUSIAN)
+        narration.narrators.add(people[(i + 2) % 5])
+        models.Link.objects.create(narration=narration,
+                                   url_type=link_type,
+                                   url=f'https://example.com/{i}')
+
+
+def _serialize_all() -> str:
+    '''Dump done the old way, loading all objects at once.'''
+    objects = list(
+        chain.from_iterable(
+            model.objects.order_by('pk') for model in data_dump.MODELS))
+    return serializers.serialize('json', objects, indent=2)
+
+
+class DataDumpTests(TestCase):
+    '''Tests for books/data_dump.py used by pull_data_from_prod.'''
+
+    def test_output_matches_serializer(self):
+        _create_data()
+        stream = io.StringIO()
+
+        stats = data_dump.dump('default', stream, chunk_size=2)
+
+        self.assertEqual(_serialize_all(), stream.getvalue())
+        self.assertEqual([5, 1, 5, 5, 1, 5], [s.rows for s in stats])
+
+    def test_empty_tables(self):
+        models.Tag.objects.create(name='Казкі', slug='kazki')
+        stream = io.StringIO()
+
+        data_dump.dump('default', stream)
+
+        self.assertEqual(_serialize_all(), stream.getvalue())
+        self.assertEqual(
+            1, len(list(serializers.deserialize('json', stream.getvalue()))))
+
+
+class ParallelDataDumpTests(TransactionTestCase):
+    '''Parallel dump needs committed data visible to other connections.'''
+
+    def test_parallel_output_matches_serializer(self):
+        _create_data()
+        stream = io.StringIO()
+
+        data_dump.dump('default', stream, chunk_size=2, workers=3)
+
+        self.assertEqual(_serialize_all(), stream.getvalue())
+
+
+class UpdateDumpTests(TestCase):
+    '''Tests for data_dump.update() used by incremental data_scripts.sync.'''
+
+    def setUp(self):
+        _create_data()
+        self.dumped = io.StringIO()
+        data_dump.dump('default', self.dumped)
+
+    def _update(self, changed) -> str:
+        stream = io.StringIO()
+        data_dump.update('default', io.StringIO(self.dumped.getvalue()),
+                         stream, changed)
+        return stream.getvalue()
+
+    def test_no_changes_keeps_dump(self):
+        self.assertEqual(self.dumped.getvalue(), self._update({}))
+
+    def test_update_matches_full_dump(self):
+        book = models.Book.objects.order_by('pk')[2]
+        book.title = 'Новая назва'
+        book.save()
+        book.authors.clear()
+        new_person = models.Person.objects.create(name='Новая асоба',
+                                                  slug='novaja-asoba')
+        new_tag = models.Tag.objects.create(name='Новы тэг', slug='novy')
+        link_uuids = [
+            str(uuid) for uuid in models.Link.objects.order_by(
+                'pk').values_list('uuid', flat=True)
+        ]
+        models.Link.objects.filter(uuid=link_uuids[0]).delete()
+
+        updated = self._update({
+            models.Book: [str(book.pk)],
+            models.Person: [str(new_person.pk)],
+            models.Tag: [str(new_tag.pk)],
+            # Deleted and unchanged links.
+            models.Link:
+            link_uuids[:2],
+        })
+
+        self.assertEqual(_serialize_all(), updated)
@@ -0,0 +1,181 @@
+import datetime
+from django.db import connections
+from django.test import TestCase
+
+from books import data_sync, models
+from books.models import OutboxAction
+
+SOURCE = 'default'
+TARGET = 'replica'
+
+
+class DataSyncTests(TestCase):
+    '''Tests for books/data_sync.py used by push_data_to_prod.'''
+    databases = {SOURCE, TARGET}
+
+    def setUp(self):
+        self.author = models.Person.objects.create(name='Аўтар', slug='autar')
+        self.narrator = models.Person.objects.create(name='Чытальнік',
+                                                     slug='chytalnik')
+        self.tag = models.Tag.objects.create(name='Казкі', slug='kazki')
+        self.link_type = models.LinkType.objects.create(
+            name='podcast', availability=models.LinkAvailability.EVERYWHERE)
+        self.book = models.Book.objects.create(title='Кніга',
+                                               slug='kniha',
+                                               date=datetime.date(2022, 1, 1),
+                                               status=models.BookStatus.ACTIVE)
+        self.book.authors.add(self.author)
+        self.book.tag.add(self.tag)
+        self.narration = models.Narration.objects.create(
+            book=self.book, language=models.Language.BELARUSIAN)
+        self.narration.narrators.add(self.narrator)
+        self.link = models.Link.objects.create(narration=self.narration,
+                                               url_type=self.link_type,
+                                               url='https://example.com/1')
+
+    def _sync(self) -> data_sync.SyncPlan:
+        plan = data_sync.diff(data_sync.read_snapshot(SOURCE),
+                              data_sync.read_snapshot(TARGET))
+        data_sync.apply(plan, TARGET)
+        return plan
+
+    def _assert_target_matches_source(self) -> None:
+        self.assertTrue(
+            data_sync.diff(data_sync.read_snapshot(SOURCE),
+                           data_sync.read_snapshot(TARGET)).is_empty())
+
+    def _target_events(self):
+        return set(
+            models.OutboxEvent.objects.using(TARGET).values_list(
+                'action', 'model', 'object_id'))
+
+    def test_initial_sync_copies_everything(self):
+        plan = self._sync()
+
+        self.assertEqual(['persons: 2 created, 0 updated, 0 deleted'],
+                         plan.report()[:1])
+        self._assert_target_matches_source()
+        book = models.Book.objects.using(TARGET).get(uuid=self.book.uuid)
+        self.assertEqual([self.author.uuid],
+                         [p.uuid for p in book.authors.all()])
+        self.assertIn((OutboxAction.CREATE, 'book', str(self.book.uuid)),
+                      self._target_events())
+        # Sequence of tag ids was reset after inserting explicit ids.
+        new_tag = models.Tag.objects.using(TARGET).create(name='Новы')
+        self.assertGreater(new_tag.id, self.tag.id)
+
+    def test_second_sync_writes_only_changes(self):
+        self._sync()
+        models.OutboxEvent.objects.using(TARGET).all().delete()
+        self.book.title = 'Новая назва'
+        self.book.save()
+        self.book.authors.add(self.narrator)
+        self.narration.narrators.remove(self.narrator)
+
+        plan = self._sync()
+
+        self.assertEqual(1, len(plan.models[3].updated))
+        self.assertEqual([], plan.models[0].updated)
+        self.assertEqual([], plan.models[4].updated)
+        self._assert_target_matches_source()
+        self.assertEqual(
+            'Новая назва',
+            models.Book.objects.using(TARGET).get(uuid=self.book.uuid).title)
+        self.assertEqual(
+            {
+                (OutboxAction.UPDATE, 'book', str(self.book.uuid)),
+                (OutboxAction.UPDATE, 'narration', str(self.narration.uuid)),
+            }, self._target_events())
+
+    def test_deletes_removed_rows(self):
+        self._sync()
+        link_uuid = self.link.uuid
+        self.link.delete()
+        self.book.tag.clear()
+        self.tag.delete()
+
+        self._sync()
+
+        self._assert_target_matches_source()
+        self.assertFalse(
+            models.Link.objects.using(TARGET).filter(uuid=link_uuid).exists())
+        self.assertFalse(models.Tag.objects.using(TARGET).exists())
+        self.assertIn((OutboxAction.DELETE, 'link', str(link_uuid)),
+                      self._target_events())
+
+    def test_new_book_can_reuse_slug_of_deleted_one(self):
+        self._sync()
+        self.book.delete()
+        new_book = models.Book.objects.create(title='Кніга',
+                                              slug='kniha',
+                                              date=datetime.date(2023, 1, 1),
+                                              status=models.BookStatus.ACTIVE)
+        new_book.authors.add(self.author)
+
+        self._sync()
+
+        self._assert_target_matches_source()
+        self.assertEqual(
+            new_book.uuid,
+            models.Book.objects.using(TARGET).get(slug='kniha').uuid)
+
+    def test_new_book_can_take_slug_of_renamed_one(self):
+        self._sync()
+        self.book.slug = 'kniha-2'
+        self.book.save()
+        new_book = models.Book.objects.create(title='Кніга',
+                                              slug='kniha',
+                                              date=datetime.date(2023, 1, 1),
+                                              status=models.BookStatus.ACTIVE)
+
+        self._sync()
+
+        self._assert_target_matches_source()
+        self.assertEqual(
+            new_book.uuid,
+            models.Book.objects.using(TARGET).get(slug='kniha').uuid)
+
+    def test_books_can_swap_slugs(self):
+        other_book = models.Book.objects.create(
+            title='Другая',
+            slug='druhaja',
+            date=datetime.date(2023, 1, 1),
+            status=models.BookStatus.ACTIVE)
+        self._sync()
+        models.Book.objects.filter(uuid=self.book.uuid).update(slug='tmp')
+        models.Book.objects.filter(uuid=other_book.uuid).update(slug='kniha')
+        models.Book.objects.filter(uuid=self.book.uuid).update(slug='druhaja')
+
+        plan = self._sync()
+
+        self.assertEqual(2, len(plan.models[3].renamed))
+        self._assert_target_matches_source()
+
+    def test_failed_sync_changes_nothing(self):
+        self._sync()
+        self.book.title = 'Новая назва'
+        self.book.save()
+        plan = data_sync.diff(data_sync.read_snapshot(SOURCE),
+                              data_sync.read_snapshot(TARGET))
+        # Link pointing to a narration that doesn't exist in target.
+        plan.models[5].created.append('missing')
+
+        with self.assertRaises(Exception):
+            data_sync.apply(plan, TARGET)
+
+        self.assertEqual(
+            'Кніга',
+            models.Book.objects.using(TARGET).get(uuid=self.book.uuid).title)
+
+    def test_detects_schema_drift(self):
+        self.assertEqual([], data_sync.schema_drift(SOURCE, TARGET))
+
+        with connections[TARGET].cursor() as cursor:
+            cursor.execute(
+                'ALTER TABLE books_book DROP COLUMN description_html')
+            cursor.execute('DROP TABLE books_outboxevent')
+
+        self.assertEqual([
+            'books_book: missing columns description_html',
+            'books_outboxevent: table is missing',
+        ], data_sync.schema_drift(SOURCE, TARGET))
@@ -2,7 +2,7 @@ from os import path
 from django.test import TransactionTestCase
 
 from books import models
-from tests.worker import fetch_head_urls
+from books.link_checker import check_urls
 
 
 class DataValidationTests(TransactionTestCase):
@@ -95,11 +95,11 @@ class DataValidationTests(TransactionTestCase):
                 continue
             urls.append(link.url)
         errors = [
-            [status.url, status.response.status_code]
-            for status in fetch_head_urls(urls)
+            [status.url, status.status_code or status.error]
+            for status in check_urls(urls)
             # castbox returns 302.
             # all other should return 200.
-            if status.response.status_code != 200 and status.response.
-            status_code != 302 and status.response.status_code != 303
+            if status.status_code != 200 and status.status_code != 302
+            and status.status_code != 303
         ]
         self.assertListEqual(errors, [])
\ No newline at end of file
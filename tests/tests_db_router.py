@@ -0,0 +1,95 @@
+import datetime
+from django.http import HttpRequest, JsonResponse
+from django.test import TestCase, override_settings
+from django.urls import include, path
+
+from books import models
+from booksby import db_router
+
+
+@db_router.replica_reads
+def _write_then_read_view(request: HttpRequest) -> JsonResponse:
+    before = models.Tag.objects.count()
+    models.Tag.objects.create(name='Новы', slug='novy')
+    after = models.Tag.objects.count()
+    return JsonResponse({'before': before, 'after': after})
+
+
+urlpatterns = [
+    path('write', _write_then_read_view),
+    path('', include('booksby.urls')),
+]
+
+
+def _create_book(slug: str, using: str) -> None:
+    models.Book(title=slug,
+                slug=slug,
+                date=datetime.date(2022, 1, 1),
+                status=models.BookStatus.ACTIVE).save(using=using)
+
+
+@override_settings(ROOT_URLCONF='tests.tests_db_router',
+                   REPLICA_DATABASE='replica')
+class ReplicaRoutingTests(TestCase):
+    '''
+    Tests for booksby/db_router.py. Primary and replica are separate
+    databases here, each has data the other doesn't, so it's visible which
+    one is used.
+    '''
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        _create_book('primary-book', 'default')
+        _create_book('replica-book', 'replica')
+        models.Tag(name='Першы', slug='pershy').save(using='replica')
+
+    def test_public_pages_read_from_replica(self):
+        self.assertEqual(200,
+                         self.client.get('/books/replica-book').status_code)
+        self.assertEqual(404,
+                         self.client.get('/books/primary-book').status_code)
+        sitemap = self.client.get('/sitemap.txt').content.decode()
+        self.assertIn('/books/replica-book', sitemap)
+        self.assertNotIn('/books/primary-book', sitemap)
+
+    def test_hooks_read_from_primary(self):
+        models.Tag.objects.create(name='Чытае аўтар', slug='cytaje-autar')
+
+        response = self.client.get('/update_read_by_author_tag')
+
+        self.assertEqual(204, response.status_code)
+
+    def test_reads_go_to_primary_after_write(self):
+        response = self.client.get('/write')
+
+        self.assertEqual({'before': 1, 'after': 1}, response.json())
+        self.assertEqual(
+            0,
+            models.Tag.objects.using('replica').filter(slug='novy').count())
+        self.assertIn(db_router.STICKY_COOKIE, response.cookies)
+
+    def test_sticky_cookie_keeps_reads_on_primary(self):
+        self.client.cookies[db_router.STICKY_COOKIE] = '1'
+
+        self.assertEqual(404,
+                         self.client.get('/books/replica-book').status_code)
+        self.assertEqual(200,
+                         self.client.get('/books/primary-book').status_code)
+
+    def test_no_cookie_without_writes(self):
+        response = self.client.get('/books/replica-book')
+
+        self.assertNotIn(db_router.STICKY_COOKIE, response.cookies)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(['primary-book'],
+                         list(
+                             models.Book.objects.values_list('slug',
+                                                             flat=True)))
+
+    @override_settings(REPLICA_DATABASE='')
+    def test_everything_uses_primary_without_replica(self):
+        self.assertEqual(200,
+                         self.client.get('/books/primary-book').status_code)
+        self.assertEqual(404,
+                         self.client.get('/books/replica-book').status_code)
@@ -0,0 +1,94 @@
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase
+
+from books import descriptions, models
+
+DESCRIPTIONS = [
+    '',
+    'Простае апісанне.',
+    'Першы абзац.\n\nДругі абзац\nз пераносам радка.',
+    'Кніга [на knihi.com](https://knihi.com/book) і https://example.com/',
+    '**Тоўсты** і _курсіў_, # загаловак\n\n* спіс\n* яшчэ',
+    '<script>alert("x")</script><b>html</b> & "двукоссе" <',
+    '<a href="javascript:alert(1)">link</a> <a href="https://a.by" '
+    'onclick="x()">a.by</a>',
+    '    код\n\n> цытата',
+]
+
+# Templates used to render descriptions before they were pre-rendered.
+BOOK_TEMPLATE = Template('{% load markdownify %}'
+                         '{{ description | markdownify:"book_description" '
+                         '| linebreaks }}')
+PERSON_TEMPLATE = Template('{{ description|linebreaks }}')
+TAG_TEMPLATE = Template('{{ description }}')
+
+
+class DescriptionsTests(TestCase):
+    '''Tests for pre-rendered descriptions.'''
+
+    def test_rendering_matches_templates(self):
+        for description in DESCRIPTIONS:
+            context = Context({'description': description})
+            with self.subTest(description=description):
+                self.assertEqual(
+                    BOOK_TEMPLATE.render(context),
+                    descriptions.render_book_description(description))
+                self.assertEqual(
+                    PERSON_TEMPLATE.render(context),
+                    descriptions.render_person_description(description))
+                self.assertEqual(
+                    TAG_TEMPLATE.render(context),
+                    descriptions.render_tag_description(description))
+
+    def test_rendered_on_save(self):
+        person = models.Person.objects.create(name='Асоба',
+                                              description='Радок\nі <b>')
+        self.assertEqual('<p>Радок<br>і &lt;b&gt;</p>',
+                         person.description_html)
+
+        person.description = 'Новае'
+        person.save()
+        person.refresh_from_db()
+        self.assertEqual('<p>Новае</p>', person.description_html)
+
+    def test_render_descriptions_command(self):
+        book = models.Book.objects.create(title='Кніга',
+                                          description='[a](https://a.by)',
+                                          date='2022-01-01',
+                                          status=models.BookStatus.ACTIVE)
+        tag = models.Tag.objects.create(name='Тэг', description='a & b')
+        # Simulate rows loaded without save(), e.g. by loaddata.
+        models.Book.objects.update(description_html='')
+        models.Tag.objects.update(description_html='')
+
+        call_command('render_descriptions')
+
+        book.refresh_from_db()
+        tag.refresh_from_db()
+        self.assertEqual('<p><a href="https://a.by">a</a></p>',
+                         book.description_html)
+        self.assertEqual('a &amp; b', tag.description_html)
+
+    def test_pages_show_rendered_descriptions(self):
+        book = models.Book.objects.create(title='Кніга',
+                                          slug='kniha',
+                                          description='**Важна** <i>',
+                                          date='2022-01-01',
+                                          status=models.BookStatus.ACTIVE)
+        book.authors.add(
+            models.Person.objects.create(name='Аўтар',
+                                         slug='autar',
+                                         description='Пра аўтара\nі <i>'))
+        models.Tag.objects.create(name='Тэг',
+                                  slug='teh',
+                                  description='Пра тэг <i>')
+
+        self.assertContains(self.client.get('/books/kniha'),
+                            descriptions.render_book_description(
+                                book.description),
+                            html=False)
+        self.assertContains(self.client.get('/person/autar'),
+                            '<p>Пра аўтара<br>і &lt;i&gt;</p>')
+        self.assertContains(self.client.get('/catalog/teh'),
+                            '<div class="mb-3">Пра тэг &lt;i&gt;</div>')
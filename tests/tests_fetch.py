@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from data_scripts.fetch import Fetcher
+from tests.local_http_server import LocalHttpServer, StubResponse
+
+
+class FetcherTests(SimpleTestCase):
+    '''Tests for shared fetcher of data_scripts scrapers.'''
+
+    def setUp(self):
+        self.server = LocalHttpServer().start()
+        self.addCleanup(self.server.stop)
+        self.fetcher = Fetcher(per_host_rate=100, backoff_sec=0)
+        self.addCleanup(self.fetcher.close)
+
+    def test_retries_temporary_errors(self):
+        self.server.routes['/flaky'] = [
+            StubResponse(503),
+            StubResponse(200, b'{"ok": true}')
+        ]
+
+        response = self.fetcher.request('GET', self.server.url('/flaky'))
+
+        self.assertEqual({'ok': True}, response.json())
+        self.assertEqual(['GET', 'GET'], self.server.requests_to('/flaky'))
+
+    def test_raises_on_error_status(self):
+        with self.assertRaisesRegex(ValueError, 'returned 404'):
+            self.fetcher.request('GET', self.server.url('/missing'))
+        self.assertEqual(1, len(self.server.requests_to('/missing')))
+
+    def test_map_keeps_order_of_inputs(self):
+        paths = [f'/book/{i}' for i in range(20)]
+        for path in paths:
+            self.server.routes[path] = [StubResponse(200, path.encode())]
+
+        def get_text(path: str) -> str:
+            return self.fetcher.request('GET', self.server.url(path)).text
+
+        pages = self.fetcher.map(get_text, paths)
+
+        self.assertEqual(paths, list(pages))
@@ -0,0 +1,100 @@
+import datetime
+import io
+import os
+import tempfile
+from django.core import serializers
+from django.test import TestCase
+
+from books import data_dump, fixture_loader, models
+
+
+class FixtureLoaderTests(TestCase):
+    '''Tests for books/fixture_loader.py used by init_db_with_data.'''
+
+    def setUp(self):
+        self.fixture = os.path.join(tempfile.mkdtemp(), 'data.json')
+
+    def _create_data(self) -> None:
+        link_type = models.LinkType.objects.create(
+            name='podcast', availability=models.LinkAvailability.EVERYWHERE)
+        tag = models.Tag.objects.create(name='Казкі', slug='kazki')
+        people = [
+            models.Person.objects.create(name=f'Асоба {i}', slug=f'asoba-{i}')
+            for i in range(3)
+        ]
+        for i in range(5):
+            book = models.Book.objects.create(title=f'Кніга {i}',
+                                              slug=f'kniha-{i}',
+                                              date=datetime.date(2022, 1, 1),
+                                              status=models.BookStatus.ACTIVE)
+            book.authors.add(people[i % 3], people[(i + 1) % 3])
+            book.tag.add(tag)
+            narration = models.Narration.objects.create(
+                book=book, language=models.Language.BELARUSIAN)
+            narration.narrators.add(people[(i + 2) % 3])
+            models.Link.objects.create(narration=narration,
+                                       url_type=link_type,
+                                       url=f'https://example.com/{i}')
+
+    def _dump(self) -> str:
+        stream = io.StringIO()
+        data_dump.dump('default', stream)
+        return stream.getvalue()
+
+    def _delete_data(self) -> None:
+        for model in reversed(data_dump.MODELS):
+            model.objects.all().delete()
+
+    def test_iter_json_list(self):
+        data = '[\n{"a": [1, 2]},\n{"b": "]"}, {}\n]\n'
+        for read_size in [1, 3, 1000]:
+            self.assertEqual([{
+                'a': [1, 2]
+            }, {
+                'b': ']'
+            }, {}],
+                             list(
+                                 fixture_loader.iter_json_list(
+                                     io.StringIO(data), read_size)))
+        self.assertEqual([],
+                         list(fixture_loader.iter_json_list(
+                             io.StringIO('[]'))))
+        with self.assertRaises(ValueError):
+            list(fixture_loader.iter_json_list(io.StringIO('[{"a": 1}')))
+
+    def test_load_restores_dumped_data(self):
+        self._create_data()
+        dumped = self._dump()
+        with open(self.fixture, 'w', encoding='utf8') as f:
+            f.write(dumped)
+        self._delete_data()
+
+        counts = fixture_loader.load(self.fixture, batch_size=2)
+
+        self.assertEqual(5, counts['books.Book'])
+        self.assertEqual(dumped, self._dump())
+
+    def test_load_rejects_missing_references(self):
+        person = models.Person.objects.create(name='Асоба', slug='asoba')
+        book = models.Book.objects.create(title='Кніга',
+                                          slug='kniha',
+                                          date=datetime.date(2022, 1, 1),
+                                          status=models.BookStatus.ACTIVE)
+        book.authors.add(person)
+        with open(self.fixture, 'w', encoding='utf8') as f:
+            serializers.serialize('json', [book], stream=f)
+        self._delete_data()
+
+        with self.assertRaises(Exception):
+            fixture_loader.load(self.fixture)
+        self.assertFalse(models.Book.objects.exists())
+
+    def test_snapshot_path_depends_on_fixture(self):
+        with open(self.fixture, 'w', encoding='utf8') as f:
+            f.write('[]')
+        path = fixture_loader.snapshot_path(self.fixture)
+        self.assertEqual(path, fixture_loader.snapshot_path(self.fixture))
+
+        with open(self.fixture, 'w', encoding='utf8') as f:
+            f.write('[\n]')
+        self.assertNotEqual(path, fixture_loader.snapshot_path(self.fixture))
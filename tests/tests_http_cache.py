@@ -0,0 +1,114 @@
+import json
+import tempfile
+from django.test import SimpleTestCase, TestCase
+
+from books import models
+from data_scripts import fetch, sync_knizhny_voz
+from data_scripts.books import BooksData
+from data_scripts.fetch import Fetcher
+from data_scripts.http_cache import CachedResponse, HttpCache, request_key
+from tests.local_http_server import LocalHttpServer, StubResponse
+
+
+class HttpCacheTests(SimpleTestCase):
+    '''Tests for on-disk cache of scrapers responses.'''
+
+    def setUp(self):
+        self.server = LocalHttpServer().start()
+        self.addCleanup(self.server.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def _get(self, path: str, offline: bool = False) -> str:
+        fetcher = Fetcher(backoff_sec=0,
+                          cache=HttpCache(self.directory, offline=offline))
+        try:
+            return fetcher.request('GET', self.server.url(path)).text
+        finally:
+            fetcher.close()
+
+    def test_revalidates_cached_response(self):
+        self.server.routes['/page'] = [
+            StubResponse(200, b'page', {'ETag': '"v1"'}),
+            StubResponse(304),
+        ]
+
+        self.assertEqual('page', self._get('/page'))
+        self.assertEqual('page', self._get('/page'))
+
+        headers = [h for _, p, h in self.server.requests if p == '/page']
+        self.assertNotIn('If-None-Match', headers[0])
+        self.assertEqual('"v1"', headers[1]['If-None-Match'])
+
+    def test_replaces_changed_response(self):
+        self.server.routes['/page'] = [
+            StubResponse(200, b'old', {'Last-Modified': 'Mon, 1 May 2023'}),
+            StubResponse(200, b'new'),
+        ]
+
+        self.assertEqual('old', self._get('/page'))
+        self.assertEqual('new', self._get('/page'))
+        self.assertEqual('new', self._get('/page', offline=True))
+        self.assertEqual(2, len(self.server.requests_to('/page')))
+
+    def test_offline_mode_doesnt_send_requests(self):
+        self.server.routes['/page'] = [StubResponse(200, b'page')]
+        self._get('/page')
+
+        self.assertEqual('page', self._get('/page', offline=True))
+        with self.assertRaisesRegex(ValueError, 'not in HTTP cache'):
+            self._get('/other', offline=True)
+        self.assertEqual(1, len(self.server.requests))
+
+
+class ReplayScraperTests(TestCase):
+    '''Runs scraper against recorded responses without network.'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = HttpCache(directory.name, offline=True)
+        fetch.configure(cache=self.cache)
+        self.addCleanup(fetch.configure)
+        models.LinkType.objects.create(
+            name='knizhny_voz',
+            availability=models.LinkAvailability.EVERYWHERE)
+
+    def _record(self, url: str, content) -> None:
+        response = CachedResponse(url=url,
+                                  headers={},
+                                  body=json.dumps(content).encode())
+        self.cache.put(request_key('GET', url), response.to_response())
+
+    def test_syncs_knizhny_voz(self):
+        self._record(sync_knizhny_voz.DATA_URL,
+                     [{
+                         'id': '1',
+                         'name': 'Кніга ',
+                         'author': 'Аўтар Аўтаравіч',
+                         'roles': [{
+                             'role': 'Чытае',
+                             'names': ['Чытач Чытачоў']
+                         }],
+                         'description': 'Апісанне',
+                         'imageUri': '',
+                     }])
+        self._record('https://knizhnyvoz.herokuapp.com/books/1',
+                     [{
+                         'duration': 60000
+                     }, {
+                         'duration': 30000
+                     }])
+
+        sync_knizhny_voz.run(BooksData(people=[], books=[]))
+
+        book = models.Book.objects.get(title='Кніга')
+        self.assertEqual(90, book.duration_sec.total_seconds())
+        self.assertEqual(['Аўтар Аўтаравіч'],
+                         [p.name for p in book.authors.all()])
+        narration = book.narrations.get()
+        self.assertEqual(['Чытач Чытачоў'],
+                         [p.name for p in narration.narrators.all()])
+        self.assertEqual('https://knizhnyvoz.by/app/book/1',
+                         narration.links.get().url)
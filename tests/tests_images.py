@@ -0,0 +1,204 @@
+import datetime
+import io
+from unittest import mock
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase
+
+from books import models
+from tests.media_root import use_temp_media_root
+
+
+def _make_jpeg(width: int, height: int) -> bytes:
+    image = Image.new('RGB', (width, height), (200, 40, 40))
+    exif = Image.Exif()
+    # Camera model.
+    exif[0x0110] = 'Secret camera'
+    output = io.BytesIO()
+    image.save(output, 'JPEG', exif=exif)
+    return output.getvalue()
+
+
+class ImageRenditionsTests(TestCase):
+    '''Tests for covers and photos renditions, see books/images.py.'''
+
+    def setUp(self):
+        use_temp_media_root(self)
+
+    def _create_book(self, cover: bytes, title: str = 'Кніга') -> models.Book:
+        book = models.Book.objects.create(title=title,
+                                          date=datetime.date(2022, 1, 1),
+                                          status=models.BookStatus.ACTIVE)
+        book.cover_image.save('upload.jpg', ContentFile(cover))
+        return book
+
+    def test_generates_renditions_on_save(self):
+        book = self._create_book(_make_jpeg(1000, 800))
+
+        renditions = book.cover_image_renditions
+        self.assertEqual(book.cover_image.name, renditions['source'])
+        self.assertEqual((1000, 800),
+                         (renditions['width'], renditions['height']))
+        self.assertEqual([(150, 'webp'), (150, 'jpeg'), (300, 'webp'),
+                          (300, 'jpeg'), (600, 'webp'), (600, 'jpeg')],
+                         [(r['width'], r['format'])
+                          for r in renditions['renditions']])
+        for rendition in renditions['renditions']:
+            with default_storage.open(rendition['name']) as f:
+                image = Image.open(f)
+                self.assertEqual((rendition['width'], rendition['height']),
+                                 image.size)
+                self.assertEqual(0, len(image.getexif()))
+
+    def test_names_contain_content_hash(self):
+        first = self._create_book(_make_jpeg(400, 400))
+        second = self._create_book(_make_jpeg(400, 300), title='Другая')
+
+        first_names = {
+            r['name']
+            for r in first.cover_image_renditions['renditions']
+        }
+        second_names = {
+            r['name']
+            for r in second.cover_image_renditions['renditions']
+        }
+        self.assertEqual(set(), first_names & second_names)
+
+    def test_does_not_upscale(self):
+        book = self._create_book(_make_jpeg(200, 100))
+
+        self.assertEqual([150, 200],
+                         sorted({
+                             r['width']
+                             for r in book.cover_image_renditions['renditions']
+                         }))
+
+    def test_regenerates_only_when_image_changes(self):
+        book = self._create_book(_make_jpeg(400, 400))
+        renditions = book.cover_image_renditions
+        models.Book.objects.filter(uuid=book.uuid).update(
+            cover_image_renditions={
+                **renditions, 'width': 1
+            })
+        book.refresh_from_db()
+
+        book.title = 'Новая назва'
+        book.save()
+        self.assertEqual(1, book.cover_image_renditions['width'])
+
+        book.cover_image.save('upload.jpg', ContentFile(_make_jpeg(300, 300)))
+        self.assertEqual(300, book.cover_image_renditions['width'])
+
+    def test_regenerates_when_upload_overwrites_image(self):
+        # Prod storage overwrites files, so replaced image keeps its name.
+        book = self._create_book(_make_jpeg(400, 400))
+        name = book.cover_image.name
+        default_storage.delete(name)
+
+        book.cover_image = ContentFile(_make_jpeg(300, 300), name=name)
+        book.save()
+
+        self.assertEqual(name, book.cover_image_renditions['source'])
+        self.assertEqual(300, book.cover_image_renditions['width'])
+
+    def test_keeps_renditions_when_same_image_is_uploaded(self):
+        book = self._create_book(_make_jpeg(400, 400))
+        renditions = book.cover_image_renditions
+        name = book.cover_image.name
+        default_storage.delete(name)
+
+        book.cover_image = ContentFile(_make_jpeg(400, 400), name=name)
+        book.save()
+
+        self.assertEqual(renditions, book.cover_image_renditions)
+
+    def test_save_does_not_read_unchanged_image(self):
+        book = models.Book.objects.get(
+            uuid=self._create_book(_make_jpeg(400, 400)).uuid)
+        with mock.patch.object(default_storage,
+                               'open',
+                               side_effect=AssertionError('image was read')):
+            book.title = 'Новая назва'
+            book.save()
+
+    def test_backfill_command(self):
+        book = self._create_book(_make_jpeg(400, 400))
+        models.Book.objects.filter(uuid=book.uuid).update(
+            cover_image_renditions={})
+
+        call_command('generate_renditions')
+
+        book.refresh_from_db()
+        self.assertEqual(book.cover_image.name,
+                         book.cover_image_renditions['source'])
+
+    def test_template_tag_renders_srcset(self):
+        book = self._create_book(_make_jpeg(1000, 1000))
+        html = Template(
+            '{% load books_extras %}'
+            '{% responsive_image book.cover_image book.cover_image_renditions '
+            'sizes="150px" alt=book.title css_class="cover" %}').render(
+                Context({'book': book}))
+
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('-150.webp 150w', html)
+        self.assertIn('-600.jpeg 600w', html)
+        self.assertIn('sizes="150px"', html)
+        self.assertIn('width="300" height="300"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('alt="Кніга"', html)
+
+    def test_template_tag_loads_cover_above_the_fold_eagerly(self):
+        book = self._create_book(_make_jpeg(300, 300))
+        html = Template(
+            '{% load books_extras %}'
+            '{% responsive_image book.cover_image book.cover_image_renditions '
+            'sizes="275px" loading="eager" %}').render(Context({'book': book}))
+
+        self.assertIn('loading="eager"', html)
+        self.assertNotIn('loading="lazy"', html)
+
+    def test_stores_placeholder_and_dominant_color(self):
+        book = self._create_book(_make_jpeg(400, 600))
+
+        renditions = book.cover_image_renditions
+        self.assertTrue(
+            renditions['placeholder'].startswith('data:image/webp;base64,'))
+        self.assertRegex(renditions['color'], '^#[0-9a-f]{6}$')
+        red = int(renditions['color'][1:3], 16)
+        self.assertGreater(red, 150)
+
+    def test_template_tag_renders_placeholder(self):
+        book = self._create_book(_make_jpeg(300, 300))
+        html = Template(
+            '{% load books_extras %}'
+            '{% responsive_image book.cover_image book.cover_image_renditions '
+            'sizes="150px" %}').render(Context({'book': book}))
+
+        self.assertIn(
+            f'background-color: {book.cover_image_renditions["color"]}', html)
+        self.assertIn('background-image: url(data:image/webp;base64,', html)
+
+    def test_cover_style_is_stable_for_book(self):
+        book = models.Book.objects.create(title='Без вокладкі',
+                                          date=datetime.date(2022, 1, 1))
+        template = Template('{% load books_extras %}{{ book | cover_style }}')
+
+        style = template.render(Context({'book': book}))
+        self.assertIn('--cover-line-color: #', style)
+        self.assertIn('radial-gradient', style)
+        self.assertEqual(style, template.render(Context({'book': book})))
+
+    def test_template_tag_without_renditions(self):
+        book = self._create_book(_make_jpeg(100, 100))
+        book.cover_image_renditions = {}
+        html = Template(
+            '{% load books_extras %}'
+            '{% responsive_image book.cover_image book.cover_image_renditions '
+            'sizes="150px" alt=book.title %}').render(Context({'book': book}))
+
+        self.assertIn(f'src="{book.cover_image.url}"', html)
+        self.assertNotIn('srcset', html)
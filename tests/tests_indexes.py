@@ -0,0 +1,65 @@
+import contextlib
+import io
+from typing import List
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import RequestFactory, TestCase
+
+from books import views
+from books.models import Language, Tag
+
+
+class IndexesTests(TestCase):
+    '''
+    Checks that main listing queries use indexes declared in models. Query
+    plans are checked on sqlite with synthetic catalog big enough for the
+    planner to prefer indexes.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            call_command('generate_synthetic_data', '--books=2000',
+                         '--people=500', '--images=0')
+        # Collect statistics used by the planner.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _catalog_books(self, path: str) -> QuerySet:
+        request = RequestFactory().get(path)
+        return views.maybe_filter_links(views.active_books,
+                                        request).distinct().order_by('-date')
+
+    def _assert_uses_indexes(self, queryset: QuerySet,
+                             indexes: List[str]) -> None:
+        plan = queryset.explain()
+        for index in indexes:
+            self.assertIn(f'USING INDEX {index}',
+                          plan.replace('COVERING INDEX', 'INDEX'), plan)
+
+    def test_recently_added_books(self):
+        self._assert_uses_indexes(
+            views.active_books.order_by('-date')[:6], ['book_active_date_idx'])
+
+    def test_promoted_books(self):
+        self._assert_uses_indexes(views.active_books.filter(promoted=True),
+                                  ['book_active_promoted_idx'])
+
+    def test_catalog_by_tag(self):
+        tag = Tag.objects.first()
+        self._assert_uses_indexes(
+            self._catalog_books('/catalog').filter(tag=tag.id)[:16],
+            ['book_active_date_idx'])
+
+    def test_catalog_by_language_and_price(self):
+        self._assert_uses_indexes(
+            self._catalog_books('/catalog').filter(
+                narrations__language=Language.RUSSIAN,
+                narrations__paid=True)[:16],
+            ['book_active_date_idx', 'narration_book_lang_paid_idx'])
+
+    def test_catalog_by_link_type(self):
+        self._assert_uses_indexes(
+            self._catalog_books('/catalog?links=kobo')[:16],
+            ['book_active_date_idx', 'link_narration_type_idx'])
@@ -0,0 +1,72 @@
+from django.http import HttpRequest, HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import path
+import requests
+
+from books import models
+from tests.local_http_server import LocalHttpServer, StubResponse
+
+server = LocalHttpServer()
+
+
+def _slow_view(request: HttpRequest) -> HttpResponse:
+    count = models.Book.objects.count()
+    count += models.Person.objects.count()
+    requests.get(server.url('/api'))
+    html = Template('{% for i in items %}{% include "partials/_footer.html" %}'
+                    '{% endfor %}').render(Context({'items':
+                                                    range(count + 3)}))
+    return HttpResponse(html)
+
+
+urlpatterns = [path('slow', _slow_view)]
+
+
+@override_settings(ROOT_URLCONF='tests.tests_middleware')
+class ServerTimingMiddlewareTests(TestCase):
+    '''Tests for books.middleware.ServerTimingMiddleware.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        server.start()
+        server.routes['/api'] = [StubResponse(200, b'{}')]
+        cls.addClassCleanup(server.stop)
+
+    def _metrics(self, header: str) -> dict:
+        metrics = {}
+        for metric in header.split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_reports_timings_in_header(self):
+        response = self.client.get('/slow')
+
+        metrics = self._metrics(response['Server-Timing'])
+        self.assertEqual(['sql', 'tpl', 'http', 'total'], list(metrics))
+        self.assertEqual('"SQL (2 queries)"', metrics['sql']['desc'])
+        self.assertEqual('"Outbound HTTP (1 requests)"',
+                         metrics['http']['desc'])
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertLessEqual(float(metrics['tpl']['dur']),
+                             float(metrics['total']['dur']))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_logs_structured_fields(self):
+        with self.assertLogs('books.middleware', 'INFO') as logs:
+            self.client.get('/slow')
+
+        fields = getattr(logs.records[0], 'json_fields')
+        self.assertEqual('/slow', fields['path'])
+        self.assertEqual(200, fields['status'])
+        self.assertEqual(2, fields['sql_count'])
+        self.assertEqual(1, fields['http_count'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_skips_not_sampled_requests(self):
+        response = self.client.get('/slow')
+
+        self.assertFalse(response.has_header('Server-Timing'))
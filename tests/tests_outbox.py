@@ -0,0 +1,164 @@
+import datetime
+from typing import List, Tuple
+from unittest import mock
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from books import models, outbox
+from books.models import OutboxAction
+
+NO_LAG = datetime.timedelta(0)
+
+
+class OutboxTests(TestCase):
+    '''Tests for books/outbox.py.'''
+
+    def _events(self) -> List[Tuple[str, str, str]]:
+        return [(e.action, e.model, e.object_id)
+                for e in models.OutboxEvent.objects.order_by('id')]
+
+    def _clear_events(self) -> None:
+        models.OutboxEvent.objects.all().delete()
+
+    def _create_book(self) -> models.Book:
+        return models.Book.objects.create(title='Кніга',
+                                          slug='kniha',
+                                          date=datetime.date(2022, 1, 1),
+                                          status=models.BookStatus.ACTIVE)
+
+    def test_records_create_update_delete(self):
+        person = models.Person.objects.create(name='Асоба', slug='asoba')
+        uuid = str(person.uuid)
+        person.name = 'Новае імя'
+        person.save()
+        person.delete()
+
+        self.assertEqual([
+            (OutboxAction.CREATE, 'person', uuid),
+            (OutboxAction.UPDATE, 'person', uuid),
+            (OutboxAction.DELETE, 'person', uuid),
+        ], self._events())
+
+    def test_records_cascade_delete(self):
+        book = self._create_book()
+        narration = models.Narration.objects.create(
+            book=book, language=models.Language.BELARUSIAN)
+        link = models.Link.objects.create(narration=narration,
+                                          url='https://example.com')
+        book_uuid = str(book.uuid)
+        self._clear_events()
+
+        book.delete()
+
+        self.assertCountEqual([
+            (OutboxAction.DELETE, 'book', book_uuid),
+            (OutboxAction.DELETE, 'narration', str(narration.uuid)),
+            (OutboxAction.DELETE, 'link', str(link.uuid)),
+        ], self._events())
+
+    def test_records_m2m_changes(self):
+        book = self._create_book()
+        person = models.Person.objects.create(name='Асоба', slug='asoba')
+        tag = models.Tag.objects.create(name='Тэг', slug='teh')
+        self._clear_events()
+        book_event = (OutboxAction.UPDATE, 'book', str(book.uuid))
+
+        book.authors.add(person)
+        self.assertEqual([book_event], self._events())
+
+        self._clear_events()
+        person.books_translated.add(book)
+        self.assertEqual([book_event], self._events())
+
+        self._clear_events()
+        tag.books.add(book)
+        tag.books.clear()
+        self.assertEqual([book_event, book_event], self._events())
+
+    def test_process_delivers_events_in_batches(self):
+        for i in range(5):
+            models.Tag.objects.create(name=f'Тэг {i}', slug=f'teh-{i}')
+        batches: List[List[str]] = []
+
+        def handle(events):
+            batches.append([event.object_id for event in events])
+
+        self.assertEqual(
+            5, outbox.process('test', handle, batch_size=2, min_age=NO_LAG))
+        self.assertEqual(3, len(batches))
+        self.assertEqual(0, outbox.process('test', handle, min_age=NO_LAG))
+
+        tag = models.Tag.objects.create(name='Новы', slug='novy')
+        self.assertEqual(1, outbox.process('test', handle, min_age=NO_LAG))
+        self.assertEqual([str(tag.id)], batches[-1])
+
+    def test_failed_batch_is_delivered_again(self):
+        models.Tag.objects.create(name='Тэг', slug='teh')
+
+        def fail(events):
+            raise Exception('consumer failed')
+
+        with self.assertRaises(Exception):
+            outbox.process('test', fail, min_age=NO_LAG)
+
+        delivered = []
+        outbox.process('test', delivered.extend, min_age=NO_LAG)
+        self.assertEqual(1, len(delivered))
+
+    def test_recent_events_are_delayed(self):
+        models.Tag.objects.create(name='Тэг', slug='teh')
+
+        self.assertEqual([], outbox.read_events('test'))
+        self.assertEqual(1, len(outbox.read_events('test', min_age=NO_LAG)))
+
+    def test_consumers_have_separate_cursors(self):
+        models.Tag.objects.create(name='Тэг', slug='teh')
+        outbox.process('first', lambda events: None, min_age=NO_LAG)
+
+        self.assertEqual([], outbox.read_events('first', min_age=NO_LAG))
+        self.assertEqual(1, len(outbox.read_events('second', min_age=NO_LAG)))
+
+    def test_delete_processed_events(self):
+        models.Tag.objects.create(name='Тэг 1', slug='teh-1')
+        outbox.process('first', lambda events: None, min_age=NO_LAG)
+        models.Tag.objects.create(name='Тэг 2', slug='teh-2')
+        outbox.process('second', lambda events: None, min_age=NO_LAG)
+        models.Tag.objects.create(name='Тэг 3', slug='teh-3')
+
+        self.assertEqual(
+            1, outbox.delete_processed_events(['first', 'second', 'third']))
+        self.assertEqual(2, models.OutboxEvent.objects.count())
+        self.assertEqual(0, outbox.delete_processed_events(['third']))
+
+    def test_delete_old_events(self):
+        models.Tag.objects.create(name='Тэг 1', slug='teh-1')
+        models.OutboxEvent.objects.update(created_at=timezone.now() -
+                                          outbox.RETENTION -
+                                          datetime.timedelta(hours=1))
+        models.Tag.objects.create(name='Тэг 2', slug='teh-2')
+
+        self.assertEqual(204, self.client.get('/cleanup_outbox').status_code)
+        self.assertEqual(1, models.OutboxEvent.objects.count())
+
+    def test_fixtures_are_not_recorded(self):
+        tag = models.Tag(name='Тэг', slug='teh')
+        post_save.send(models.Tag,
+                       instance=tag,
+                       created=True,
+                       raw=True,
+                       using='default')
+        self.assertEqual([], self._events())
+
+
+class OutboxTransactionTests(TransactionTestCase):
+    '''Tests that need real transactions, TestCase wraps tests in one.'''
+
+    def test_event_is_written_in_the_same_transaction(self):
+        with mock.patch.object(outbox,
+                               'record_bulk',
+                               side_effect=Exception('outbox is down')):
+            with self.assertRaises(Exception):
+                models.Person.objects.create(name='Асоба', slug='asoba')
+
+        self.assertEqual(0, models.Person.objects.count())
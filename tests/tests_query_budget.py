@@ -0,0 +1,211 @@
+'''
+Query budget regression suite. Each public page is rendered with a fixed
+catalog fixture and number of SQL queries is compared against declared budget.
+This catches N+1 queries introduced by template or view changes.
+
+When a page goes over budget, failure message contains a diff between SQL
+recorded in tests/query_baseline.json and SQL executed now. To update the
+baseline after intended changes run:
+
+UPDATE_QUERY_BASELINE=1 python manage.py test tests.tests_query_budget --settings=booksby.sqlite_settings
+'''
+
+from collections import Counter
+from dataclasses import dataclass
+import difflib
+import json
+import os
+import re
+import time
+from typing import Dict, List
+from unittest import mock
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from books import models
+from tests.catalog_fixture import create_catalog_fixture
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'query_baseline.json')
+
+
+@dataclass
+class ViewBudget:
+    '''Max number of queries a page can make.'''
+    name: str
+    url: str
+    max_queries: int
+    # Number of queries that repeat query already made by the page.
+    max_duplicates: int = 0
+
+
+BUDGETS: List[ViewBudget] = [
+    # Fixed number of queries for each tag shown on main page.
+    ViewBudget('index', '/', 14),
+    ViewBudget('catalog', '/catalog', 4),
+    ViewBudget('catalog_tag', '/catalog/tag-1', 5),
+    ViewBudget('catalog_links', '/catalog?links=kobo,youtube', 4),
+    ViewBudget('catalog_lang', '/catalog?lang=russian', 4),
+    ViewBudget('catalog_paid', '/catalog?paid=true', 4),
+    ViewBudget('catalog_free', '/catalog?paid=false&lang=belarusian', 4),
+    ViewBudget('catalog_page_2', '/catalog?page=2', 4),
+    ViewBudget('catalog_last_page', '/catalog?page=3', 4),
+    ViewBudget('catalog_out_of_range_page', '/catalog?page=100', 4),
+    ViewBudget(
+        'catalog_tag_all_filters',
+        '/catalog/tag-0?links=knihi_com&lang=belarusian&paid=true&page=1', 5),
+    # Book with two narrations.
+    ViewBudget('book', '/books/book-0', 8),
+    ViewBudget('book_single_narration', '/books/book-1', 8),
+    ViewBudget('person', '/person/person-1', 9),
+    ViewBudget('person_links', '/person/person-1?links=kobo', 9),
+    ViewBudget('search', '/search?query=кніга', 3),
+    ViewBudget('about', '/about', 1),
+    ViewBudget('articles', '/articles/jak-vyklasci-audyjaknihu', 0),
+    ViewBudget('sitemap', '/sitemap.txt', 4),
+    # Served from storage, see generate_data_json.
+    ViewBudget('data_json', '/data.json', 0),
+    # Renders hot pages (main, catalog, about, tag, book, person), a few
+    # queries repeat between them.
+    ViewBudget('warmup', '/_ah/warmup', 46, max_duplicates=3),
+    # Internal stats page, counts books of each person separately.
+    ViewBudget('birthdays', '/stats/birthdays', 37),
+]
+
+
+def normalize_sql(sql: str) -> str:
+    '''
+    Replaces literals and selected columns so that SQL can be compared across
+    runs and model changes.
+    '''
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = re.sub(r'IN \([?, ]+\)', 'IN (...)', sql)
+    # Select lists of subqueries too, e.g. of paginator count queries.
+    return re.sub(r'\bSELECT (DISTINCT )?.*? FROM', r'SELECT \1... FROM', sql)
+
+
+def _load_baseline() -> Dict[str, List[str]]:
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, 'r') as f:
+        return json.load(f)
+
+
+def _search_hits() -> List[Dict[str, str]]:
+    hits = [{
+        'model': 'book',
+        'objectID': str(book.uuid)
+    } for book in models.Book.objects.all()[:20]]
+    hits += [{
+        'model': 'person',
+        'objectID': str(person.uuid)
+    } for person in models.Person.objects.all()[:5]]
+    return hits
+
+
+@dataclass
+class Measurement:
+    '''Queries made by a page.'''
+    # Normalized SQL of all queries in the order they were made.
+    queries: List[str]
+    duplicates: int
+    elapsed_ms: float
+
+
+class QueryBudgetTests(TestCase):
+    '''Checks that pages don't exceed their query budgets.'''
+
+    measurements: Dict[str, Measurement] = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog_fixture()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        print('\nQuery budgets:')
+        for budget in BUDGETS:
+            measurement = cls.measurements.get(budget.name)
+            if measurement:
+                print(f'{budget.name:30} {len(measurement.queries):3}'
+                      f'/{budget.max_queries:<3} queries '
+                      f'{measurement.duplicates:3} duplicates '
+                      f'{measurement.elapsed_ms:7.1f}ms')
+        if os.environ.get('UPDATE_QUERY_BASELINE'):
+            with open(BASELINE_FILE, 'w') as f:
+                json.dump(
+                    {
+                        name: measurement.queries
+                        for name, measurement in cls.measurements.items()
+                    },
+                    f,
+                    ensure_ascii=False,
+                    indent=2)
+                f.write('\n')
+
+    def _measure(self, budget: ViewBudget) -> Measurement:
+        search_client = mock.MagicMock()
+        search_client.create().init_index().search.return_value = {
+            'hits': _search_hits()
+        }
+        with mock.patch('algoliasearch.search_client.SearchClient',
+                        search_client):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = self.client.get(budget.url)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+        self.assertEqual(200, response.status_code, budget.url)
+
+        raw_queries = [query['sql'] for query in context.captured_queries]
+        return Measurement(queries=[normalize_sql(sql) for sql in raw_queries],
+                           duplicates=len(raw_queries) - len(set(raw_queries)),
+                           elapsed_ms=elapsed_ms)
+
+    def _failure_message(self, budget: ViewBudget,
+                         measurement: Measurement) -> str:
+        baseline = _load_baseline().get(budget.name, [])
+        diff = difflib.unified_diff(baseline,
+                                    measurement.queries,
+                                    fromfile='baseline',
+                                    tofile=budget.url,
+                                    lineterm='')
+        repeated = [
+            f'{count}x {query}'
+            for query, count in Counter(measurement.queries).most_common()
+            if count > 1
+        ]
+        return '\n'.join([
+            f'{budget.url} made {len(measurement.queries)} queries '
+            f'(budget {budget.max_queries}), {measurement.duplicates} '
+            f'duplicates (budget {budget.max_duplicates}).',
+            'Repeated queries:',
+            *repeated,
+            'Diff against baseline:',
+            *diff,
+        ])
+
+    def test_query_budgets(self):
+        for budget in BUDGETS:
+            with self.subTest(budget.name):
+                measurement = self._measure(budget)
+                type(self).measurements[budget.name] = measurement
+                message = self._failure_message(budget, measurement)
+                self.assertLessEqual(len(measurement.queries),
+                                     budget.max_queries, message)
+                self.assertLessEqual(measurement.duplicates,
+                                     budget.max_duplicates, message)
+
+
+class NormalizeSqlTests(SimpleTestCase):
+    '''Baseline shouldn't change when columns are added to models.'''
+
+    def test_replaces_select_lists_of_subqueries(self):
+        sql = ('SELECT COUNT(*) FROM (SELECT DISTINCT "books_book"."uuid" AS '
+               'Col1, "books_book"."title" AS Col2 FROM "books_book" WHERE '
+               '"books_book"."status" = \'ACTIVE\' LIMIT 10) subquery')
+
+        self.assertEqual(
+            'SELECT ... FROM (SELECT DISTINCT ... FROM "books_book" WHERE '
+            '"books_book"."status" = ? LIMIT ?) subquery', normalize_sql(sql))
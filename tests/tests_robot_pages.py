@@ -1,7 +1,7 @@
 import requests
 from books import models, views
 from tests.webdriver_test_case import WebdriverTestCase
-from tests.worker import fetch_head_urls
+from books.link_checker import check_urls
 
 
 class RobotPagesTests(WebdriverTestCase):
@@ -39,8 +39,7 @@ class RobotPagesTests(WebdriverTestCase):
     def test_all_sitemap_links_return_200(self):
         sitemap = requests.get(self.get_sitemap_url()).text.splitlines()
         errors = [
-            status for status in fetch_head_urls(sitemap)
-            if status.response.status_code != 200
-            and status.response.status_code != 302
+            status for status in check_urls(sitemap)
+            if status.status_code != 200 and status.status_code != 302
         ]
         self.assertListEqual(errors, [])
@@ -0,0 +1,118 @@
+import datetime
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.functions import Length
+from django.test import TestCase
+
+from books import models, search
+
+
+class SearchTests(TestCase):
+    '''
+    Tests for books/search.py. Tests run on sqlite which uses icontains
+    fallback, Postgres queries are only checked to be built correctly.
+    '''
+
+    def setUp(self):
+        self.author = models.Person.objects.create(
+            name='Уладзімір Караткевіч',
+            name_ru='Владимир Короткевич',
+            slug='karatkevich')
+        other = models.Person.objects.create(name='Янка Купала', slug='kupala')
+        tag = models.Tag.objects.create(name='Класіка', slug='klasika')
+        self.book = models.Book.objects.create(title='Дзікае паляванне',
+                                               title_ru='Дикая охота',
+                                               slug='palyavanne',
+                                               date=datetime.date(2022, 1, 1),
+                                               status=models.BookStatus.ACTIVE)
+        self.book.authors.set([self.author])
+        self.book.tag.set([tag])
+        other_book = models.Book.objects.create(
+            title='Паўлінка',
+            slug='paulinka',
+            date=datetime.date(2022, 1, 1),
+            status=models.BookStatus.ACTIVE)
+        other_book.authors.set([other])
+
+    def test_book_manager_filters(self):
+        self.assertEqual([self.book],
+                         list(models.Book.objects.filtered(title='паляван')))
+        self.assertEqual([self.book],
+                         list(models.Book.objects.filtered(title_ru='охот')))
+        self.assertEqual([self.book],
+                         list(models.Book.objects.filtered(author='Коротк')))
+        self.assertEqual([self.book],
+                         list(models.Book.objects.filtered(tag='Класі')))
+
+    def test_admin_search(self):
+        user = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='password')
+        self.client.force_login(user)
+
+        response = self.client.get('/admin/books/book/', {'q': 'Дикая'})
+        self.assertEqual([self.book], list(response.context['cl'].result_list))
+
+        response = self.client.get('/admin/books/person/', {'q': 'Короткевич'})
+        self.assertEqual([self.author],
+                         list(response.context['cl'].result_list))
+
+        response = self.client.get(
+            '/admin/autocomplete/', {
+                'term': 'Караткев',
+                'app_label': 'books',
+                'model_name': 'book',
+                'field_name': 'authors',
+            })
+        self.assertEqual(['karatkevich'], [
+            models.Person.objects.get(uuid=result['id']).slug
+            for result in response.json()['results']
+        ])
+
+    def test_admin_orders_search_results_by_rank(self):
+        user = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='password')
+        self.client.force_login(user)
+
+        def search_results(rank, params):
+            # Fake rank, trigram similarity works only on Postgres.
+            def ranked_search(queryset, fields, query):
+                return queryset.annotate(**{search.RANK: rank})
+
+            with mock.patch.object(search, 'search', ranked_search):
+                response = self.client.get('/admin/books/book/',
+                                           dict(params, q='а'))
+            return [book.slug for book in response.context['cl'].result_list]
+
+        self.assertEqual(['palyavanne', 'paulinka'],
+                         search_results(Length('title'), {}))
+        self.assertEqual(['paulinka', 'palyavanne'],
+                         search_results(-Length('title'), {}))
+        # Sorting by a column takes precedence.
+        self.assertEqual(['palyavanne', 'paulinka'],
+                         search_results(-Length('title'), {'o': '1'}))
+
+    def test_postgres_query_uses_normalized_trigram_search(self):
+        # "remote" is Postgres DB, building SQL doesn't need connection.
+        queryset = search.search(
+            models.Book.objects.using('remote').all(), ['title', 'title_ru'],
+            'паляв')
+        sql, params = queryset.query.get_compiler(using='remote').as_sql()
+
+        self.assertEqual('postgresql', connections['remote'].vendor)
+        self.assertIn(
+            'books_search_normalize("books_book"."title")::text LIKE', sql)
+        self.assertIn(
+            'books_search_normalize("books_book"."title_ru") %% '
+            'books_search_normalize(%s)', sql)
+        self.assertIn('ORDER BY "search_rank" DESC', sql)
+        self.assertEqual(['паляв'] * 6, list(params))
+
+    def test_index_sql(self):
+        statements = search.search_index_sql()
+
+        self.assertIn('CREATE EXTENSION IF NOT EXISTS pg_trgm', statements)
+        self.assertIn(
+            'CREATE INDEX IF NOT EXISTS books_person_name_ru_trgm ON '
+            'books_person USING gin (books_search_normalize(name_ru) '
+            'gin_trgm_ops)', statements)
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from books.management.commands.startup_report import parse_import_times
+from booksby import cloud_logging, settings_secrets
+
+
+class StartupTests(SimpleTestCase):
+    '''Tests for things that affect app start time.'''
+
+    def test_cloud_libraries_are_not_imported_on_start(self):
+        code = ('import sys, django; django.setup(); '
+                'from django.urls import get_resolver; '
+                'get_resolver().url_patterns; '
+                'print(sorted(m for m in sys.modules if m.startswith('
+                '("google.cloud.secretmanager", "google.cloud.logging", '
+                '"algoliasearch"))))')
+        env = dict(os.environ)
+        env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+        output = subprocess.run([sys.executable, '-c', code],
+                                env=env,
+                                cwd=settings.BASE_DIR,
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout
+        self.assertEqual('[]', output.strip())
+
+    def test_startup_report(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, 'startup.json')
+            call_command('startup_report', '--runs=1', f'--output={output}')
+            with open(output, 'r') as f:
+                results = json.load(f)
+
+        self.assertEqual([
+            'interpreter', 'django_import', 'settings', 'apps', 'wsgi_and_urls'
+        ], list(results['phases_ms']))
+        self.assertGreater(results['phases_ms']['apps'], 0)
+        self.assertIn('django', results['slowest_imports_ms'])
+
+    def test_parse_import_times(self):
+        output = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |   django.utils',
+            'import time:       200 |       1500 | django',
+            'import time:        50 |         50 |     json.decoder',
+            'import time:       300 |        700 | json',
+            'import time:       300 |        500 | django.http',
+        ])
+        self.assertEqual({
+            'django': 2.0,
+            'json': 0.7
+        }, parse_import_times(output))
+
+    def test_secrets_are_read_from_cache_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.env') as f:
+            f.write('SECRET_KEY=cached\n')
+            f.flush()
+            with mock.patch.object(settings_secrets, 'SECRETS_CACHE_FILE',
+                                   f.name), mock.patch.object(
+                                       settings_secrets,
+                                       'fetch_from_secret_manager') as fetch:
+                self.assertEqual('SECRET_KEY=cached\n',
+                                 settings_secrets.load_settings_env('project'))
+                fetch.assert_not_called()
+
+    def test_secrets_are_fetched_without_cache_file(self):
+        with mock.patch.object(settings_secrets, 'SECRETS_CACHE_FILE',
+                               '/nonexistent/.env.secrets'), mock.patch.object(
+                                   settings_secrets,
+                                   'fetch_from_secret_manager',
+                                   return_value='SECRET_KEY=fetched') as fetch:
+            self.assertEqual('SECRET_KEY=fetched',
+                             settings_secrets.load_settings_env('project'))
+            fetch.assert_called_once_with(
+                'project', settings_secrets.DEFAULT_SETTINGS_NAME)
+
+    def test_cloud_logging_handler_is_created_on_first_record(self):
+        handler = cloud_logging.LazyCloudLoggingHandler(logging.INFO)
+        with mock.patch('google.cloud.logging.Client') as client, mock.patch(
+                'google.cloud.logging.handlers.CloudLoggingHandler'
+        ) as cloud_handler:
+            client.assert_not_called()
+            record = logging.LogRecord('test', logging.INFO, __file__, 1,
+                                       'message', None, None)
+            handler.emit(record)
+            handler.emit(record)
+
+        client.assert_called_once()
+        cloud_handler.assert_called_once_with(client.return_value)
+        self.assertEqual(2, cloud_handler.return_value.handle.call_count)
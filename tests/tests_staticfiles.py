@@ -0,0 +1,46 @@
+import os
+import re
+import shutil
+import tempfile
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+
+class StaticFilesTests(TestCase):
+    '''Tests for hashed static files, see "Static files deployment" in README.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, static_root)
+        settings_override = override_settings(
+            STATIC_ROOT=static_root,
+            STATICFILES_STORAGE=
+            'django.contrib.staticfiles.storage.ManifestStaticFilesStorage')
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+        call_command('collectstatic', '--noinput', verbosity=0)
+        cls.css = staticfiles_storage.stored_name('css/app.css')
+
+    def test_writes_hashed_files(self):
+        self.assertRegex(self.css, r'^css/app\.[0-9a-f]{12}\.css$')
+        self.assertTrue(staticfiles_storage.exists(self.css))
+
+    def test_templates_use_hashed_names(self):
+        html = Template('{% load static %}{% static "css/app.css" %}').render(
+            Context())
+        self.assertEqual(f'/static/{self.css}', html)
+
+    def test_app_yaml_caches_hashed_files(self):
+        with open(os.path.join(settings.BASE_DIR, 'app.yaml'),
+                  'r',
+                  encoding='utf8') as f:
+            app_yaml = f.read()
+        pattern = re.search(r'- url: /static/\((.*)\)\$', app_yaml)
+        assert pattern
+        self.assertRegex(self.css, f'^{pattern.group(1)}$')
+        self.assertNotRegex('css/app.css', f'^{pattern.group(1)}$')
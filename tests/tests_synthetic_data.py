@@ -0,0 +1,70 @@
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from books import models
+from tests.media_root import use_temp_media_root
+
+
+class GenerateSyntheticDataTests(TestCase):
+    '''Tests for generate_synthetic_data command.'''
+
+    def setUp(self):
+        use_temp_media_root(self)
+
+    def _generate(self, *args: str) -> None:
+        call_command('generate_synthetic_data', '--books=200', '--images=2',
+                     *args)
+
+    def test_generates_catalog(self):
+        self._generate('--people=50')
+
+        self.assertEqual(200, models.Book.objects.count())
+        self.assertEqual(50, models.Person.objects.count())
+        self.assertGreater(models.Narration.objects.count(), 200)
+        self.assertGreater(models.Link.objects.count(), 200)
+        self.assertFalse(
+            models.Book.objects.filter(authors__isnull=True).exists())
+        self.assertFalse(models.Book.objects.filter(tag__isnull=True).exists())
+        book = models.Book.objects.exclude(cover_image='').first()
+        self.assertTrue(book.cover_image.storage.exists(book.cover_image.name))
+        self.assertEqual(book.cover_image.name,
+                         book.cover_image_renditions['source'])
+        self.assertTrue(
+            models.Person.objects.exclude(name_ru='').filter(
+                name__contains=' ').exists())
+
+    def test_authors_distribution_is_skewed(self):
+        self._generate('--people=100')
+
+        counts = sorted(
+            models.Person.objects.annotate(
+                count=Count('books_authored')).values_list('count', flat=True))
+        # Most prolific author wrote many books while typical one wrote few.
+        self.assertGreater(counts[-1], 10 * max(1, counts[len(counts) // 2]))
+
+    def test_same_seed_generates_same_data(self):
+
+        def snapshot():
+            return list(
+                models.Book.objects.order_by('slug').values_list(
+                    'uuid', 'title', 'date'))
+
+        self._generate('--seed=5')
+        first = snapshot()
+        self._generate('--seed=5', '--clear')
+        self.assertEqual(first, snapshot())
+        self._generate('--seed=6', '--clear')
+        self.assertNotEqual(first, snapshot())
+
+    def test_pages_render(self):
+        self._generate()
+        book = models.Book.objects.filter(
+            status=models.BookStatus.ACTIVE).first()
+        person = book.authors.first()
+
+        for url in [
+                '/', '/catalog', f'/books/{book.slug}',
+                f'/person/{person.slug}'
+        ]:
+            self.assertEqual(200, self.client.get(url).status_code, url)
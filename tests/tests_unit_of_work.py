@@ -0,0 +1,102 @@
+import datetime
+from django.test import TestCase
+
+from books import models
+from books.models import OutboxAction
+from data_scripts import books, unit_of_work
+from data_scripts.books import BooksData
+
+
+class UnitOfWorkTests(TestCase):
+    '''Tests for data_scripts/unit_of_work.py.'''
+
+    def setUp(self):
+        self.link_type = models.LinkType.objects.create(
+            name='podcast', availability=models.LinkAvailability.EVERYWHERE)
+        self.data = BooksData(people=[], books=[])
+
+    def _import(self, index: int) -> models.Narration:
+        narration = books.add_or_update_book(self.data,
+                                             title=f'Кніга {index}',
+                                             description='Апісанне',
+                                             authors=[f'Аўтар {index}'],
+                                             narrators=['Чытальнік'],
+                                             translators=[],
+                                             cover_url='',
+                                             duration_sec=60)
+        books.add_or_update_link(narration, 'podcast',
+                                 f'https://example.com/{index}')
+        return narration
+
+    def test_writes_changes_on_exit(self):
+        with unit_of_work.join():
+            narration = self._import(1)
+            # Found among not yet written objects.
+            self.assertEqual(narration, self._import(1))
+            self.assertFalse(models.Book.objects.exists())
+
+        book = models.Book.objects.get()
+        self.assertEqual('kniga-1', book.slug)
+        self.assertEqual('<p>Апісанне</p>', book.description_html)
+        self.assertEqual(models.BookStatus.ACTIVE, book.status)
+        self.assertEqual(['Аўтар 1'], [p.name for p in book.authors.all()])
+        self.assertEqual('autar-1', book.authors.get().slug)
+        narration = models.Narration.objects.get()
+        self.assertEqual(['Чытальнік'],
+                         [p.name for p in narration.narrators.all()])
+        link = models.Link.objects.get()
+        self.assertEqual(self.link_type, link.url_type)
+        self.assertEqual('https://example.com/1', link.url)
+        events = set(
+            models.OutboxEvent.objects.values_list('action', 'model',
+                                                   'object_id'))
+        self.assertIn((OutboxAction.CREATE, 'book', str(book.uuid)), events)
+        self.assertIn((OutboxAction.CREATE, 'link', str(link.uuid)), events)
+
+    def test_batches_queries(self):
+        with self.assertNumQueries(20):
+            with unit_of_work.join():
+                for i in range(20):
+                    self._import(i)
+
+        self.assertEqual(20, models.Book.objects.count())
+        self.assertEqual(20, models.Link.objects.count())
+
+    def test_updates_existing_objects(self):
+        self._import(1)
+        self.data = BooksData(people=list(models.Person.objects.all()),
+                              books=list(models.Book.objects.all()))
+        models.OutboxEvent.objects.all().delete()
+
+        with unit_of_work.join():
+            narration = books.add_or_update_book(self.data,
+                                                 title='Кніга 1',
+                                                 description='Новае',
+                                                 authors=['Аўтар 1'],
+                                                 narrators=['Чытальнік'],
+                                                 translators=[],
+                                                 cover_url='',
+                                                 duration_sec=120)
+            books.add_or_update_link(narration, 'podcast',
+                                     'https://example.com/new')
+
+        self.assertEqual(1, models.Narration.objects.count())
+        book = models.Book.objects.get()
+        self.assertEqual('<p>Новае</p>', book.description_html)
+        self.assertEqual(datetime.timedelta(seconds=120), book.duration_sec)
+        self.assertEqual('https://example.com/new',
+                         models.Link.objects.get().url)
+        self.assertIn(
+            (OutboxAction.UPDATE, 'link', str(models.Link.objects.get().uuid)),
+            set(
+                models.OutboxEvent.objects.values_list('action', 'model',
+                                                       'object_id')))
+
+    def test_failure_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            with unit_of_work.join():
+                self._import(1)
+                raise ValueError('Scraper failed')
+
+        self.assertFalse(models.Book.objects.exists())
+        self.assertFalse(models.Person.objects.exists())
@@ -0,0 +1,44 @@
+from unittest import mock
+from django.test import TestCase
+
+from books import warmup
+from tests.catalog_fixture import create_catalog_fixture
+
+
+class WarmupTests(TestCase):
+    '''Tests for /_ah/warmup handler.'''
+
+    def setUp(self):
+        create_catalog_fixture()
+
+    def test_runs_all_steps(self):
+        response = self.client.get('/_ah/warmup')
+
+        self.assertEqual(200, response.status_code)
+        data = response.json()
+        self.assertEqual([
+            'db_connections', 'urls', 'static_manifest', 'templates',
+            'hot_pages'
+        ], [step['name'] for step in data['steps']])
+        for step in data['steps']:
+            self.assertIsNone(step['error'], step['name'])
+            self.assertGreaterEqual(step['duration_ms'], 0)
+        self.assertGreater(data['total_ms'], 0)
+
+    def test_hot_pages(self):
+        self.assertEqual([
+            '/', '/catalog', '/about', '/catalog/tag-2', '/books/book-39',
+            '/person/person-0'
+        ], warmup.hot_pages())
+
+    def test_failed_step_does_not_stop_warmup(self):
+        with mock.patch.object(warmup,
+                               'compile_templates',
+                               side_effect=Exception('broken')):
+            with self.assertLogs('books.warmup', 'ERROR'):
+                response = self.client.get('/_ah/warmup')
+
+        self.assertEqual(200, response.status_code)
+        steps = {step['name']: step for step in response.json()['steps']}
+        self.assertEqual('Exception: broken', steps['templates']['error'])
+        self.assertIsNone(steps['hot_pages']['error'])